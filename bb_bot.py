@@ -6,6 +6,10 @@ from telegram.ext import (
 from datetime import date
 import os
 from dotenv import load_dotenv
+from content_catalog import ContentCatalog
+from content_search import ContentSearchIndex, index_catalog, index_educational_content
+import clan_xp
+import user_store
 
 # Load environment variables
 load_dotenv()
@@ -51,6 +55,10 @@ def load_user_data():
                 
                 # Rebuild leaderboard
                 leaderboard = {uid: u.get('xp', 0) for uid, u in users.items()}
+
+                # Clan totals are kept by delta from here on; start from correct ones
+                for name, stored, actual in clan_xp.reconcile(clans, member_xp):
+                    print(f"Clan {name}: XP total {stored} -> {actual}")
         except Exception as e:
             print(f"Error loading user data: {e}")
             users = {}
@@ -65,6 +73,11 @@ def load_user_data():
         clans = {}
         web_users = {}
 
+def member_xp(member):
+    # Clan members are web emails or Telegram ids
+    user = web_users.get(member) if isinstance(member, str) else users.get(member)
+    return user.get('xp', 0) if user else 0
+
 # Save user data to file
 def save_user_data():
     try:
@@ -78,8 +91,9 @@ def save_user_data():
             'clans': clans
         }
         
-        with open(USER_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Atomic swap under the store lock shared with the web workers
+        with user_store.locked(USER_DATA_FILE):
+            user_store.write_json(USER_DATA_FILE, data)
     except Exception as e:
         print(f"Error saving user data: {e}")
 
@@ -290,6 +304,11 @@ EDUCATIONAL_CONTENT = [
     }
 ]
 
+# Full-text search over the lessons above and the curated missions (/search)
+search_index = index_educational_content(ContentSearchIndex(), EDUCATIONAL_CONTENT)
+index_catalog(search_index, ContentCatalog(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fallback_content.json')))
+
 # Expanded mission database with 100+ missions
 MISSIONS = [
     # History Missions
@@ -1389,6 +1408,21 @@ async def missions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(message)
 
+def match_mission(missions, done, user_answer):
+    """(index, mission) of the first open mission the answer fits, (-1, None) if none"""
+    for i, m in enumerate(missions):
+        if i in done:
+            continue  # Skip completed missions
+            
+        correct = m["answers"]
+        # For open-ended questions (no specific answers)
+        if correct is None:
+            return i, m
+        # For specific answer questions
+        if any(c in user_answer for c in correct):
+            return i, m
+    return -1, None
+
 async def answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
     u = users[uid]
@@ -1426,25 +1460,7 @@ async def answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
             
         user_answer = update.message.text.lower()
-        mission = None
-        num = -1
-        
-        # Try to match the answer with any active mission
-        for i, m in enumerate(u["daily_missions"]):
-            if i in u["done"]:
-                continue  # Skip completed missions
-                
-            correct = m["answers"]
-            # For open-ended questions (no specific answers)
-            if correct is None:
-                mission = m
-                num = i
-                break
-            # For specific answer questions
-            elif any(c in user_answer for c in correct):
-                mission = m
-                num = i
-                break
+        num, mission = match_mission(u["daily_missions"], u["done"], user_answer)
         
         if mission is None:
             await update.message.reply_text("❌ Жауап дұрыс емес немесе бұл миссия орындалған. /missions арқылы тексеріңіз")
@@ -1460,7 +1476,7 @@ async def answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check answer correctness
     if correct is None or any(c in user_answer for c in correct):
         gain = 2 if mission["type"] == "thinking" else 1
-        u["xp"] += gain
+        clan_xp.award_xp(u, clans, gain)
         u["done"].add(num)
         u["level"] = get_level(u["xp"])
         leaderboard[uid] = u["xp"]
@@ -1496,7 +1512,7 @@ async def voice_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
     if current_voice_mission_num is not None:
         gain = 5 # Voice missions now worth more
-        u["xp"] += gain
+        clan_xp.award_xp(u, clans, gain)
         u["done"].add(current_voice_mission_num)
         u["level"] = get_level(u["xp"])
         
@@ -1504,7 +1520,7 @@ async def voice_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if str(uid) in tg_links:
             email = tg_links[str(uid)]
             if email in web_users:
-                web_users[email]["xp"] += gain
+                clan_xp.award_xp(web_users[email], clans, gain)
                 web_users[email]["level"] = get_level(web_users[email]["xp"])
         
         save_user_data()
@@ -1533,8 +1549,7 @@ async def clan_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if name in clans:
             await update.message.reply_text("❌ Бұл атау бос емес")
         else:
-            clans[name] = {"leader": uid, "members": [uid], "xp": 0}
-            users[uid]["clan"] = name
+            clan_xp.create(clans, name, uid, users[uid])
             save_user_data()
             await update.message.reply_text(f"✅ '{name}' кланы құрылды!")
             
@@ -1542,8 +1557,7 @@ async def clan_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         name = args[1]
         if name in clans:
             if uid not in clans[name]["members"]:
-                clans[name]["members"].append(uid)
-                users[uid]["clan"] = name
+                clan_xp.join(clans, uid, users[uid], name)
                 save_user_data()
                 await update.message.reply_text(f"✅ Сіз '{name}' кланына қосылдыңыз!")
             else:
@@ -1598,6 +1612,28 @@ async def leaderboard_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"{i}. {user_name}: {xp} XP\n"
     await update.message.reply_text(text)
 
+async def search_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    lang = users.get(uid, {}).get("lang", "kz")
+
+    if not context.args:
+        await update.message.reply_text(
+            "🔎 Формат: /search <сөз>\nМысалы: /search Абылай хан" if lang == "kz" else
+            "🔎 Формат: /search <запрос>\nПример: /search Абылай хан"
+        )
+        return
+
+    query = " ".join(context.args)[:200]
+    results = search_index.search(query, limit=3, lang=lang) or search_index.search(query, limit=3)
+    if not results:
+        await update.message.reply_text("😔 Ештеңе табылмады" if lang == "kz" else "😔 Ничего не найдено")
+        return
+
+    message = f"🔎 {query}\n\n"
+    for hit in results:
+        message += f"📚 {hit['title']}\n{hit['snippet']}\n\n"
+    await update.message.reply_text(message.strip())
+
 async def feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
     u = users.get(uid, {})
@@ -1648,8 +1684,8 @@ async def set_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tg_links[str(uid)] = email
     if email in web_users:
         new_xp = max(web_users[email].get('xp', 0), users[uid].get('xp', 0))
-        users[uid]["xp"] = new_xp
-        web_users[email]["xp"] = new_xp
+        clan_xp.award_xp(users[uid], clans, new_xp - users[uid].get('xp', 0))
+        clan_xp.award_xp(web_users[email], clans, new_xp - web_users[email].get('xp', 0))
         await update.message.reply_text("🔗 Веб-аккаунт табылды! Прогресс синхрондалды.")
     save_user_data()
     await update.message.reply_text("✅ Email сәтті сақталды")
@@ -1667,6 +1703,7 @@ def create_app(token: str) -> Application:
     application.add_handler(CommandHandler("profile", profile))
     application.add_handler(CommandHandler("leaderboard", leaderboard_cmd))
     application.add_handler(CommandHandler("feedback", feedback))
+    application.add_handler(CommandHandler("search", search_cmd))
     application.add_handler(CommandHandler("clan", clan_cmd))
     application.add_handler(CommandHandler("duel", duel_cmd))
     application.add_handler(MessageHandler(filters.VOICE, voice_handler))
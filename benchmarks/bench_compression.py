@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: CPU cost vs bytes saved for compressing JSON API responses.
+
+Payloads are built from the shipped content (a mission, a scenario pack, a
+search result page) plus a synthetic clan leaderboard. Each is encoded as
+Flask would send it (\\uXXXX escaped and raw UTF-8) and compressed with gzip
+levels 1/6/9 and, when installed, brotli qualities 1/4/6/11.
+
+Usage:
+    python benchmarks/bench_compression.py [--repeat 50]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from content_catalog import ContentCatalog, localize, thaw  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def payloads():
+    catalog = ContentCatalog(os.path.join(ROOT, 'fallback_content.json'))
+    missions = [thaw(m) for m in catalog.missions()]
+    rng = random.Random(7)
+    names = ['Абылай', 'Жәнібек', 'Қасым', 'Тәуке', 'Есім', 'Бөгенбай', 'Қабанбай', 'Наурызбай']
+    leaderboard = {'success': True, 'clans': [
+        {'id': f'clan_{i}', 'name': f'{rng.choice(names)} батырлары {i}', 'xp': rng.randint(0, 10 ** 6),
+         'members': rng.randint(1, 50), 'level': rng.randint(1, 30), 'motto': 'Бірлік бар жерде тірлік бар'}
+        for i in range(100)]}
+    return {
+        'mission': {'success': True, 'mission': missions[0]},
+        'missions_kk': {'success': True, 'missions': [localize(m, 'kk') for m in missions]},
+        'scenario': {'success': True, 'scenario': catalog.scenario('Абылай хан', 1, 'kk')},
+        'leaderboard': leaderboard,
+    }
+
+
+def timed(fn, data, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        out = fn(data)
+    return (time.perf_counter() - started) / repeat, len(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compression cost vs savings for API payloads')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    codecs = [(f'gzip-{level}', lambda d, level=level: gzip.compress(d, level, mtime=0)) for level in (1, 6, 9)]
+    if brotli is not None:
+        codecs += [(f'br-{q}', lambda d, q=q: brotli.compress(d, quality=q)) for q in (1, 4, 6, 11)]
+    else:
+        print('(brotli not installed: gzip only)')
+
+    print(f"{'payload':<14}{'json':<7}{'bytes':>9}  " + ''.join(f'{name:>16}' for name, _ in codecs))
+    for name, payload in payloads().items():
+        for label, ascii_only in (('ascii', True), ('utf-8', False)):
+            data = json.dumps(payload, ensure_ascii=ascii_only, separators=(',', ':')).encode('utf-8')
+            cells = []
+            for _, fn in codecs:
+                seconds, size = timed(fn, data, args.repeat)
+                cells.append(f'{size:>7} {seconds * 1e6:>6.0f}µs')
+            print(f'{name:<14}{label:<7}{len(data):>9}  ' + ''.join(f'{c:>16}' for c in cells))
+    print('\ncells: compressed bytes and CPU time per response')
+
+
+if __name__ == '__main__':
+    main()
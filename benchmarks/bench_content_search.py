@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ContentSearchIndex query latency on a large synthetic corpus.
+
+Passages are built from the words of the shipped content (build_default_index),
+drawn with a Zipf-like skew so common words have long posting lists, as they
+do in real text. Queries mix fixed student-style queries with pairs and
+triples of corpus words. Reports per-query p50/p95/mean with and without
+a lang filter, the cost of add(), and the first query after an add().
+
+Usage:
+    python benchmarks/bench_content_search.py [--passages 20000] [--queries 300] [--repeat 3] [--seed 1]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from content_catalog import ContentCatalog  # noqa: E402
+from content_search import ContentSearchIndex, build_default_index  # noqa: E402
+
+FIXED_QUERIES = ('абылай хан', 'қазақ хандығы 1465', 'жоңғар шапқыншылығы', 'абай қара сөздері',
+                 'казахское ханство', 'төле би', 'алаш орда', 'ұлы жібек жолы', 'тәуелсіздік 1991')
+
+
+def corpus_words():
+    catalog = ContentCatalog(os.path.join(ROOT, 'fallback_content.json'))
+    index = build_default_index(catalog, ROOT)
+    words = []
+    for doc in index._docs:
+        if doc is not None:
+            words.extend(f"{doc.get('title', '')} {doc.get('text', '')}".split())
+    return words
+
+
+def make_passages(words, n, rng):
+    vocab = sorted(set(words))
+    rng.shuffle(vocab)
+    # Zipf-like weights: the i-th word is drawn ~1/(i+1) as often as the first
+    weights = [1.0 / (i + 1) for i in range(len(vocab))]
+    passages = []
+    for i in range(n):
+        body = rng.choices(vocab, weights, k=rng.randint(40, 120))
+        passages.append((f'doc:{i}', {'title': ' '.join(rng.choices(vocab, weights, k=3)), 'text': ' '.join(body),
+                                      'lang': rng.choice(('kz', 'ru')), 'source': 'bench'}))
+    return vocab, weights, passages
+
+
+def timed(fn, runs, repeat=1):
+    """Per-run latency (best of `repeat`, to keep scheduler noise out of the tail)"""
+    samples = []
+    for args in runs:
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn(*args)
+            best = min(best, time.perf_counter() - started)
+        samples.append(best)
+    samples.sort()
+    return {'p50': samples[len(samples) // 2], 'p95': samples[int(len(samples) * 0.95)],
+            'mean': statistics.mean(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--passages', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per query; the fastest counts')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab, weights, passages = make_passages(corpus_words(), args.passages, rng)
+    index = ContentSearchIndex()
+    started = time.perf_counter()
+    for doc_id, passage in passages:
+        index.add(doc_id, passage)
+    build = time.perf_counter() - started
+    queries = list(FIXED_QUERIES) + [' '.join(rng.choices(vocab, weights, k=rng.choice((2, 3))))
+                                     for _ in range(args.queries - len(FIXED_QUERIES))]
+    index.search(queries[0])        # warm up
+
+    rows = [
+        ('search', timed(lambda q: index.search(q), [(q,) for q in queries], args.repeat)),
+        ('search lang=kz', timed(lambda q: index.search(q, lang='kz'), [(q,) for q in queries], args.repeat)),
+        ('add', timed(lambda i, p: index.add(i, p), [(f'extra:{i}', passages[i][1]) for i in range(200)])),
+        ('add + search', timed(lambda i, p, q: (index.add(i, p), index.search(q)),
+                               [(f'extra:{i}', passages[i][1], queries[i % len(queries)]) for i in range(200)])),
+    ]
+    print(f"{len(index)} passages, {len(index._postings)} terms, built in {build:.1f}s, {len(queries)} queries")
+    print(f"{'case':<18}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+    for name, stats in rows:
+        print(f"{name:<18}{stats['p50'] * 1000:>9.2f}{stats['p95'] * 1000:>9.2f}{stats['mean'] * 1000:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
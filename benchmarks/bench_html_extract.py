@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: legacy whole-page HTML text extraction vs streaming extraction.
+
+The legacy path decodes the full body (response.text), parses all of it and
+truncates to 4000 characters afterwards. The streaming path decodes and parses
+16 KB chunks and stops at 4000 characters. Peak memory is measured with
+tracemalloc and includes the decoded body.
+
+Usage:
+    python benchmarks/bench_html_extract.py                  # generated 0.2/2/8 MB pages
+    python benchmarks/bench_html_extract.py --fixtures DIR   # saved *.html pages
+    python benchmarks/bench_html_extract.py --save DIR       # write the generated pages
+"""
+
+import argparse
+import codecs
+import glob
+import os
+import random
+import sys
+import time
+import tracemalloc
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extract import extract_text  # noqa: E402
+
+MAX_CHARS = 4000
+CHUNK_BYTES = 16 * 1024
+
+WORDS = ('Қазақ хандығы Абылай хан Жәнібек Керей батыр Түркістан Сыр бойы жоңғар шапқыншылығы '
+         'билер кеңесі Төле би Қазыбек би Әйтеке би ұлы дала тарих мұрағат құжат').split()
+
+
+class _LegacyExtractor(HTMLParser):
+    """The extractor previously used by server.py / server_backup.py"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in {'script', 'style', 'noscript'}:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in {'script', 'style', 'noscript'} and self._skip_depth > 0:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth == 0:
+            self._chunks.append(data.strip())
+
+    def get_text(self):
+        return ' '.join(filter(None, self._chunks))
+
+
+def generate_page(target_bytes, seed=0):
+    """Government-portal-like page: heavy nav/menus/scripts around a long article"""
+    rng = random.Random(seed)
+    sentence = lambda n: ' '.join(rng.choice(WORDS) for _ in range(n)) + '.'
+    head = ['<!DOCTYPE html><html lang="kk"><head><meta charset="utf-8"><title>e-history.kz</title>',
+            '<style>' + 'body{margin:0}.menu a{color:#333}' * 200 + '</style>',
+            '<script>' + 'window.dataLayer=window.dataLayer||[];' * 300 + '</script></head><body>',
+            '<header><nav><ul>' + ''.join(f'<li><a href="/m/{i}">{sentence(3)}</a></li>' for i in range(400))
+            + '</ul></nav></header><main><article><h1>Қазақ хандығының құрылуы</h1>']
+    tail = ['</article></main><aside>' + ''.join(f'<a href="/r/{i}">{sentence(5)}</a>' for i in range(300))
+            + '</aside><footer>' + sentence(40) + '</footer></body></html>']
+    parts = head[:]
+    size = sum(len(p.encode('utf-8')) for p in head + tail)
+    while size < target_bytes:
+        paragraph = f'<p>{sentence(rng.randint(20, 60))}</p><script>track({rng.random()})</script>'
+        parts.append(paragraph)
+        size += len(paragraph.encode('utf-8'))
+    return ''.join(parts + tail).encode('utf-8')
+
+
+def legacy(body):
+    parser = _LegacyExtractor()
+    parser.feed(body.decode('utf-8'))
+    return parser.get_text()[:MAX_CHARS]
+
+
+def streaming(body):
+    def chunks():
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        for start in range(0, len(body), CHUNK_BYTES):
+            yield decoder.decode(body[start:start + CHUNK_BYTES])
+    return extract_text(chunks(), max_chars=MAX_CHARS)
+
+
+def measure(fn, body, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    text = fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--fixtures', help='directory of saved *.html pages')
+    parser.add_argument('--save', help='write the generated pages to this directory and exit')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        pages = [(os.path.basename(p), open(p, 'rb').read())
+                 for p in sorted(glob.glob(os.path.join(args.fixtures, '*.html')))]
+    else:
+        pages = [(f'generated_{mb}mb.html', generate_page(int(mb * 1024 * 1024), seed=i))
+                 for i, mb in enumerate((0.2, 2, 8))]
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+        for name, body in pages:
+            with open(os.path.join(args.save, name), 'wb') as f:
+                f.write(body)
+        print(f"Wrote {len(pages)} pages to {args.save}")
+        return
+
+    print(f"{'page':<24}{'size':>9}  {'legacy ms':>10}{'stream ms':>10}  {'legacy MB':>10}{'stream MB':>10}")
+    for name, body in pages:
+        l_time, l_peak, _ = measure(legacy, body, args.repeat)
+        s_time, s_peak, text = measure(streaming, body, args.repeat)
+        print(f"{name:<24}{len(body) / 1048576:>7.1f}MB  {l_time * 1000:>10.1f}{s_time * 1000:>10.1f}"
+              f"  {l_peak / 1048576:>10.1f}{s_peak / 1048576:>10.2f}   ({len(text)} chars)")
+
+
+if __name__ == '__main__':
+    main()
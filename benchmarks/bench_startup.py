@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: cold-start cost of the server entry points.
+
+Each run imports the entry module in a fresh interpreter with
+`python -X importtime`, the way a serverless cold start does. Reports the
+median wall time and the import time per top-level package (summed "self"
+time of all its modules), so a heavy dependency that sneaks back into the
+import path shows up at once.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--top 15] [--entry server --entry api.index]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported lazily by the server; listed when they show up at startup anyway
+LAZY_PACKAGES = ('openai', 'google', 'requests')
+
+
+def parse_importtime(stderr):
+    """{top-level package: self microseconds}, summed over its modules"""
+    per_package = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, _, name = line[len('import time:'):].split('|')
+            per_package[name.strip().split('.')[0]] += int(self_us)
+        except ValueError:
+            continue
+    return dict(per_package)
+
+
+def run_once(entry):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {entry}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f'import {entry} failed:\n{result.stderr[-2000:]}')
+    return wall, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start import cost of the server entry points')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='packages to list per entry point')
+    parser.add_argument('--entry', action='append', help='module to import (default: server, api.index)')
+    args = parser.parse_args()
+
+    for entry in args.entry or ['server', 'api.index']:
+        walls, samples = [], defaultdict(list)
+        for _ in range(args.runs):
+            wall, packages = run_once(entry)
+            walls.append(wall)
+            for name, us in packages.items():
+                samples[name].append(us)
+        costs = {name: statistics.median(values) / 1000 for name, values in samples.items()}
+        total = sum(costs.values())
+
+        print(f'\n== import {entry}: median {statistics.median(walls) * 1000:.0f} ms wall '
+              f'(min {min(walls) * 1000:.0f}, max {max(walls) * 1000:.0f}, {args.runs} runs), '
+              f'{total:.0f} ms in imports')
+        for name, ms in sorted(costs.items(), key=lambda item: -item[1])[:args.top]:
+            print(f'{name:<28}{ms:>9.1f} ms  {ms / total:>6.1%}')
+        eager = [name for name in LAZY_PACKAGES if name in costs]
+        print(f"lazy packages imported at startup: {', '.join(eager) if eager else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
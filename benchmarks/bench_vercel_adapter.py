@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: the Vercel handler adapter (wsgi_adapter.handle) against the previous
+hand-built environ in api/flask_handler.py, both running server.app in process.
+
+For each request the benchmark reports requests/second and whether the
+response came back intact. The previous handler passed the raw body as
+wsgi.input and decoded every response as UTF-8, so POST bodies and binary
+assets fail with it.
+
+Usage:
+    python benchmarks/bench_vercel_adapter.py [--seconds 2]
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from server import app  # noqa: E402
+from wsgi_adapter import handle  # noqa: E402
+
+
+class Request:
+    def __init__(self, method, path, query='', headers=None, body=b''):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers or {}
+        self.body = body
+
+
+def legacy_handler(request):
+    """api/flask_handler.py before the adapter (kept verbatim for comparison)"""
+    try:
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'PATH_INFO': request.path or '/',
+            'QUERY_STRING': request.query or '',
+            'SERVER_NAME': 'vercel.app',
+            'SERVER_PORT': '443',
+            'wsgi.version': (1, 0),
+            'wsgi.input': request.body or '',
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.url_scheme': 'https',
+        }
+        for key, value in dict(request.headers).items():
+            key = key.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = f'HTTP_{key}'
+            environ[key] = value
+        response_data = {}
+
+        def start_response(status, response_headers):
+            response_data['status'] = status
+            response_data['headers'] = dict(response_headers)
+
+        response_body = b''.join(app(environ, start_response))
+        return {
+            'statusCode': int(response_data['status'].split()[0]),
+            'headers': response_data['headers'],
+            'body': response_body.decode('utf-8')
+        }
+    except Exception as e:
+        return {'statusCode': 500, 'headers': {'Content-Type': 'text/html'}, 'body': f'<h1>Error</h1><p>{str(e)}</p>'}
+
+
+def body_bytes(response):
+    if response.get('isBase64Encoded'):
+        return base64.b64decode(response['body'])
+    return response['body'].encode('utf-8')
+
+
+def scenarios():
+    with open(os.path.join(ROOT, 'logo.png'), 'rb') as f:
+        logo = f.read()
+    answer = json.dumps({'question': 'Қазақ хандығы қашан құрылды?', 'user_answer': '1465'}).encode('utf-8')
+    ips = (f'10.0.{i // 250}.{i % 250}' for i in itertools.count())    # stay under the per-IP rate limit
+    return [
+        ('GET /health', lambda: Request('GET', '/health'),
+         lambda r: r['statusCode'] == 200),
+        ('GET search', lambda: Request('GET', '/api/content/search', 'q=%D1%85%D0%B0%D0%BD&limit=10'),
+         lambda r: r['statusCode'] == 200 and json.loads(body_bytes(r))['results']),
+        ('GET logo.png', lambda: Request('GET', '/logo.png'),
+         lambda r: r['statusCode'] == 200 and body_bytes(r) == logo),
+        ('POST answer', lambda: Request('POST', '/api/answer/check', headers={
+            'Content-Type': 'application/json', 'Content-Length': str(len(answer)), 'X-Forwarded-For': next(ips)},
+            body=answer),
+         lambda r: r['statusCode'] == 200 and json.loads(body_bytes(r))['success']),
+    ]
+
+
+def throughput(handler, make_request, seconds):
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        handler(make_request())
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vercel adapter throughput vs the previous handler')
+    parser.add_argument('--seconds', type=float, default=2.0, help='measuring time per scenario and handler')
+    args = parser.parse_args()
+
+    handlers = [('previous', legacy_handler), ('adapter', lambda request: handle(app, request))]
+    print(f"{'request':<16}" + ''.join(f'{name:>22}' for name, _ in handlers))
+    for name, make_request, check in scenarios():
+        cells = []
+        for _, handler in handlers:
+            ok = check(handler(make_request()))
+            rate = throughput(handler, make_request, args.seconds)
+            cells.append(f"{rate:>9.0f} req/s {'ok' if ok else 'BROKEN':>6}")
+        print(f'{name:<16}' + ''.join(f'{c:>22}' for c in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Capacity report: what the single-file user store costs as it grows.
+
+For each scale a dataset is generated with gen_dataset.py (other shape
+options as there) and written the way save_users() writes it. A fresh
+interpreter then measures, as one server worker would see it:
+- parse: open + json.load of the whole store (every load_users() call);
+- save: json.dump with indent=2 to disk (every save_users() call);
+- peak RSS of that process, and the resident memory the parsed store holds.
+
+The store is read and rewritten whole on most API requests, so parse + save
+bounds the write rate of one worker. Scales where a load alone exceeds
+--budget-ms are flagged.
+
+Usage:
+    python benchmarks/capacity_report.py [--scales 1000,10000,50000] [--repeats 3]
+                                         [--days 30] [--history 50] [--budget-ms 100]
+                                         [--keep DIR] [--output report.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:     # Windows: no RSS figures
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gen_dataset import generate, write  # noqa: E402
+
+DEFAULT_SCALES = (1000, 10000, 50000)
+
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes (None when unknown)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _current_rss():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def measure(path, repeats):
+    """Runs in the child process: parse/save timings and memory of one store file"""
+    base_rss = _current_rss()
+    parse, save = [], []
+    data = None
+    for _ in range(repeats):
+        data = None
+        gc.collect()
+        started = time.perf_counter()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        parse.append(time.perf_counter() - started)
+    loaded_rss = _current_rss()
+    out = path + '.save'
+    for _ in range(repeats):
+        started = time.perf_counter()
+        with open(out, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        save.append(time.perf_counter() - started)
+    os.remove(out)
+    return {
+        'parse_ms': round(statistics.median(parse) * 1000, 1),
+        'save_ms': round(statistics.median(save) * 1000, 1),
+        'peak_rss_mb': round(_peak_rss() / 2 ** 20, 1) if _peak_rss() else None,
+        'store_rss_mb': round((loaded_rss - base_rss) / 2 ** 20, 1) if base_rss and loaded_rss else None,
+    }
+
+
+def run_scale(web_users, args, workdir):
+    path = os.path.join(workdir, f'users_{web_users}.json')
+    started = time.perf_counter()
+    data = generate(web_users, days=args.days, dau=args.dau, history=args.history, seed=args.seed)
+    counts = {'web_users': len(data['web_users']), 'tg_users': len(data['tg_users']),
+              'clans': len(data['clans']), 'history_answers': sum(len(u['history_answers'])
+                                                                  for u in data['tg_users'].values()),
+              'activity_records': sum(len(day) for day in data['daily_activity'].values())}
+    size = write(data, path)
+    del data
+    print(f'[CAPACITY] {web_users} users: generated {size / 2 ** 20:.1f} MB in {time.perf_counter() - started:.1f} s',
+          flush=True)
+
+    child = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', path,
+                            '--repeats', str(args.repeats)], capture_output=True, text=True)
+    if child.returncode != 0:
+        print(child.stderr[-2000:])
+        raise RuntimeError(f'measuring {path} failed')
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    result.update(counts, scale=web_users, file_mb=round(size / 2 ** 20, 1),
+                  bytes_per_user=size // max(1, web_users))
+    # One load + one save per write request, in a single worker
+    result['max_writes_per_s'] = round(1000 / (result['parse_ms'] + result['save_ms']), 1)
+    result['over_budget'] = result['parse_ms'] > args.budget_ms
+    if not args.keep:
+        os.remove(path)
+    return result
+
+
+def print_report(rows, budget_ms):
+    print(f"\n{'users':>8s} {'tg':>7s} {'clans':>6s} {'answers':>9s} {'file MB':>8s} {'B/user':>7s} "
+          f"{'parse ms':>9s} {'save ms':>8s} {'writes/s':>8s} {'peak MB':>8s} {'store MB':>9s}")
+    for r in rows:
+        print(f"{r['scale']:8d} {r['tg_users']:7d} {r['clans']:6d} {r['history_answers']:9d} {r['file_mb']:8.1f} "
+              f"{r['bytes_per_user']:7d} {r['parse_ms']:9.1f} {r['save_ms']:8.1f} {r['max_writes_per_s']:8.1f} "
+              f"{r['peak_rss_mb'] or 0:8.1f} {r['store_rss_mb'] or 0:9.1f}{'  OVER BUDGET' if r['over_budget'] else ''}")
+    over = [r['scale'] for r in rows if r['over_budget']]
+    if over:
+        print(f'\nA store load exceeds {budget_ms:g} ms from {over[0]} users on.')
+    else:
+        print(f'\nEvery store load stays under {budget_ms:g} ms.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)), help='web users per dataset')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--dau', type=float, default=0.25)
+    parser.add_argument('--history', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--budget-ms', type=float, default=100.0, help='acceptable load_users() time per request')
+    parser.add_argument('--keep', help='keep the generated datasets in this directory')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.repeats)))
+        return 0
+
+    workdir = args.keep or tempfile.mkdtemp(prefix='capacity-')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        rows = [run_scale(int(s), args, workdir) for s in args.scales.split(',') if s.strip()]
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    print_report(rows, args.budget_ms)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created_at': datetime.now().isoformat(timespec='seconds'),
+                       'config': {'days': args.days, 'dau': args.dau, 'history': args.history,
+                                  'seed': args.seed, 'repeats': args.repeats, 'budget_ms': args.budget_ms},
+                       'scales': rows}, f, ensure_ascii=False, indent=2)
+        print(f'report written to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
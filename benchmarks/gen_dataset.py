@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic unified_users.json datasets for capacity and load testing.
+
+The store has the shape the server and the bot write:
+- web_users: records as created by /api/register, with XP, levels, completed
+  missions, achievements and login times;
+- tg_users: bot profiles keyed by Telegram id, with `history_answers` entries
+  as the adaptive bot appends them (`--history` per user on average);
+- tg_links: Telegram id -> email for the linked share of bot users (a linked
+  bot user has the same XP as its web account);
+- clans: sizes drawn from a heavy-tailed distribution (a few big school clans,
+  many small ones), each web user in at most one, with XP totals kept as
+  clan_xp.py keeps them;
+- daily_activity: `--days` days of per-user mission completion/skip records
+  for the day's active users.
+
+The same seed gives the same file.
+
+Usage:
+    python benchmarks/gen_dataset.py --web-users 10000 [--tg-users 3000] [--linked 0.6]
+                                     [--clan-share 0.7] [--days 30] [--dau 0.25]
+                                     [--history 50] [--seed 1] --output users.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+NAMES = ('Айдос', 'Аружан', 'Ерлан', 'Жансая', 'Нұрсұлтан', 'Дана', 'Әлихан', 'Мадина', 'Бекзат', 'Томирис',
+         'Арман', 'Айгерім', 'Дамир', 'Інжу', 'Санжар', 'Камила')
+TOPICS = ('Қазақ хандығы', 'Абылай хан', 'Жоңғар шапқыншылығы', 'Төле би', 'Алаш', 'Тәуелсіздік',
+          'Ұлы Жібек жолы', 'Түркістан')
+ACHIEVEMENTS = ('first_mission', 'voice_master', 'history_expert', 'language_pro', 'streak_champion')
+LEVELS = ('beginner', 'intermediate', 'advanced')
+ANSWERS = ('1465 жылы', 'Абылай хан', 'Түркістан', 'білмеймін', 'үш жүзді біріктірді', 'Керей мен Жәнібек',
+           '1991 жылы 16 желтоқсан')
+END = datetime(2026, 10, 1)
+
+
+def _xp(rng):
+    """Long-tailed XP: most students have a few hundred, a few have thousands"""
+    return int(rng.paretovariate(1.3) * 40) % 20000
+
+
+def _level(xp):
+    return 1 + xp // 250
+
+
+def _clan_sizes(n_members, rng):
+    """Clan sizes summing to n_members; a few large, most under ten"""
+    sizes = []
+    while n_members > 0:
+        size = min(n_members, max(2, int(rng.paretovariate(1.1) * 3)), 500)
+        sizes.append(size)
+        n_members -= size
+    return sizes
+
+
+def web_user(i, rng, days):
+    email = f'student{i:07d}@school.kz'
+    created = END - timedelta(days=rng.uniform(days, days + 365))
+    xp = _xp(rng)
+    return email, {
+        'id': f'{rng.getrandbits(128):032x}',
+        'name': f'{rng.choice(NAMES)} {i}',
+        'email': email,
+        'password_hash': 'scrypt:32768:8:1$' + f'{rng.getrandbits(64):016x}' + '$' + f'{rng.getrandbits(512):0128x}',
+        'xp': xp,
+        'level': _level(xp),
+        'energy': rng.randint(0, 100),
+        'streak': rng.randint(0, 30),
+        'avatarUrl': None,
+        'createdAt': created.isoformat(),
+        'lastLogin': (END - timedelta(days=rng.uniform(0, days))).isoformat(),
+        'completedMissions': [f'{rng.choice(TOPICS)} #{rng.randint(1, 300)}' for _ in range(min(xp // 20, 200))],
+        'achievements': rng.sample(ACHIEVEMENTS, rng.randint(0, len(ACHIEVEMENTS))),
+        'weakAreas': rng.sample(TOPICS, rng.randint(0, 3)),
+        'language': rng.choice(('kk', 'kk', 'ru')),
+    }
+
+
+def tg_user(uid, rng, history, email=None, xp=None):
+    xp = _xp(rng) if xp is None else xp
+    answers = []
+    for n in range(int(rng.expovariate(1 / history)) if history else 0):
+        answers.append({
+            'question_id': f'q_{1760000000 + rng.randrange(3 * 10 ** 7)}.{rng.randrange(10 ** 6):06d}_{n % 3}',
+            'user_answer': rng.choice(ANSWERS),
+            'correct': rng.random() < 0.65,
+            'level': rng.choice(LEVELS),
+            'timestamp': (END - timedelta(days=rng.randint(0, 365))).strftime('%Y-%m-%d'),
+        })
+    last_day = (END - timedelta(days=rng.randint(0, 60))).strftime('%Y-%m-%d')
+    return str(uid), {
+        'id': uid,
+        'name': rng.choice(NAMES),
+        'email': email,
+        'xp': xp,
+        'level': _level(xp),
+        'lang': rng.choice(('kz', 'kz', 'ru')),
+        'done': sorted(rng.sample(range(5), rng.randint(0, 5))),
+        'last_day': last_day,
+        'streak': rng.randint(1, 30),
+        'current_mission': None,
+        'registered_at': (END - timedelta(days=rng.randint(60, 400))).strftime('%Y-%m-%d'),
+        'skill_level': rng.choice(LEVELS),
+        'history_answers': answers,
+    }
+
+
+def generate(web_users, tg_users=None, linked=0.6, clan_share=0.7, days=30, dau=0.25, history=50, seed=1):
+    """A unified_users.json store as a dict"""
+    rng = random.Random(seed)
+    tg_users = web_users * 3 // 10 if tg_users is None else tg_users
+
+    web = dict(web_user(i, rng, days) for i in range(web_users))
+    emails = list(web)
+
+    tg, links = {}, {}
+    linked_emails = rng.sample(emails, min(len(emails), int(tg_users * linked)))
+    for n in range(tg_users):
+        uid = 100000000 + rng.randrange(10 ** 9)
+        while str(uid) in tg:
+            uid += 1
+        email = linked_emails[n] if n < len(linked_emails) else None
+        key, user = tg_user(uid, rng, history, email, web[email]['xp'] if email else None)
+        tg[key] = user
+        if email:
+            links[key] = email
+
+    clans = {}
+    members = rng.sample(emails, int(len(emails) * clan_share))
+    start = 0
+    for c, size in enumerate(_clan_sizes(len(members), rng)):
+        name = f'{rng.choice(TOPICS)} {c}'
+        clan_members = members[start:start + size]
+        start += size
+        clans[name] = {'leader': clan_members[0], 'members': clan_members,
+                       'xp': sum(web[email]['xp'] for email in clan_members)}
+        for email in clan_members:
+            web[email]['clan'] = name
+
+    activity = {}
+    for d in range(days):
+        day = END - timedelta(days=days - d)
+        today = {}
+        for email in rng.sample(emails, int(len(emails) * dau)):
+            completed = rng.random() < 0.7
+            today[email] = {
+                'mission_completed': completed,
+                'mission_skipped': not completed and rng.random() < 0.5,
+                'timestamp': (day + timedelta(seconds=rng.randrange(86400))).isoformat(),
+            }
+        activity[day.strftime('%Y-%m-%d')] = today
+
+    return {'web_users': web, 'tg_users': tg, 'tg_links': links, 'clans': clans, 'daily_activity': activity}
+
+
+def write(data, path):
+    """Serialized the way server.save_users writes the store"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--web-users', type=int, required=True)
+    parser.add_argument('--tg-users', type=int, help='Telegram users (default: 30%% of web users)')
+    parser.add_argument('--linked', type=float, default=0.6, help='share of Telegram users linked to a web account')
+    parser.add_argument('--clan-share', type=float, default=0.7, help='share of web users in a clan')
+    parser.add_argument('--days', type=int, default=30, help='days of daily_activity')
+    parser.add_argument('--dau', type=float, default=0.25, help='share of web users active each day')
+    parser.add_argument('--history', type=int, default=50, help='mean history_answers length per Telegram user')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    data = generate(args.web_users, args.tg_users, args.linked, args.clan_share, args.days, args.dau,
+                    args.history, args.seed)
+    size = write(data, args.output)
+    print(f"{args.output}: {len(data['web_users'])} web users, {len(data['tg_users'])} Telegram users "
+          f"({len(data['tg_links'])} linked), {len(data['clans'])} clans, {len(data['daily_activity'])} days, "
+          f"{size / 2 ** 20:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load test: drive a realistic traffic mix against the Flask API with the LLM stubbed out.
+
+The server runs either as a subprocess (gunicorn with gunicorn.conf.py when
+installed, `python server.py` otherwise) or in process (werkzeug threaded
+server). Either way it gets a throwaway user store (DATA_FILE). OpenAI calls
+go to a local stub (OPENAI_BASE_URL). The stub streams a catalog scenario
+with a configurable delay, so scenario generation costs what the real model
+costs in time, without spending tokens.
+
+Each virtual user has its own client IP (X-Forwarded-For), so the per-IP
+rate limits behave as they would for real students. A user registers, logs
+in, joins a clan, then loops over weighted actions:
+    register, login, check_session, scenario, clan_activity, leaderboard
+
+Requests reuse one keep-alive connection per user, which gunicorn keeps on
+one worker. Login and check_session go out on fresh connections instead, so
+with --workers > 1 they can land on any worker, like a browser's would, and
+a session that only one worker knows shows up as a check_session error.
+
+The report is printed and optionally written as JSON: throughput,
+p50/p95/p99 latency and error rate, overall and per action. 429s are counted
+apart from errors. --compare prints the change against a previous report.
+
+Usage:
+    python benchmarks/loadtest.py [--concurrency 20] [--duration 30] [--mode subprocess|inprocess]
+                                  [--workers 1] [--threads 32] [--llm-latency 1.5]
+                                  [--mix leaderboard=30,check_session=25,...]
+                                  [--output run.json] [--compare baseline.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from content_catalog import ContentCatalog  # noqa: E402
+
+DEFAULT_MIX = {'register': 5, 'login': 15, 'check_session': 25, 'scenario': 10, 'clan_activity': 15,
+               'leaderboard': 30}
+CHARACTERS = ('Абылай хан', 'Төле би', 'Қазыбек би', 'Әйтеке би')
+CLANS = 8
+
+
+# ===== STUB LLM =====
+
+class StubLLM:
+    """Minimal OpenAI-compatible /v1/chat/completions that streams catalog scenarios"""
+
+    def __init__(self, latency=1.5, chunks=40):
+        catalog = ContentCatalog(os.path.join(ROOT, 'fallback_content.json'))
+        self.payloads = [json.dumps(catalog.scenario(c, n, 'kk'), ensure_ascii=False)
+                         for c in CHARACTERS for n in (1, 2, 3)]
+        self.latency = latency
+        self.chunks = chunks
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                stub.respond(self, body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}/v1'
+
+    def respond(self, handler, body):
+        content = random.choice(self.payloads)
+        created = int(time.time())
+        if not body.get('stream'):
+            time.sleep(self.latency)
+            data = json.dumps({
+                'id': 'stub', 'object': 'chat.completion', 'created': created, 'model': body.get('model', 'stub'),
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': 300, 'completion_tokens': len(content) // 4,
+                          'total_tokens': 300 + len(content) // 4},
+            }, ensure_ascii=False).encode('utf-8')
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'application/json')
+            handler.send_header('Content-Length', str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+            return
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+        step = max(1, len(content) // self.chunks)
+        try:
+            for start in range(0, len(content), step):
+                time.sleep(self.latency / self.chunks)
+                chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': created, 'model': 'stub',
+                         'choices': [{'index': 0, 'delta': {'content': content[start:start + step]},
+                                      'finish_reason': None}]}
+                handler.wfile.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+                handler.wfile.flush()
+            handler.wfile.write(b'data: [DONE]\n\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass        # the server stops reading once the JSON object is complete
+        handler.close_connection = True
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ===== SERVER UNDER TEST =====
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_healthy(base_url, timeout=60, process=None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f'server exited with code {process.returncode}')
+        try:
+            if requests.get(base_url + '/health', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f'server at {base_url} did not become healthy in {timeout}s')
+
+
+def server_env(workdir, llm_url, args):
+    return {
+        'DATA_FILE': os.path.join(workdir, 'unified_users.json'),
+        'LLM_USAGE_LOG': os.path.join(workdir, 'llm_usage.jsonl'),
+        'SOURCE_CACHE_DIR': os.path.join(workdir, '.source_cache'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+        'PROFILE_DIR': os.path.join(workdir, 'profiles'),
+        'OPENAI_API_KEY': 'stub-key',
+        'OPENAI_BASE_URL': llm_url,
+        'WEB_CONCURRENCY': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_LOG_LEVEL': 'warning',
+        'FLASK_ENV': 'production',
+    }
+
+
+def start_subprocess(workdir, env, port):
+    env = dict(os.environ, **env, PORT=str(port), PYTHONPATH=ROOT)
+    if shutil.which('gunicorn'):
+        cmd = ['gunicorn', 'server:app', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), '--access-logfile', os.devnull]
+    else:
+        print('(gunicorn not installed: using the Flask development server)')
+        cmd = [sys.executable, os.path.join(ROOT, 'server.py')]
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        _wait_healthy(base_url, process=process)
+    except SystemExit:
+        process.kill()
+        log.close()
+        with open(log.name, 'r', encoding='utf-8', errors='replace') as f:
+            print(f.read()[-3000:])
+        raise
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+    return base_url, stop, ' '.join(cmd)
+
+
+def start_inprocess(env, port):
+    os.environ.update(env)
+    from werkzeug.serving import make_server
+    import server
+    httpd = make_server('127.0.0.1', port, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{port}'
+    _wait_healthy(base_url)
+    return base_url, httpd.shutdown, 'werkzeug (in process)'
+
+
+# ===== VIRTUAL USERS =====
+
+class VirtualUser(threading.Thread):
+    def __init__(self, index, base_url, mix, stop_at, run_id):
+        super().__init__(name=f'vu-{index}', daemon=True)
+        self.index = index
+        self.base_url = base_url
+        self.actions, self.weights = zip(*mix.items())
+        self.stop_at = stop_at
+        self.run_id = run_id
+        self.rng = random.Random(index)
+        self.http = requests.Session()
+        self.http.headers['X-Forwarded-For'] = f'10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}'
+        self.signups = itertools.count()
+        self.records = []       # (action, seconds, status, ok)
+        self.email = None
+        self.password = 'load-test-pass'
+        self.session_id = None
+
+    def call(self, action, method, path, payload=None, check=None, fresh=False):
+        """One request; `fresh` opens a new connection instead of the user's keep-alive one"""
+        started = time.perf_counter()
+        try:
+            if fresh:
+                response = requests.request(method, self.base_url + path, json=payload, timeout=60,
+                                            headers=dict(self.http.headers, Connection='close'))
+            else:
+                response = self.http.request(method, self.base_url + path, json=payload, timeout=60)
+            status = response.status_code
+            data = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else {}
+            ok = status < 400 and (check is None or check(data))
+        except (requests.RequestException, ValueError):
+            status, data, ok = 0, {}, False
+        self.records.append((action, time.perf_counter() - started, status, ok))
+        return data if ok else None
+
+    def register(self):
+        email = f'vu{self.index}-{next(self.signups)}-{self.run_id}@load.test'
+        data = self.call('register', 'POST', '/api/register',
+                         {'name': f'Load User {self.index}', 'email': email, 'password': self.password},
+                         lambda d: d.get('success'))
+        if data and self.email is None:
+            self.email = email
+
+    def login(self):
+        if self.email is None:
+            return self.register()
+        data = self.call('login', 'POST', '/api/login', {'email': self.email, 'password': self.password},
+                         lambda d: d.get('success') and d.get('session_id'), fresh=True)
+        if data:
+            self.session_id = data['session_id']
+
+    def check_session(self):
+        if self.session_id is None:
+            return self.login()
+        self.call('check_session', 'POST', '/api/check-session', {'session_id': self.session_id},
+                  lambda d: d.get('valid'), fresh=True)
+
+    def scenario(self):
+        self.call('scenario', 'POST', '/api/mission/generate-scenario',
+                  {'character': self.rng.choice(CHARACTERS), 'level': self.rng.randint(1, 4),
+                   'scenarioNumber': self.rng.randint(1, 3), 'language': 'kk'},
+                  lambda d: d.get('success') and d.get('scenario'))
+
+    def clan_activity(self):
+        if self.email is None:
+            return self.register()
+        self.call('clan_activity', 'POST', '/api/clans/activity',
+                  {'email': self.email, 'mission_completed': self.rng.random() < 0.8,
+                   'mission_skipped': False}, lambda d: d.get('success'))
+
+    def leaderboard(self):
+        self.call('leaderboard', 'GET', '/api/clans/leaderboard?limit=10', check=lambda d: d.get('success'))
+
+    def run(self):
+        self.register()
+        self.login()
+        if self.email:
+            self.call('join_clan', 'POST', '/api/clans/join',
+                      {'email': self.email, 'name': f'Load clan {self.index % CLANS}'}, lambda d: d.get('success'))
+        while time.time() < self.stop_at:
+            action = self.rng.choices(self.actions, self.weights)[0]
+            getattr(self, action)()
+
+
+# ===== REPORT =====
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(records, seconds):
+    latencies = sorted(r[1] for r in records)
+    errors = sum(1 for r in records if not r[3] and r[2] != 429)
+    rate_limited = sum(1 for r in records if r[2] == 429)
+    statuses = {}
+    for r in records:
+        statuses[str(r[2])] = statuses.get(str(r[2]), 0) + 1
+    return {
+        'requests': len(records),
+        'throughput_rps': round(len(records) / seconds, 2) if seconds else 0,
+        'errors': errors,
+        'error_rate': round(errors / len(records), 4) if records else 0,
+        'rate_limited': rate_limited,
+        'status_counts': dict(sorted(statuses.items())),
+        'latency_ms': {
+            'p50': _ms(percentile(latencies, 50)), 'p95': _ms(percentile(latencies, 95)),
+            'p99': _ms(percentile(latencies, 99)),
+            'mean': _ms(sum(latencies) / len(latencies)) if latencies else None,
+            'max': _ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def print_report(report, baseline=None):
+    def row(name, stats, base):
+        lat = stats['latency_ms']
+        line = (f"{name:<15}{stats['requests']:>8}{stats['throughput_rps']:>10.1f}{lat['p50'] or 0:>10.1f}"
+                f"{lat['p95'] or 0:>10.1f}{lat['p99'] or 0:>10.1f}{stats['error_rate']:>9.2%}{stats['rate_limited']:>7}")
+        if base:
+            rps, p95 = base['throughput_rps'], base['latency_ms']['p95']
+            line += f"  rps {_delta(stats['throughput_rps'], rps)}  p95 {_delta(lat['p95'], p95)}"
+        return line
+
+    print(f"\n{'action':<15}{'reqs':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}{'429':>7}")
+    base_endpoints = (baseline or {}).get('endpoints', {})
+    for name, stats in report['endpoints'].items():
+        print(row(name, stats, base_endpoints.get(name)))
+    print(row('TOTAL', report['overall'], (baseline or {}).get('overall')))
+
+
+def _delta(new, old):
+    if not old or new is None:
+        return '   n/a'
+    return f'{(new - old) / old:+6.1%}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the API against a stubbed LLM')
+    parser.add_argument('--concurrency', type=int, default=20, help='virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of traffic')
+    parser.add_argument('--mode', choices=('subprocess', 'inprocess'), default='subprocess')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers (subprocess mode)')
+    parser.add_argument('--threads', type=int, default=32, help='threads per gunicorn worker')
+    parser.add_argument('--llm-latency', type=float, default=1.5, help='seconds the stub takes per completion')
+    parser.add_argument('--mix', help='weights, e.g. leaderboard=30,check_session=25 (default: built-in mix)')
+    parser.add_argument('--url', help='test an already running server instead of starting one')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='previous JSON report to compare against')
+    args = parser.parse_args()
+
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix = {}
+        for item in args.mix.split(','):
+            name, _, weight = item.partition('=')
+            if name.strip() not in DEFAULT_MIX:
+                parser.error(f'unknown action {name!r}; choose from {", ".join(DEFAULT_MIX)}')
+            mix[name.strip()] = float(weight or 1)
+
+    stub = StubLLM(latency=args.llm_latency).start()
+    workdir = tempfile.mkdtemp(prefix='batyrbol-load-')
+    try:
+        if args.url:
+            base_url, stop_server, server_cmd = args.url.rstrip('/'), (lambda: None), 'external'
+        elif args.mode == 'subprocess':
+            base_url, stop_server, server_cmd = start_subprocess(workdir, server_env(workdir, stub.base_url, args),
+                                                                 _free_port())
+        else:
+            base_url, stop_server, server_cmd = start_inprocess(server_env(workdir, stub.base_url, args), _free_port())
+
+        try:
+            # Clans for the virtual users to join (one leader each: a user is in one clan at a time)
+            setup = requests.Session()
+            for i in range(CLANS):
+                leader = f'leader{i}@load.test'
+                setup.post(base_url + '/api/register', json={'name': f'Load Leader {i}', 'email': leader,
+                                                              'password': 'load-test-pass'})
+                setup.post(base_url + '/api/clans/create', json={'email': leader, 'name': f'Load clan {i}'})
+
+            run_id = f'{int(time.time()):x}'
+            started = time.time()
+            users = [VirtualUser(i, base_url, mix, started + args.duration, run_id) for i in range(args.concurrency)]
+            for user in users:
+                user.start()
+            for user in users:
+                user.join()
+            elapsed = time.time() - started
+        finally:
+            stop_server()
+    finally:
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    records = [r for user in users for r in user.records]
+    by_action = {}
+    for r in records:
+        by_action.setdefault(r[0], []).append(r)
+    report = {
+        'started_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+        'config': {'concurrency': args.concurrency, 'duration_s': args.duration, 'mode': args.mode,
+                   'workers': args.workers, 'threads': args.threads, 'llm_latency_s': args.llm_latency,
+                   'mix': mix, 'server': server_cmd},
+        'elapsed_s': round(elapsed, 2),
+        'overall': summarize(records, elapsed),
+        'endpoints': {name: summarize(rows, elapsed) for name, rows in sorted(by_action.items())},
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'\nreport written to {args.output}')
+    return 0 if report['overall']['requests'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
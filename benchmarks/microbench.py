@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks of the hot Python paths, on synthetic data.
+
+Cases:
+    store.load / store.save        server.load_users()/save_users() on a 1k/10k/100k-user store
+    rate_limit.*                   server._rate_limit() with 10k client IPs already tracked
+    leaderboard.*                  ranking clans by their XP totals, a top-20 page of the ranking,
+                                   and reconciling the totals against every member's record
+    learning.*                     AdaptiveLearningModel question generation, answer evaluation
+                                   and error analysis over 1k/10k/100k-answer histories
+    bot.match_mission              bb_bot.match_mission() over a day of missions (skipped
+                                   when python-telegram-bot is not installed)
+
+Every case is warmed up, then timed `--repeats` times; each repeat runs the
+case enough times to last at least `--min-time` seconds (like timeit), and
+the per-call median, mean, stdev and min are reported. --save writes the
+results as JSON (commit them under benchmarks/baselines/), --compare prints
+the change against such a file and exits with 1 when a case got slower by
+more than --threshold percent.
+
+Usage:
+    python benchmarks/microbench.py [-k store] [--sizes 1000,10000] [--repeats 7]
+                                    [--save benchmarks/baselines/NAME.json]
+                                    [--compare benchmarks/baselines/NAME.json] [--threshold 15]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+TRACKED_IPS = 10000
+TOPICS = ('Қазақ хандығы', 'Абылай хан', 'Жоңғар шапқыншылығы', 'Төле би', 'Алаш', 'Тәуелсіздік')
+LEVELS = ('beginner', 'intermediate', 'advanced')
+
+
+# ===== SYNTHETIC DATA =====
+
+def make_store(n_users, users_per_clan=20, seed=1):
+    """unified_users.json-shaped store with `n_users` web users spread over clans"""
+    rng = random.Random(seed)
+    start = datetime(2025, 9, 1)
+    web_users, clans = {}, {}
+    for i in range(n_users):
+        email = f'student{i:06d}@school.kz'
+        web_users[email] = {
+            'name': f'Оқушы {i}',
+            'email': email,
+            'password_hash': 'pbkdf2:sha256:600000$' + '%016x' % rng.getrandbits(64) + '$' + '%064x' % rng.getrandbits(256),
+            'xp': rng.randint(0, 5000),
+            'level': rng.randint(1, 20),
+            'clan': None,
+            'completed_missions': [f'mission_{rng.randint(1, 300)}' for _ in range(rng.randint(0, 15))],
+            'created_at': (start + timedelta(minutes=i)).isoformat(),
+            'last_login': (start + timedelta(days=rng.randint(0, 60))).isoformat(),
+        }
+    emails = list(web_users)
+    for c in range(max(1, n_users // users_per_clan)):
+        members = emails[c * users_per_clan:(c + 1) * users_per_clan]
+        name = f'Клан {c:05d}'
+        clans[name] = {'name': name, 'leader': members[0] if members else '', 'members': members,
+                       'xp': 0, 'created_at': start.isoformat()}
+        for email in members:
+            web_users[email]['clan'] = name
+    return {'web_users': web_users, 'tg_links': {}, 'clans': clans}
+
+
+def make_history(n, seed=2):
+    """Answer history entries as the learning model stores them"""
+    rng = random.Random(seed)
+    return [{'question_id': f'q_{i}', 'topic': rng.choice(TOPICS), 'difficulty': rng.choice(LEVELS),
+             'level': rng.choice(LEVELS), 'correct': rng.random() < 0.65,
+             'timestamp': f'2025-10-{1 + i % 28:02d}T12:00:00'} for i in range(n)]
+
+
+def make_missions(n=20, seed=3):
+    """A bot day of missions; answers are lower-case keyword lists, like MISSIONS"""
+    rng = random.Random(seed)
+    words = [w.lower() for topic in TOPICS for w in topic.split()] + ['1465', '1723', '1991', 'түркістан']
+    return [{'text': f'Миссия {i}', 'type': 'text', 'answers': rng.sample(words, 3)} for i in range(n)]
+
+
+# ===== TIMING =====
+
+def measure(fn, repeats=7, warmup=1, min_time=0.05):
+    """Per-call timings of fn() in seconds: {'number', 'min', 'median', 'mean', 'stdev'}"""
+    for _ in range(warmup):
+        fn()
+    number = 1
+    while True:     # calibrate calls per repeat
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - started >= min_time or number >= 1 << 20:
+            break
+        number *= 10
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return {'number': number, 'min': min(samples), 'median': statistics.median(samples),
+            'mean': statistics.fmean(samples), 'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0}
+
+
+# ===== CASES =====
+# Each group yields (name, fn) pairs; it may patch module state around the yield.
+
+def store_cases(sizes, workdir):
+    import server
+    saved_file = server.data_file
+    try:
+        for n in sizes:
+            store = make_store(n)
+            server.data_file = os.path.join(workdir, f'users_{n}.json')
+            server.save_users(store)
+            yield f'store.load[{n}]', server.load_users
+            yield f'store.save[{n}]', lambda store=store: server.save_users(store)
+    finally:
+        server.data_file = saved_file
+
+
+def rate_limit_cases(sizes, workdir):
+    import server
+    rng = random.Random(4)
+    ips = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(TRACKED_IPS)]
+    now = time.time()
+    saved_buckets, saved_client_ip = dict(server._rate_buckets), server._client_ip
+    server._rate_buckets.clear()
+    for ip in ips:      # every IP partway through a 60 s window
+        server._rate_buckets[f'login:{ip}'] = sorted(now - rng.uniform(0, 50) for _ in range(rng.randint(1, 25)))
+    cycle = iter(lambda: rng.choice(ips), None)
+    try:
+        server._client_ip = lambda: next(cycle)
+        yield f'rate_limit.login[{TRACKED_IPS} ips]', lambda: server._rate_limit('login', limit=30, window_seconds=60)
+        server._client_ip = lambda: ips[0]
+        server._rate_buckets[f'busy:{ips[0]}'] = [now] * 40
+        yield 'rate_limit.limited_ip', lambda: server._rate_limit('busy', limit=40, window_seconds=3600)
+    finally:
+        server._client_ip = saved_client_ip
+        server._rate_buckets.clear()
+        server._rate_buckets.update(saved_buckets)
+
+
+def leaderboard_cases(sizes, workdir):
+    from clan_xp import ClanRanking, reconcile, store_member_xp
+    for n in sizes:
+        store = make_store(n)
+        member_xp = store_member_xp(store)
+        reconcile(store['clans'], member_xp)
+        ranking = ClanRanking()
+
+        def rank(store=store, ranking=ranking):
+            ranking.reset(store['clans'], None)
+            return ranking.page(20)
+
+        yield f'leaderboard.rank[{n}]', rank
+        yield f'leaderboard.top20[{n}]', lambda ranking=ranking: ranking.page(20)
+        yield f'leaderboard.reconcile[{n}]', lambda store=store, member_xp=member_xp: reconcile(
+            store['clans'], member_xp, fix=False)
+
+
+def learning_cases(sizes, workdir):
+    from learning_model import AdaptiveLearningModel
+    model = AdaptiveLearningModel()
+    content = model.content_database['history'][0]
+    for level in LEVELS:
+        yield f'learning.generate_questions[{level}]', lambda level=level: model.generate_questions(content, level, 3)
+    question = model.generate_questions(content, 'beginner', 1)[0]
+    for n in sizes:
+        history = make_history(n)
+        yield f'learning.evaluate_answer[{n}]', lambda history=history: model.evaluate_answer(
+            question, 'жоқ білмеймін', history)
+        yield f'learning.analyze_user_errors[{n}]', lambda history=history: model.analyze_user_errors('u1', history)
+
+
+def bot_cases(sizes, workdir):
+    try:
+        from bb_bot import match_mission
+    except ImportError as e:
+        print(f'[SKIP] bot.*: {e}')
+        return
+    missions = make_missions()
+    done = set(range(0, len(missions), 2))
+    yield 'bot.match_mission[miss]', lambda: match_mission(missions, done, 'мен бұл сұрақтың жауабын білмеймін')
+    last = missions[-1]['answers'][0]
+    yield 'bot.match_mission[last]', lambda: match_mission(missions, done, f'менің ойымша {last}')
+
+
+GROUPS = (store_cases, rate_limit_cases, leaderboard_cases, learning_cases, bot_cases)
+
+
+# ===== REPORT =====
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:8.2f} {unit}'
+    return f'{seconds / 1e-9:8.0f} ns'
+
+
+def compare(results, baseline, threshold):
+    """Print per-case change of the median; names of cases slower than `threshold` percent"""
+    regressions = []
+    print(f"\nvs {baseline.get('commit') or '?'} ({baseline.get('created_at', '?')}):")
+    for name, result in results.items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            print(f'  {name:42s}      new')
+            continue
+        change = (result['median'] / old['median'] - 1) * 100 if old['median'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"  {name:42s} {_format_time(old['median'])} -> {_format_time(result['median'])} {change:+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='filters', action='append', default=[],
+                        help='run cases whose name contains this text (repeatable)')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='store users / history lengths, comma-separated')
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds per repeat, at least')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=15.0, help='percent slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    workdir = tempfile.mkdtemp(prefix='microbench-')
+    os.environ.setdefault('DATA_FILE', os.path.join(workdir, 'unified_users.json'))
+    results = {}
+    print(f"{'case':42s} {'median':>11s} {'min':>11s} {'stdev':>11s} {'calls':>8s}")
+    try:
+        for group in GROUPS:
+            for name, fn in group(sizes, workdir):
+                if args.filters and not any(f in name for f in args.filters):
+                    continue
+                result = measure(fn, args.repeats, args.warmup, args.min_time)
+                results[name] = {k: round(v, 9) if isinstance(v, float) else v for k, v in result.items()}
+                print(f"{name:42s} {_format_time(result['median'])} {_format_time(result['min'])} "
+                      f"{_format_time(result['stdev'])} {result['number']:8d}", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': f'{platform.system()} {platform.machine()}',
+        'config': {'sizes': sizes, 'repeats': args.repeats, 'warmup': args.warmup, 'min_time': args.min_time},
+        'results': results,
+    }
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'\nresults written to {args.save}')
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Production build of the static front-end into dist/.
+
+- JS and CSS are minified (rjsmin / rcssmin when installed, otherwise a
+  conservative built-in minifier that only drops comments and whitespace).
+- Scripts, styles and images get content-hashed names (game_engine.3f2a9c1b7d.js)
+  and are served with `Cache-Control: immutable` by static_assets.py.
+- HTML pages are copied with their src/href/url() references rewritten to the
+  hashed names; <img> tags of images with responsive derivatives
+  (build_images.py) become <picture> elements with AVIF/WebP srcsets, and
+  CSS background-image url()s of those images (stylesheets and inline
+  <style>) get an image-set() override.
+- Text files get .gz (and .br when `brotli` is installed) siblings.
+- sw.js is regenerated: CACHE_NAME carries the build version and the
+  precache list points at the hashed files.
+- dist/asset-manifest.json describes everything for the server.
+
+Usage:
+    python build_assets.py [--out dist]
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+
+import build_images
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(SOURCE_DIR, 'dist')
+MANIFEST_NAME = 'asset-manifest.json'
+
+PAGE_PATTERNS = ('*.html',)
+ASSET_PATTERNS = ('*.js', '*.css', '*.png', '*.ico', 'styles/*', 'assets/**/*')
+PLAIN_FILES = ('manifest.json',)            # referenced by fixed name (PWA manifest)
+SERVICE_WORKER = 'sw.js'
+TEXT_EXTENSIONS = ('.js', '.css', '.html', '.json', '.svg', '.txt')
+HASH_LENGTH = 10
+
+_REF_RE = re.compile(r'''((?:src|href)\s*=\s*["']|url\(\s*["']?)([^"')\s]+)''', re.IGNORECASE)
+
+
+# ===== MINIFICATION =====
+
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+                   'case', 'do', 'else', 'yield', 'await'}
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch in '_$\\' or ord(ch) > 127
+
+
+def _regex_allowed(out):
+    """Whether a '/' after the emitted code starts a regex literal (not a division)"""
+    tail = ''.join(out[-12:]).rstrip(' \n')
+    if not tail or tail[-1] in _REGEX_PRECEDERS:
+        return True
+    if _is_word(tail[-1]):
+        word = re.search(r'[\w$]+$', tail)
+        return bool(word) and word.group(0) in _REGEX_KEYWORDS
+    return False
+
+
+def _emit_space(out, newline):
+    """Collapse whitespace; keep a newline (ASI) or a space only where tokens would merge"""
+    if not out:
+        return
+    if newline:
+        while out and out[-1] == ' ':
+            out.pop()
+        if out and out[-1] != '\n':
+            out.append('\n')
+    elif out[-1] not in ' \n':
+        out.append(' ')
+
+
+def _tidy(out, ch):
+    """Drop a pending space before `ch` unless the two tokens would merge"""
+    if out and out[-1] == ' ' and len(out) > 1:
+        prev = out[-2][-1]
+        if not ((_is_word(prev) and (_is_word(ch) or ch == '.')) or (prev in '+-' and ch == prev)
+                or (prev == '/' and ch == '/')):
+            out.pop()
+
+
+def minify_js(source):
+    """
+    Remove comments and redundant whitespace. Line breaks are kept so automatic
+    semicolon insertion behaves exactly as in the original.
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+    out = []
+    braces = []          # brace depth of each open template ${...} expression
+    i, n = 0, len(source)
+    in_template = False
+    while i < n:
+        ch = source[i]
+        if in_template:
+            j = i
+            while j < n and source[j] != '`' and not source.startswith('${', j):
+                j += 2 if source[j] == '\\' else 1
+            if j > i:
+                out.append(source[i:j])
+            if j >= n:
+                break
+            if source[j] == '`':
+                out.append('`')
+                in_template = False
+                i = j + 1
+            else:
+                out.append('${')
+                braces.append(0)
+                in_template = False
+                i = j + 2
+            continue
+        if ch in ' \t\r\n\f\v':
+            j = i
+            while j < n and source[j] in ' \t\r\n\f\v':
+                j += 1
+            _emit_space(out, '\n' in source[i:j])
+            i = j
+            continue
+        if ch == '/' and source.startswith('//', i):
+            j = source.find('\n', i)
+            i = n if j < 0 else j
+            continue
+        if ch == '/' and source.startswith('/*', i):
+            j = source.find('*/', i + 2)
+            end = n if j < 0 else j + 2
+            _emit_space(out, '\n' in source[i:end])
+            i = end
+            continue
+        _tidy(out, ch)
+        if ch in '"\'':
+            j = i + 1
+            while j < n and source[j] != ch and source[j] != '\n':
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            continue
+        if ch == '`':
+            out.append('`')
+            in_template = True
+            i += 1
+            continue
+        if ch == '/' and _regex_allowed(out):
+            j, in_class = i + 1, False
+            while j < n and source[j] != '\n':
+                c = source[j]
+                if c == '\\':
+                    j += 2
+                    continue
+                if c == '[':
+                    in_class = True
+                elif c == ']':
+                    in_class = False
+                elif c == '/' and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < n and _is_word(source[j]):      # flags
+                j += 1
+            out.append(source[i:j])
+            i = j
+            continue
+        if braces:
+            if ch == '{':
+                braces[-1] += 1
+            elif ch == '}':
+                if braces[-1] == 0:
+                    braces.pop()
+                    out.append('}')
+                    in_template = True
+                    i += 1
+                    continue
+                braces[-1] -= 1
+        out.append(ch)
+        i += 1
+    return ''.join(out).strip() + '\n'
+
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+_CSS_STRING_RE = re.compile(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')''')
+
+
+def minify_css(source):
+    """Remove comments and whitespace that never changes how CSS parses"""
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+    parts = _CSS_STRING_RE.split(source)
+    for k in range(0, len(parts), 2):          # even parts are outside strings
+        text = _CSS_COMMENT_RE.sub('', parts[k])
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+        parts[k] = text.replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+
+# ===== BUILD =====
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(rel_path, digest):
+    root, ext = posixpath.splitext(rel_path)
+    return f'{root}.{digest}{ext}'
+
+
+def _collect(source_dir, patterns):
+    found = []
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(source_dir, pattern), recursive=True):
+            if os.path.isfile(path):
+                found.append(os.path.relpath(path, source_dir).replace(os.sep, '/'))
+    return sorted(set(found))
+
+
+def rewrite_references(text, rel_path, assets):
+    """Point src/href/url() references that resolve to a built asset at its hashed name"""
+    base = posixpath.dirname(rel_path)
+
+    def replace(match):
+        prefix, ref = match.groups()
+        target = re.split(r'[?#]', ref, 1)[0]
+        if not target or '://' in target or target.startswith(('data:', '//', 'mailto:', '#')):
+            return match.group(0)
+        resolved = posixpath.normpath(target[1:] if target.startswith('/') else posixpath.join(base, target))
+        hashed = assets.get(resolved)
+        if not hashed:
+            return match.group(0)
+        return prefix + ref.replace(posixpath.basename(target), posixpath.basename(hashed), 1)
+
+    return _REF_RE.sub(replace, text)
+
+
+def precompress(path, data):
+    """Write .gz / .br siblings that are actually smaller; returns the encodings written"""
+    encodings = []
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            with open(path + '.br', 'wb') as f:
+                f.write(compressed)
+            encodings.append('br')
+    compressed = gzip.compress(data, 9, mtime=0)
+    if len(compressed) < len(data):
+        with open(path + '.gz', 'wb') as f:
+            f.write(compressed)
+        encodings.append('gzip')
+    return encodings
+
+
+def render_service_worker(template, version, assets):
+    """sw.js with a versioned CACHE_NAME and the precache list mapped to hashed files"""
+    def precache(match):
+        urls = re.findall(r"['\"]([^'\"]+)['\"]", match.group(2))
+        mapped = ['/' + assets.get(u.lstrip('/'), u.lstrip('/')) if u != '/' else u for u in urls]
+        mapped += ['/' + hashed for source, hashed in sorted(assets.items())
+                   if source.endswith(('.js', '.css')) and '/' + hashed not in mapped]
+        return match.group(1) + ''.join(f"\n  '{u}'," for u in mapped).rstrip(',') + '\n' + match.group(3)
+
+    text = re.sub(r"(const CACHE_NAME = )['\"][^'\"]*['\"]", rf"\g<1>'batyrbol-{version}'", template, count=1)
+    return re.sub(r'(const urlsToCache = \[)(.*?)(\];)', precache, text, count=1, flags=re.DOTALL)
+
+
+def _write(out_dir, rel_path, data, files, kind):
+    path = os.path.join(out_dir, *rel_path.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    encodings = precompress(path, data) if rel_path.endswith(TEXT_EXTENSIONS) else []
+    files[rel_path] = {'type': kind, 'hash': content_hash(data), 'size': len(data), 'encodings': encodings}
+
+
+def build(source_dir=SOURCE_DIR, out_dir=DIST_DIR):
+    """Build dist/ from scratch and return the manifest"""
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    assets, files = {}, {}
+    responsive = build_images.OUTPUT_DIR + '/'
+    sources = [p for p in _collect(source_dir, ASSET_PATTERNS)
+               if p != SERVICE_WORKER and not p.startswith(responsive)]
+    # Stylesheets may reference images, so images and scripts are hashed first
+    image_manifest = build_images.load_manifest(source_dir)
+    for rel_path in sorted(sources, key=lambda p: p.endswith('.css')):
+        with open(os.path.join(source_dir, rel_path), 'rb') as f:
+            data = f.read()
+        if rel_path.endswith('.js'):
+            data = minify_js(data.decode('utf-8')).encode('utf-8')
+        elif rel_path.endswith('.css'):
+            text = build_images.add_image_set(data.decode('utf-8'), rel_path, image_manifest)
+            text = rewrite_references(text, rel_path, assets)
+            data = minify_css(text).encode('utf-8')
+        assets[rel_path] = hashed_name(rel_path, content_hash(data))
+        _write(out_dir, assets[rel_path], data, files, 'asset')
+
+    # Image derivatives already carry a content hash in their names
+    for entry in image_manifest['images'].values():
+        for variants in entry['formats'].values():
+            for variant in variants:
+                with open(os.path.join(source_dir, *variant['path'].split('/')), 'rb') as f:
+                    _write(out_dir, variant['path'], f.read(), files, 'asset')
+
+    for rel_path in _collect(source_dir, PAGE_PATTERNS):
+        with open(os.path.join(source_dir, rel_path), 'r', encoding='utf-8') as f:
+            html = build_images.add_srcset(f.read(), rel_path, image_manifest)
+        html = build_images.add_image_set(html, rel_path, image_manifest)
+        html = rewrite_references(html, rel_path, assets)
+        _write(out_dir, rel_path, html.encode('utf-8'), files, 'page')
+
+    for rel_path in PLAIN_FILES:
+        if os.path.isfile(os.path.join(source_dir, rel_path)):
+            with open(os.path.join(source_dir, rel_path), 'rb') as f:
+                _write(out_dir, rel_path, f.read(), files, 'page')
+
+    version = content_hash(''.join(f"{name}:{entry['hash']}\n" for name, entry in sorted(files.items())).encode('utf-8'))
+    sw_path = os.path.join(source_dir, SERVICE_WORKER)
+    if os.path.isfile(sw_path):
+        with open(sw_path, 'r', encoding='utf-8') as f:
+            sw = render_service_worker(f.read(), version, assets)
+        _write(out_dir, SERVICE_WORKER, sw.encode('utf-8'), files, 'page')
+
+    manifest = {'version': version, 'assets': assets, 'files': files}
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build fingerprinted, precompressed static assets')
+    parser.add_argument('--out', default=DIST_DIR)
+    args = parser.parse_args(argv)
+
+    manifest = build(SOURCE_DIR, args.out)
+    source_bytes = sum(os.path.getsize(os.path.join(SOURCE_DIR, p)) for p in manifest['assets'])
+    built_bytes = sum(manifest['files'][h]['size'] for h in manifest['assets'].values())
+    print(f"[BUILD] {len(manifest['assets'])} assets ({source_bytes // 1024} KB -> {built_bytes // 1024} KB minified), "
+          f"{sum(1 for f in manifest['files'].values() if f['type'] == 'page')} pages, version {manifest['version']}")
+    print(f"[BUILD] Manifest written to {os.path.join(args.out, MANIFEST_NAME)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the static asset build (build_assets.py)
+"""
+
+import gzip
+import json
+import os
+import tempfile
+
+from build_assets import build, minify_css, minify_js, render_service_worker, rewrite_references
+
+SW = """const CACHE_NAME = 'batyrbol-v1';
+const urlsToCache = [
+  '/',
+  '/app.js',
+  '/manifest.json'
+];
+self.addEventListener('install', () => {});
+"""
+
+
+def test_minify_js_keeps_strings_regexes_and_templates():
+    source = '''
+    // leading comment
+    const url = "http://example.com/*not a comment*/";   /* block */
+    const re = /\\/\\/[a-z]+/g, half = total / 2 / count;
+    const msg = `Hi ${user.name} // still ${`nested ${x}`} text`;
+    let a = b
+    ++c
+    return typeof x === 'string' ? - -y : x + +z;
+    '''
+    out = minify_js(source)
+    assert 'leading comment' not in out and 'block' not in out
+    assert '"http://example.com/*not a comment*/"' in out
+    assert '/\\/\\/[a-z]+/g' in out and 'total/2/count' in out
+    assert '`Hi ${user.name} // still ${`nested ${x}`} text`' in out
+    assert 'let a=b\n++c' in out
+    assert "typeof x==='string'?- -y:x+ +z" in out
+
+
+def test_minify_css():
+    out = minify_css('/* theme */\n.a > .b ,\n.c:hover  {\n  color : red;\n  content: "a  ;  b";\n}\n')
+    assert out == '.a>.b,.c:hover{color : red;content: "a  ;  b"}\n'
+
+
+def test_rewrite_references_resolves_relative_paths():
+    assets = {'app.js': 'app.1234.js', 'assets/img/logo.png': 'assets/img/logo.abcd.png'}
+    html = '<script src="app.js?v=2"></script><img src="/assets/img/logo.png"><a href="https://x/app.js">'
+    assert rewrite_references(html, 'index.html', assets) == \
+        '<script src="app.1234.js?v=2"></script><img src="/assets/img/logo.abcd.png"><a href="https://x/app.js">'
+    css = '.hero { background: url("../assets/img/logo.png") }'
+    assert rewrite_references(css, 'styles/site.css', assets) == \
+        '.hero { background: url("../assets/img/logo.abcd.png") }'
+
+
+def test_service_worker_is_versioned():
+    sw = render_service_worker(SW, 'abc123', {'app.js': 'app.1234.js', 'extra.css': 'extra.99.css'})
+    assert "const CACHE_NAME = 'batyrbol-abc123';" in sw
+    assert "'/app.1234.js'" in sw and "'/extra.99.css'" in sw and "'/manifest.json'" in sw
+    assert "'/app.js'" not in sw
+
+
+def test_build_writes_hashed_precompressed_files():
+    with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as out:
+        files = {
+            'app.js': 'function hello() {\n  // greet\n  return "сәлем";\n}\n' * 20,
+            'index.html': '<html><script src="app.js"></script></html>',
+            'sw.js': SW,
+            'manifest.json': '{"name": "BATYR BOL"}',
+        }
+        for name, text in files.items():
+            with open(os.path.join(src, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+
+        manifest = build(src, out)
+        hashed = manifest['assets']['app.js']
+        assert hashed.startswith('app.') and hashed.endswith('.js') and hashed != 'app.js'
+        assert manifest['files'][hashed]['type'] == 'asset'
+        assert manifest['files']['index.html']['type'] == 'page'
+        with open(os.path.join(out, hashed + '.gz'), 'rb') as f:
+            assert 'greet' not in gzip.decompress(f.read()).decode('utf-8')
+        with open(os.path.join(out, 'index.html'), encoding='utf-8') as f:
+            assert f'src="{hashed}"' in f.read()
+        with open(os.path.join(out, 'sw.js'), encoding='utf-8') as f:
+            assert f"batyrbol-{manifest['version']}" in f.read()
+        with open(os.path.join(out, 'asset-manifest.json'), encoding='utf-8') as f:
+            assert json.load(f) == manifest
+
+        # Unchanged sources produce the same names and version
+        assert build(src, out)['version'] == manifest['version']
+
+
+def test_build_uses_responsive_image_manifest():
+    with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as out:
+        os.makedirs(os.path.join(src, 'assets', 'images', 'hero'))
+        os.makedirs(os.path.join(src, 'assets', 'responsive', 'hero'))
+        with open(os.path.join(src, 'assets', 'images', 'hero', 'h.jpg'), 'wb') as f:
+            f.write(b'jpeg')
+        with open(os.path.join(src, 'assets', 'responsive', 'hero', 'h-320w.abc.webp'), 'wb') as f:
+            f.write(b'webp')
+        with open(os.path.join(src, 'assets', 'responsive', 'image-manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({'images': {'assets/images/hero/h.jpg': {'width': 1920, 'height': 1080, 'formats': {
+                'webp': [{'width': 320, 'path': 'assets/responsive/hero/h-320w.abc.webp'}]}}}}, f)
+        with open(os.path.join(src, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write('<img src="assets/images/hero/h.jpg">'
+                    "<style>#auth { background-image: url('assets/images/hero/h.jpg'); }</style>")
+        os.makedirs(os.path.join(src, 'styles'))
+        with open(os.path.join(src, 'styles', 'main.css'), 'w', encoding='utf-8') as f:
+            f.write('.hero {\n  background-image: url(../assets/images/hero/h.jpg);\n}\n')
+
+        manifest = build(src, out)
+        assert manifest['files']['assets/responsive/hero/h-320w.abc.webp']['type'] == 'asset'
+        assert not any(name.startswith('assets/responsive/hero/h-320w.abc.') and name.count('.') > 2
+                       for name in manifest['files'])
+        with open(os.path.join(out, 'index.html'), encoding='utf-8') as f:
+            page = f.read()
+        assert 'srcset="assets/responsive/hero/h-320w.abc.webp 320w"' in page
+        assert f'src="{manifest["assets"]["assets/images/hero/h.jpg"]}"' in page
+        hashed = manifest['assets']['assets/images/hero/h.jpg']
+        assert (f"background-image: url('{hashed}'); background-image: image-set("
+                f"url('assets/responsive/hero/h-320w.abc.webp') type('image/webp'), "
+                f"url('{hashed}') type('image/jpeg'))") in page
+        with open(os.path.join(out, manifest['assets']['styles/main.css']), encoding='utf-8') as f:
+            css = f.read()
+        assert "url('../assets/responsive/hero/h-320w.abc.webp') type('image/webp')" in css
+        assert f"url('../{hashed}') type('image/jpeg')" in css
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Responsive image derivatives for assets/images.
+
+Every JPEG/PNG under assets/images is resized to several widths (never
+upscaled) and encoded as WebP, plus AVIF when Pillow has an AVIF encoder.
+Work runs in a process pool. Inputs whose content hash and encoder settings
+are unchanged since the last run are skipped. Derivative names carry the
+input hash, so they can be cached forever.
+
+assets/responsive/image-manifest.json lists the derivatives per source
+image. build_assets.py uses it to turn <img> tags into <picture> elements
+with srcset/sizes, and to follow CSS `background-image: url(...)`
+declarations with an image-set() of the AVIF/WebP derivatives.
+
+Usage:
+    python build_images.py [--workers N] [--force]
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import posixpath
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = 'assets/images'
+OUTPUT_DIR = 'assets/responsive'
+MANIFEST_NAME = 'image-manifest.json'
+
+WIDTHS = (320, 640, 960, 1280, 1920)
+QUALITY = {'avif': 50, 'webp': 76}
+INPUT_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# `sizes` per image directory: how wide the image is rendered in the layout
+SIZES = {
+    'hero': '100vw',
+    'backgrounds': '100vw',
+    'features': '(max-width: 768px) 100vw, 33vw',
+    'eras': '(max-width: 768px) 100vw, 50vw',
+    'characters': '(max-width: 768px) 50vw, 25vw',
+}
+DEFAULT_SIZES = '100vw'
+EAGER_DIRS = ('hero',)      # above the fold: not lazy-loaded
+
+_IMG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+_SRC_RE = re.compile(r'''\ssrc\s*=\s*["']([^"']+)["']''', re.IGNORECASE)
+_SOURCE_BEFORE_RE = re.compile(r'<source\b[^>]*>\s*$', re.IGNORECASE)    # img already inside <picture>
+# A background-image that is a single url(), not already followed by an image-set() override
+_BACKGROUND_RE = re.compile(r'''background-image\s*:\s*url\(\s*(["']?)([^"')\s]+)\1\s*\)\s*(;|(?=\}))'''
+                            r'''(?!\s*background-image\s*:\s*image-set)''', re.IGNORECASE)
+
+
+def avif_supported():
+    try:
+        from PIL import features
+        if features.check('avif'):
+            return True
+    except (ImportError, ValueError):
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+        return True
+    except ImportError:
+        return False
+
+
+def settings_key(formats):
+    """Changes whenever derivatives would come out differently for the same input"""
+    return json.dumps({'widths': WIDTHS, 'quality': {f: QUALITY[f] for f in formats}}, sort_keys=True)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def target_widths(width):
+    """Configured widths below the original, plus the original width itself"""
+    widths = [w for w in WIDTHS if w < width]
+    return widths if width > WIDTHS[-1] else widths + [width]
+
+
+def _render(job):
+    """Worker: encode one source image at every target width and format"""
+    from PIL import Image, ImageOps
+
+    source_path, rel_path, digest, out_dir, formats = job
+    stem = posixpath.splitext(posixpath.relpath(rel_path, IMAGES_DIR))[0]
+    with Image.open(source_path) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    entry = {'hash': digest, 'width': image.width, 'height': image.height,
+             'settings': settings_key(formats), 'formats': {}}
+    for width in target_widths(image.width):
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            rel_out = f'{OUTPUT_DIR}/{stem}-{width}w.{digest[:10]}.{fmt}'
+            path = os.path.join(out_dir, *rel_out.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if fmt == 'webp':
+                resized.save(path, 'WEBP', quality=QUALITY['webp'], method=6)
+            else:
+                resized.save(path, 'AVIF', quality=QUALITY['avif'])
+            entry['formats'].setdefault(fmt, []).append(
+                {'width': width, 'height': height, 'path': rel_out, 'bytes': os.path.getsize(path)})
+    return rel_path, entry
+
+
+def _find_sources(source_dir):
+    sources = []
+    for root, _, names in os.walk(os.path.join(source_dir, *IMAGES_DIR.split('/'))):
+        for name in sorted(names):
+            if name.lower().endswith(INPUT_EXTENSIONS):
+                sources.append(os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/'))
+    return sorted(sources)
+
+
+def load_manifest(source_dir=SOURCE_DIR):
+    try:
+        with open(os.path.join(source_dir, *OUTPUT_DIR.split('/'), MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'images': {}}
+
+
+def plan(source_dir, previous, formats, force=False):
+    """Split sources into (reused manifest entries, jobs to render)"""
+    reused, jobs = {}, []
+    settings = settings_key(formats)
+    for rel_path in _find_sources(source_dir):
+        source_path = os.path.join(source_dir, *rel_path.split('/'))
+        digest = file_hash(source_path)
+        old = previous.get('images', {}).get(rel_path)
+        if (not force and old and old.get('hash') == digest and old.get('settings') == settings
+                and all(os.path.isfile(os.path.join(source_dir, *d['path'].split('/')))
+                        for variants in old['formats'].values() for d in variants)):
+            reused[rel_path] = old
+        else:
+            jobs.append((source_path, rel_path, digest, source_dir, formats))
+    return reused, jobs
+
+
+def build_images(source_dir=SOURCE_DIR, workers=None, force=False):
+    """Render changed images and write the manifest; returns (manifest, rendered count)"""
+    formats = ('avif', 'webp') if avif_supported() else ('webp',)
+    reused, jobs = plan(source_dir, load_manifest(source_dir), formats, force)
+    images = dict(reused)
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rel_path, entry in pool.map(_render, jobs):
+                images[rel_path] = entry
+
+    # Remove derivatives of changed or deleted images
+    keep = {d['path'] for entry in images.values() for variants in entry['formats'].values() for d in variants}
+    out_root = os.path.join(source_dir, *OUTPUT_DIR.split('/'))
+    for root, _, names in os.walk(out_root):
+        for name in names:
+            rel = os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/')
+            if name != MANIFEST_NAME and rel not in keep:
+                os.remove(os.path.join(root, name))
+
+    manifest = {'formats': list(formats), 'images': dict(sorted(images.items()))}
+    os.makedirs(out_root, exist_ok=True)
+    with open(os.path.join(out_root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest, len(jobs)
+
+
+# ===== HTML =====
+
+def srcset(variants, prefix=''):
+    return ', '.join(f"{prefix}{v['path']} {v['width']}w" for v in variants)
+
+
+def _locate(ref, base):
+    """(source path relative to the site root, prefix that points derivatives back from `base`)"""
+    root_relative = ref.startswith('/')
+    resolved = posixpath.normpath(ref[1:] if root_relative else posixpath.join(base, ref))
+    prefix = '/' if root_relative else posixpath.relpath('.', base) + '/' if base else ''
+    return resolved, prefix
+
+
+def add_srcset(page, rel_path, manifest):
+    """
+    Wrap <img> tags whose src is a source image in <picture> with AVIF/WebP
+    sources. The original <img> stays as the fallback. Images outside the hero
+    are lazy-loaded.
+    """
+    base = posixpath.dirname(rel_path)
+    images = manifest.get('images', {})
+
+    def replace(match):
+        tag = match.group(0)
+        src = _SRC_RE.search(tag)
+        if not src or 'srcset' in tag.lower() or _SOURCE_BEFORE_RE.search(page, 0, match.start()):
+            return tag
+        resolved, prefix = _locate(html.unescape(src.group(1)), base)
+        entry = images.get(resolved)
+        if not entry:
+            return tag
+        directory = posixpath.dirname(posixpath.relpath(resolved, IMAGES_DIR)).split('/')[0]
+        sizes = SIZES.get(directory, DEFAULT_SIZES)
+        sources = ''.join(
+            f'<source type="image/{fmt}" srcset="{srcset(entry["formats"][fmt], prefix)}" sizes="{sizes}">'
+            for fmt in ('avif', 'webp') if fmt in entry['formats'])
+        attrs = f' width="{entry["width"]}" height="{entry["height"]}"' if 'width=' not in tag else ''
+        if directory not in EAGER_DIRS and 'loading=' not in tag:
+            attrs += ' loading="lazy"'
+        if 'decoding=' not in tag:
+            attrs += ' decoding="async"'
+        tag = re.sub(r'\s*/?>$', lambda end: attrs + end.group(0), tag, count=1)
+        return f'<picture>{sources}{tag}</picture>'
+
+    return _IMG_RE.sub(replace, page)
+
+
+# ===== CSS =====
+
+def add_image_set(text, rel_path, manifest):
+    """
+    Follow `background-image: url(<source image>)` with an image-set() of the
+    widest AVIF/WebP derivatives and the original as the last candidate.
+    Browsers without image-set()/type() support drop that declaration and
+    keep the plain url(). `text` is a stylesheet or a page with <style>.
+    """
+    base = posixpath.dirname(rel_path)
+    images = manifest.get('images', {})
+
+    def replace(match):
+        _, ref, end = match.groups()
+        resolved, prefix = _locate(ref, base)
+        entry = images.get(resolved)
+        if not entry:
+            return match.group(0)
+        mime = 'image/png' if resolved.lower().endswith('.png') else 'image/jpeg'
+        candidates = [f"url('{prefix}{max(entry['formats'][fmt], key=lambda v: v['width'])['path']}') "
+                      f"type('image/{fmt}')"
+                      for fmt in ('avif', 'webp') if entry['formats'].get(fmt)]
+        candidates.append(f"url('{ref}') type('{mime}')")
+        declaration = f"background-image: image-set({', '.join(candidates)})"
+        return f"{match.group(0)}{'' if end else ';'} {declaration}{end}"
+
+    return _BACKGROUND_RE.sub(replace, text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate responsive WebP/AVIF derivatives of assets/images')
+    parser.add_argument('--workers', type=int, default=None, help='process pool size (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='re-render unchanged images')
+    args = parser.parse_args(argv)
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("[IMAGES] Pillow is not installed; skipping responsive images (pip install Pillow)")
+        return 0
+
+    manifest, rendered = build_images(SOURCE_DIR, args.workers, args.force)
+    original = sum(os.path.getsize(os.path.join(SOURCE_DIR, p)) for p in manifest['images'])
+    smallest = sum(min(v[0]['bytes'] for v in e['formats'].values()) for e in manifest['images'].values())
+    print(f"[IMAGES] {len(manifest['images'])} images ({rendered} rendered, "
+          f"{len(manifest['images']) - rendered} unchanged), formats: {', '.join(manifest['formats'])}")
+    print(f"[IMAGES] Originals {original // 1024} KB; smallest variants {smallest // 1024} KB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
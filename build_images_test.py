@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for responsive image derivatives (build_images.py)
+"""
+
+import os
+import tempfile
+
+import pytest
+
+from build_images import add_srcset, build_images, plan, settings_key, target_widths
+
+MANIFEST = {'images': {'assets/images/features/game.jpg': {
+    'width': 1200, 'height': 800,
+    'formats': {
+        'webp': [{'width': 320, 'path': 'assets/responsive/features/game-320w.ab.webp'},
+                 {'width': 1200, 'path': 'assets/responsive/features/game-1200w.ab.webp'}],
+        'avif': [{'width': 320, 'path': 'assets/responsive/features/game-320w.ab.avif'}],
+    },
+}}}
+
+
+def _write(root, rel_path, data=b'fake image bytes'):
+    path = os.path.join(root, *rel_path.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_target_widths_never_upscale():
+    assert target_widths(800) == [320, 640, 800]
+    assert target_widths(200) == [200]
+    assert target_widths(3000) == [320, 640, 960, 1280, 1920]
+
+
+def test_img_becomes_picture_with_srcset():
+    page = '<div><img src="assets/images/features/game.jpg" alt="Ойын" class="w-full"><img src="logo.png"></div>'
+    out = add_srcset(page, 'intro.html', MANIFEST)
+    assert out.startswith('<div><picture><source type="image/avif" '
+                          'srcset="assets/responsive/features/game-320w.ab.avif 320w" '
+                          'sizes="(max-width: 768px) 100vw, 33vw">')
+    assert ('srcset="assets/responsive/features/game-320w.ab.webp 320w, '
+            'assets/responsive/features/game-1200w.ab.webp 1200w"') in out
+    assert ('<img src="assets/images/features/game.jpg" alt="Ойын" class="w-full" width="1200" height="800" '
+            'loading="lazy" decoding="async"></picture>') in out
+    assert out.endswith('<img src="logo.png"></div>')
+    assert add_srcset(out, 'intro.html', MANIFEST).count('<picture>') == 1
+
+
+def test_unchanged_images_are_skipped():
+    with tempfile.TemporaryDirectory() as root:
+        _write(root, 'assets/images/hero/a.jpg')
+        _write(root, 'assets/images/hero/b.png', b'other bytes')
+        reused, jobs = plan(root, {'images': {}}, ('webp',))
+        assert not reused and [job[1] for job in jobs] == ['assets/images/hero/a.jpg', 'assets/images/hero/b.png']
+
+        derivative = 'assets/responsive/hero/a-320w.x.webp'
+        _write(root, derivative)
+        previous = {'images': {'assets/images/hero/a.jpg': {
+            'hash': jobs[0][2], 'settings': settings_key(('webp',)),
+            'formats': {'webp': [{'width': 320, 'path': derivative}]}}}}
+        reused, jobs = plan(root, previous, ('webp',))
+        assert list(reused) == ['assets/images/hero/a.jpg']
+        assert [job[1] for job in jobs] == ['assets/images/hero/b.png']
+
+        # New encoder settings or a missing derivative invalidate the entry
+        assert not plan(root, previous, ('avif', 'webp'))[0]
+        os.remove(os.path.join(root, *derivative.split('/')))
+        assert not plan(root, previous, ('webp',))[0]
+
+
+def test_renders_webp_derivatives():
+    Image = pytest.importorskip('PIL.Image')
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, 'assets', 'images', 'eras'))
+        Image.new('RGB', (1000, 500), (200, 120, 40)).save(os.path.join(root, 'assets', 'images', 'eras', 'x.jpg'))
+        manifest, rendered = build_images(root, workers=1)
+        entry = manifest['images']['assets/images/eras/x.jpg']
+        assert rendered == 1
+        assert [v['width'] for v in entry['formats']['webp']] == [320, 640, 960, 1000]
+        assert build_images(root, workers=1)[1] == 0
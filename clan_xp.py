@@ -0,0 +1,224 @@
+"""
+Running clan XP totals and the clan ranking.
+
+Each clan in the store keeps `xp`, the sum of its members' XP. It is updated
+by delta wherever XP or membership changes (web clan routes, bot answers,
+voice missions, account linking), so the leaderboard never has to walk every
+member's record:
+- award_xp() adds XP to a user and to their clan's total;
+- create() / join() / leave() move a member's XP between clan totals.
+Given a ClanRanking, they also re-rank the clans they touched.
+
+Members are web emails or Telegram ids; `user` is that member's record (web
+or bot user), or None for a member without one.
+
+reconcile() recomputes the totals from the members' records and fixes any
+drift. gunicorn.conf.py runs it at startup, `python clan_xp.py [--check]
+[FILE]` runs it by hand or from cron, and the bot runs it on load.
+reconcile_file() holds the store lock (user_store.locked) across its load and
+save, like the web routes. The bot, however, keeps the whole store in memory
+and rewrites the whole file on every save, which would undo a fix made while
+it runs: stop the bot before a cron/manual reconcile (it reconciles again on
+its next start anyway).
+
+ClanRanking orders clans by (-xp, name) for one version of the store, so a
+leaderboard page is a bisect and a slice. The order is sorted once, then kept
+by bisect removal and insertion as single clans change.
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sys
+import threading
+
+import user_store
+from pagination import PageError, encode_cursor
+
+
+def _xp(user):
+    return user.get('xp', 0) if user else 0
+
+
+def award_xp(user, clans, delta, ranking=None):
+    """Add `delta` XP to `user` and to their clan's total; returns the new XP"""
+    user['xp'] = user.get('xp', 0) + delta
+    clan = clans.get(user.get('clan'))
+    if clan is not None:
+        clan['xp'] = clan.get('xp', 0) + delta
+        if ranking is not None:
+            ranking.update(user['clan'], clan)
+    return user['xp']
+
+
+def leave(clans, member, user, ranking=None):
+    """Take `member` out of their clan; an emptied clan is removed, a leaving leader replaced"""
+    name = user.get('clan') if user else None
+    clan = clans.get(name)
+    if name is not None:
+        user['clan'] = None
+    if clan is None or member not in clan['members']:
+        return None
+    clan['members'].remove(member)
+    clan['xp'] = clan.get('xp', 0) - _xp(user)
+    if not clan['members']:
+        del clans[name]
+    elif clan.get('leader') == member:
+        clan['leader'] = clan['members'][0]
+    if ranking is not None:
+        ranking.update(name, clans.get(name))
+    return name
+
+
+def join(clans, member, user, clan_name, ranking=None):
+    """Move `member` into an existing clan (leaving the previous one)"""
+    if user and user.get('clan') == clan_name and member in clans[clan_name]['members']:
+        return
+    leave(clans, member, user, ranking)
+    clan = clans[clan_name]
+    if member not in clan['members']:
+        clan['members'].append(member)
+        clan['xp'] = clan.get('xp', 0) + _xp(user)
+    if user:
+        user['clan'] = clan_name
+    if ranking is not None:
+        ranking.update(clan_name, clan)
+
+
+def create(clans, clan_name, member, user, ranking=None):
+    """New clan led by `member` (leaving their previous one)"""
+    leave(clans, member, user, ranking)
+    clans[clan_name] = {'leader': member, 'members': [member], 'xp': _xp(user)}
+    if user:
+        user['clan'] = clan_name
+    if ranking is not None:
+        ranking.update(clan_name, clans[clan_name])
+
+
+def store_member_xp(data):
+    """member -> XP over a loaded store (web users by email, Telegram users by id)"""
+    web_users = data.get('web_users', {})
+    tg_users = data.get('tg_users', {})
+
+    def member_xp(member):
+        user = web_users.get(member) if isinstance(member, str) else None
+        return _xp(user if user is not None else tg_users.get(str(member)))
+
+    return member_xp
+
+
+def reconcile(clans, member_xp, fix=True):
+    """
+    Compare each clan's total with the sum of its members' XP.
+    Returns [(clan, stored, actual)] for every mismatch; fixes them when `fix`.
+    """
+    drift = []
+    for name, clan in clans.items():
+        actual = sum(member_xp(member) for member in clan.get('members', []))
+        stored = clan.get('xp', 0)
+        if stored != actual:
+            drift.append((name, stored, actual))
+            if fix:
+                clan['xp'] = actual
+    return drift
+
+
+def reconcile_file(path, fix=True):
+    """reconcile() over a store file, rewritten in place when totals were fixed (under the store lock)"""
+    with user_store.locked(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[CLANS] Could not read {path}: {e}")
+            return []
+        drift = reconcile(data.get('clans', {}), store_member_xp(data), fix)
+        if drift and fix:
+            user_store.write_json(path, data)
+    for name, stored, actual in drift:
+        print(f"[CLANS] {name}: total {stored} != members' XP {actual}{' (fixed)' if fix else ''}")
+    return drift
+
+
+def _row(name, clan):
+    return {'name': name, 'total_xp': clan.get('xp', 0), 'member_count': len(clan.get('members', [])),
+            'leader': clan.get('leader', '')}
+
+
+class ClanRanking:
+    """Clans ordered by (-xp, name) for one version of the store"""
+
+    def __init__(self):
+        self.version = None
+        self._clans = {}
+        self._keys = None        # sorted [(-xp, name)], built on first read
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def reset(self, clans, version):
+        """Rank `clans` (as of store `version`) on the next read"""
+        with self._lock:
+            self.version = version
+            self._clans = clans
+            self._keys = None
+
+    def update(self, name, clan):
+        """Re-rank one clan after its total, members or leader changed (clan None: it was deleted)"""
+        with self._lock:
+            if self._keys is None:
+                return          # not built yet: the next reset() ranks everything anyway
+            row = self._rows.pop(name, None)
+            if row is not None:
+                i = bisect.bisect_left(self._keys, (-row['total_xp'], name))
+                del self._keys[i]
+            if clan is not None:
+                self._rows[name] = row = _row(name, clan)
+                bisect.insort(self._keys, (-row['total_xp'], name))
+
+    def advance(self, old_version, new_version):
+        """
+        The store was rewritten from `old_version` to `new_version`, with every
+        clan change passed to update(): keep the order and only move the version.
+        A ranking of any other version stays stale and is reset on the next read.
+        """
+        with self._lock:
+            if self._keys is not None and self.version == old_version:
+                self.version = new_version
+
+    def invalidate(self):
+        """Forget the version (e.g. update() saw changes that were never saved)"""
+        with self._lock:
+            self.version = None
+
+    def page(self, limit, after=None, fields=None):
+        """Same contract as pagination.paginate() with sort key (-total_xp, name)"""
+        with self._lock:
+            if self._keys is None:
+                self._rows = {name: _row(name, clan) for name, clan in self._clans.items()}
+                self._keys = sorted((-row['total_xp'], name) for name, row in self._rows.items())
+            keys = self._keys
+            try:
+                start = bisect.bisect_right(keys, tuple(after)) if after is not None else 0
+            except TypeError:   # cursor key of the wrong shape for this list
+                raise PageError('Invalid cursor')
+            page = [self._rows[name] for _, name in keys[start:start + limit]]
+            next_cursor = encode_cursor(keys[start + limit - 1]) if len(keys) > start + limit else None
+        if fields is not None:
+            page = [{field: row.get(field) for field in fields} for row in page]
+        return page, next_cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and fix clan XP totals in the user store",
+                                     epilog="Stop the Telegram bot first: its next save would overwrite the fixes.")
+    parser.add_argument('path', nargs='?', default=os.getenv('DATA_FILE', 'unified_users.json'))
+    parser.add_argument('--check', action='store_true', help='report drift without fixing it')
+    args = parser.parse_args()
+    drift = reconcile_file(args.path, fix=not args.check)
+    print(f"[CLANS] {len(drift)} clan total(s) {'off' if args.check else 'fixed'} in {args.path}")
+    return 1 if drift and args.check else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import json
+import threading
+
+import pytest
+
+import clan_xp
+import user_store
+from clan_xp import ClanRanking
+from pagination import PageError, decode_cursor, paginate
+
+
+def _store():
+    web_users = {
+        'a@x.kz': {'xp': 100, 'clan': 'Alpha'},
+        'b@x.kz': {'xp': 50, 'clan': 'Alpha'},
+        'c@x.kz': {'xp': 70, 'clan': 'Beta'},
+        'd@x.kz': {'xp': 10},
+    }
+    tg_users = {'42': {'id': 42, 'xp': 30, 'clan': 'Bot clan'}}
+    clans = {
+        'Alpha': {'leader': 'a@x.kz', 'members': ['a@x.kz', 'b@x.kz'], 'xp': 150},
+        'Beta': {'leader': 'c@x.kz', 'members': ['c@x.kz'], 'xp': 70},
+        'Bot clan': {'leader': 42, 'members': [42], 'xp': 30},
+    }
+    return {'web_users': web_users, 'tg_users': tg_users, 'tg_links': {}, 'clans': clans}
+
+
+def _totals_match(data):
+    return clan_xp.reconcile(data['clans'], clan_xp.store_member_xp(data), fix=False) == []
+
+
+def test_award_xp_updates_user_and_clan_total():
+    data = _store()
+    assert clan_xp.award_xp(data['web_users']['b@x.kz'], data['clans'], 5) == 55
+    assert data['clans']['Alpha']['xp'] == 155
+    clan_xp.award_xp(data['web_users']['d@x.kz'], data['clans'], 5)     # no clan
+    assert _totals_match(data)
+
+
+def test_join_moves_member_xp_between_clans():
+    data = _store()
+    clans, users = data['clans'], data['web_users']
+    clan_xp.join(clans, 'a@x.kz', users['a@x.kz'], 'Beta')
+    assert clans['Alpha'] == {'leader': 'b@x.kz', 'members': ['b@x.kz'], 'xp': 50}
+    assert clans['Beta']['xp'] == 170 and users['a@x.kz']['clan'] == 'Beta'
+    clan_xp.join(clans, 'a@x.kz', users['a@x.kz'], 'Beta')      # already a member: no change
+    assert clans['Beta']['members'] == ['c@x.kz', 'a@x.kz'] and clans['Beta']['xp'] == 170
+    assert _totals_match(data)
+
+
+def test_leave_and_create():
+    data = _store()
+    clans, users = data['clans'], data['web_users']
+    assert clan_xp.leave(clans, 'c@x.kz', users['c@x.kz']) == 'Beta'
+    assert 'Beta' not in clans and users['c@x.kz']['clan'] is None
+    assert clan_xp.leave(clans, 'c@x.kz', users['c@x.kz']) is None
+    clan_xp.create(clans, 'Gamma', 'b@x.kz', users['b@x.kz'])
+    assert clans['Gamma'] == {'leader': 'b@x.kz', 'members': ['b@x.kz'], 'xp': 50}
+    assert clans['Alpha']['xp'] == 100
+    assert _totals_match(data)
+
+
+def test_reconcile_fixes_drift(tmp_path):
+    data = _store()
+    data['clans']['Alpha']['xp'] = 0
+    data['clans']['Bot clan']['xp'] = 0
+    path = tmp_path / 'users.json'
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+    assert clan_xp.reconcile_file(str(path), fix=False) == [('Alpha', 0, 150), ('Bot clan', 0, 30)]
+    assert json.loads(path.read_text(encoding='utf-8'))['clans']['Alpha']['xp'] == 0
+    clan_xp.reconcile_file(str(path))
+    assert _totals_match(json.loads(path.read_text(encoding='utf-8')))
+
+
+def test_reconcile_file_waits_for_store_lock(tmp_path):
+    data = _store()
+    data['clans']['Beta']['xp'] = 0
+    path = str(tmp_path / 'users.json')
+    user_store.write_json(path, data)
+
+    done = threading.Event()
+    worker = threading.Thread(target=lambda: (clan_xp.reconcile_file(path), done.set()))
+    with user_store.locked(path):
+        worker.start()
+        assert not done.wait(0.2)
+    worker.join()
+    with open(path, 'r', encoding='utf-8') as f:
+        assert _totals_match(json.load(f))
+
+
+def test_ranking_pages_match_paginate():
+    clans = {f'Clan {i:02d}': {'leader': '', 'members': ['m'] * (i % 4), 'xp': (i * 37) % 11} for i in range(25)}
+    ranking = ClanRanking()
+    ranking.reset(clans, 'v1')
+
+    rows = [{'name': name, 'total_xp': clan['xp'], 'member_count': len(clan['members']), 'leader': ''}
+            for name, clan in clans.items()]
+    after = None
+    while True:
+        expected = paginate(rows, lambda row: (-row['total_xp'], row['name']), 7, after, ('name', 'total_xp'))
+        assert ranking.page(7, after, ('name', 'total_xp')) == expected
+        if expected[1] is None:
+            break
+        after = decode_cursor(expected[1])
+
+    with pytest.raises(PageError):
+        ranking.page(7, ('x', 'y', 'z'))
+
+
+def test_ranking_is_rebuilt_on_reset():
+    clans = {'A': {'members': [], 'xp': 1}, 'B': {'members': [], 'xp': 2}}
+    ranking = ClanRanking()
+    ranking.reset(clans, 'v1')
+    assert [row['name'] for row in ranking.page(10)[0]] == ['B', 'A']
+    clans = dict(clans, C={'members': [], 'xp': 3})
+    ranking.reset(clans, 'v2')
+    assert ranking.version == 'v2'
+    assert [row['name'] for row in ranking.page(10)[0]] == ['C', 'B', 'A']
+
+
+def test_ranking_follows_changes_without_a_rebuild():
+    data = _store()
+    clans, web_users = data['clans'], data['web_users']
+    ranking = ClanRanking()
+    ranking.reset(clans, 'v1')
+    ranking.page(10)
+    keys = ranking._keys
+
+    clan_xp.award_xp(web_users['c@x.kz'], clans, 200, ranking)
+    clan_xp.join(clans, 'a@x.kz', web_users['a@x.kz'], 'Beta', ranking)
+    clan_xp.create(clans, 'Gamma', 'd@x.kz', web_users['d@x.kz'], ranking)
+    clan_xp.leave(clans, 'b@x.kz', web_users['b@x.kz'], ranking)       # empties Alpha
+    ranking.advance('v1', 'v2')
+    assert ranking.version == 'v2' and ranking._keys is keys
+
+    rebuilt = ClanRanking()
+    rebuilt.reset(clans, 'v2')
+    assert ranking.page(10) == rebuilt.page(10)
+    assert [row['name'] for row in ranking.page(10)[0]] == ['Beta', 'Bot clan', 'Gamma']
+
+    ranking.advance('v1', 'v3')     # a write it did not see: stays stale
+    assert ranking.version == 'v2'
@@ -0,0 +1,112 @@
+"""
+On-the-fly response compression (WSGI middleware).
+
+Responses are compressed with brotli (when the `brotli` package is installed)
+or gzip, depending on Accept-Encoding, when all of these hold:
+- the body is at least `min_size` bytes;
+- the Content-Length is known (streamed responses pass through untouched);
+- the type is text-like (JSON, HTML, JS, CSS, SVG, ...);
+- the response is not already encoded and has no `Cache-Control: no-transform`.
+
+Compressed responses get `Vary: Accept-Encoding`. A strong ETag is turned into
+a weak one, since the bytes differ from the identity representation, but
+If-None-Match still matches it.
+"""
+
+import gzip
+
+from content_packs import choose_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json', 'application/javascript', 'application/manifest+json', 'application/xml',
+    'image/svg+xml', 'text/css', 'text/csv', 'text/html', 'text/javascript', 'text/plain', 'text/xml',
+})
+_SKIP_STATUSES = ('204', '206', '304')
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Args:
+        app: WSGI application to wrap
+        min_size: smallest body (bytes) worth compressing
+        gzip_level: zlib level 1-9
+        brotli_quality: brotli quality 0-11 (4-5 is the usual dynamic-content sweet spot)
+        types: compressible media types
+    """
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=4, types=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.types = types
+        self.encodings = {None, 'gzip', 'br'} if brotli is not None else {None, 'gzip'}
+
+    def _should_compress(self, status, headers):
+        if status[:3] in _SKIP_STATUSES:
+            return False
+        fields = {name.lower(): value for name, value in headers}
+        if 'content-encoding' in fields or 'no-transform' in fields.get('cache-control', '').lower():
+            return False
+        media_type = fields.get('content-type', '').split(';')[0].strip().lower()
+        if media_type not in self.types:
+            return False
+        try:
+            return int(fields.get('content-length', '')) >= self.min_size
+        except ValueError:
+            return False    # unknown length: streamed, leave it alone
+
+    def __call__(self, environ, start_response):
+        encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'), self.encodings)
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        captured = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers, exc_info=exc_info,
+                            compress=self._should_compress(status, headers))
+            if not captured['compress']:
+                return start_response(status, headers, exc_info)
+            return written.append
+
+        app_iter = self.app(environ, capture)
+        if not captured.get('compress'):
+            return app_iter
+        try:
+            body = b''.join(written) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        data = compress(body, encoding, self.gzip_level, self.brotli_quality)
+        headers = []
+        vary = None
+        for name, value in captured['headers']:
+            lower = name.lower()
+            if lower == 'content-length':
+                continue
+            if lower == 'etag' and not value.startswith('W/'):
+                value = 'W/' + value
+            if lower == 'vary':
+                vary = value
+                continue
+            headers.append((name, value))
+        if vary and 'accept-encoding' not in vary.lower():
+            vary = f'{vary}, Accept-Encoding'
+        headers += [('Vary', vary or 'Accept-Encoding'), ('Content-Encoding', encoding),
+                    ('Content-Length', str(len(data)))]
+        start_response(captured['status'], headers, captured['exc_info'])
+        return [data]
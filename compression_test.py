@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the response compression middleware (compression.py)
+"""
+
+import gzip
+
+from flask import Flask, Response, jsonify, request
+
+from compression import CompressionMiddleware
+
+MISSION = {'text_kz': 'Абылай хан қазақ жерін жоңғар шапқыншылығынан қорғады. ' * 40}
+
+
+def _client(**options):
+    app = Flask(__name__)
+    app.json.ensure_ascii = False
+
+    @app.route('/mission')
+    def mission():
+        response = jsonify(MISSION)
+        response.set_etag('v1')
+        return response.make_conditional(request)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/packed')
+    def packed():
+        return Response(gzip.compress(b'{}' * 2000), headers={'Content-Encoding': 'gzip'},
+                        content_type='application/json')
+
+    @app.route('/stream')
+    def stream():
+        return Response((b'x' * 1000 for _ in range(5)), content_type='text/plain')
+
+    @app.route('/image')
+    def image():
+        return Response(b'\x89PNG' * 1000, content_type='image/png')
+
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, **options)
+    return app.test_client()
+
+
+def test_large_json_is_gzipped():
+    client = _client()
+    plain = client.get('/mission')
+    assert 'Content-Encoding' not in plain.headers
+
+    response = client.get('/mission', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data) // 5
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers['ETag'] == 'W/"v1"'
+
+    revalidated = client.get('/mission', headers={'Accept-Encoding': 'gzip', 'If-None-Match': 'W/"v1"'})
+    assert revalidated.status_code == 304
+
+
+def test_skips_small_encoded_streamed_and_binary_responses():
+    client = _client()
+    for path in ('/small', '/stream', '/image'):
+        assert 'Content-Encoding' not in client.get(path, headers={'Accept-Encoding': 'gzip'}).headers
+    packed = client.get('/packed', headers={'Accept-Encoding': 'gzip'})
+    assert gzip.decompress(packed.data) == b'{}' * 2000
+
+
+def test_threshold_and_level_are_configurable():
+    fast = _client(min_size=10, gzip_level=1)
+    assert fast.get('/small', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in _client(min_size=10 ** 6).get(
+        '/mission', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in fast.get('/mission', headers={'Accept-Encoding': 'gzip;q=0'}).headers
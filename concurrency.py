@@ -0,0 +1,91 @@
+"""
+Bounded concurrency for slow, LLM-bound endpoints.
+
+Gunicorn runs threaded workers (gunicorn.conf.py), so a blocking OpenAI call
+holds one request thread, not a whole worker. A ConcurrencyLimiter caps how
+many of those threads AI endpoints may hold per process. The remaining
+threads stay available for login, static files and other cheap requests.
+A request that can't get a slot within `wait` seconds is answered with 503
+and Retry-After instead of queuing behind the generations in flight.
+"""
+
+import functools
+import threading
+from contextlib import contextmanager
+
+from flask import jsonify
+
+BUSY_MESSAGE = 'Сервер бос емес, кейінірек қайталаңыз / Сервер занят, повторите позже'
+
+
+class ConcurrencyLimiter:
+    """
+    Args:
+        limit: concurrent calls allowed per process
+        wait: seconds a request may wait for a free slot
+        retry_after: Retry-After seconds sent with a 503
+    """
+
+    def __init__(self, limit, wait=0.0, retry_after=5):
+        self.limit = limit
+        self.wait = wait
+        self.retry_after = retry_after
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._skipped = 0
+
+    def acquire(self, blocking=True):
+        """
+        Take a slot, waiting up to `wait` seconds. A non-blocking attempt
+        (a background refill) that finds no slot counts as skipped, not rejected.
+        """
+        acquired = self._semaphore.acquire(timeout=self.wait) if blocking else self._semaphore.acquire(False)
+        if not acquired:
+            with self._lock:
+                if blocking:
+                    self._rejected += 1
+                else:
+                    self._skipped += 1
+            return False
+        with self._lock:
+            self._in_flight += 1
+            self._admitted += 1
+            self._peak = max(self._peak, self._in_flight)
+        return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+    @contextmanager
+    def slot(self):
+        """`with limiter.slot() as acquired:`; the slot is released on exit"""
+        acquired = self.acquire()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release()
+
+    def busy_response(self):
+        return jsonify({'success': False, 'message': BUSY_MESSAGE}), 503, {'Retry-After': str(self.retry_after)}
+
+    def limit_view(self, view):
+        """Decorator for Flask views whose whole body is slow"""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with self.slot() as acquired:
+                if not acquired:
+                    return self.busy_response()
+                return view(*args, **kwargs)
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            return {'limit': self.limit, 'in_flight': self._in_flight, 'peak': self._peak,
+                    'admitted': self._admitted, 'rejected': self._rejected, 'skipped': self._skipped}
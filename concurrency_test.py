@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the AI endpoint concurrency limiter (concurrency.py)
+"""
+
+import threading
+
+from flask import Flask
+
+from concurrency import ConcurrencyLimiter
+
+
+def _app(limiter, started, release):
+    app = Flask(__name__)
+
+    @app.route('/generate')
+    @limiter.limit_view
+    def generate():
+        started.set()
+        release.wait(5)
+        return {'success': True}
+
+    @app.route('/login')
+    def login():
+        return {'success': True}
+    return app
+
+
+def test_excess_ai_requests_get_503_while_cheap_ones_pass():
+    limiter = ConcurrencyLimiter(limit=1, wait=0, retry_after=7)
+    started, release = threading.Event(), threading.Event()
+    app = _app(limiter, started, release)
+    results = []
+    slow = threading.Thread(target=lambda: results.append(app.test_client().get('/generate').status_code))
+    slow.start()
+    assert started.wait(5)
+
+    busy = app.test_client().get('/generate')
+    assert busy.status_code == 503
+    assert busy.headers['Retry-After'] == '7'
+    assert app.test_client().get('/login').status_code == 200
+
+    release.set()
+    slow.join(5)
+    assert results == [200]
+    assert app.test_client().get('/generate').status_code == 200
+    assert limiter.stats() == {'limit': 1, 'in_flight': 0, 'peak': 1, 'admitted': 2, 'rejected': 1,
+                               'skipped': 0}
+
+
+def test_waiting_request_gets_the_released_slot():
+    limiter = ConcurrencyLimiter(limit=1, wait=2)
+    assert limiter.acquire()
+    timer = threading.Timer(0.1, limiter.release)
+    timer.start()
+    with limiter.slot() as acquired:
+        assert acquired
+    timer.join()
+    assert limiter.stats()['in_flight'] == 0
@@ -0,0 +1,276 @@
+"""
+Fallback content catalog for BATYR BOL.
+
+Everything in fallback_content.json (missions, scenarios, learning content,
+game missions, character aliases) is parsed once into frozen, pre-indexed
+structures. Lookups by topic, level, character and language are dict hits.
+The file is re-checked at most every `check_interval` seconds; a changed file
+is parsed into a new snapshot that replaces the old one in a single reference
+swap, so readers never observe a half-loaded catalog.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+DEFAULT_LEVEL = 2
+
+
+def _norm(value):
+    return ' '.join(str(value or '').lower().split())
+
+
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    """Mutable (JSON-serialisable) copy of a frozen catalog entry"""
+    if isinstance(obj, MappingProxyType):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+def _suffix(language):
+    """'kk' -> 'kz' (field suffix used in the content file); everything else is Russian"""
+    return 'kz' if language in ('kk', 'kz') else 'ru'
+
+
+def localize(entry, language):
+    """Collapse *_kz / *_ru pairs of an entry into plain keys for one language"""
+    wanted = '_' + _suffix(language)
+    other = '_ru' if wanted == '_kz' else '_kz'
+    out = {}
+    for key, value in entry.items():
+        if key == 'options' and isinstance(value, list):
+            value = [localize(o, language) if isinstance(o, dict) else o for o in value]
+        if key.endswith(wanted):
+            out[key[:-3]] = value
+        elif key.endswith(other):
+            out.setdefault(key[:-3], value)
+        else:
+            out[key] = value
+    return out
+
+
+class _Snapshot:
+    """Immutable, fully indexed view of one version of the content file"""
+
+    def __init__(self, data, version):
+        self.version = version
+        self.default_character = data.get('default_character', 'Абылай хан')
+        aliases = {_norm(k): v for k, v in (data.get('character_aliases') or {}).items()}
+
+        missions = data.get('missions') or []
+        self.missions = _freeze(missions)
+        by_topic, by_level, by_topic_level, by_language, by_id = {}, {}, {}, {}, {}
+        for i, mission in enumerate(missions):
+            topic = _norm(mission.get('topic'))
+            level = mission.get('level', DEFAULT_LEVEL)
+            by_topic.setdefault(topic, []).append(i)
+            by_level.setdefault(level, []).append(i)
+            by_topic_level.setdefault((topic, level), []).append(i)
+            for language, field in (('kk', 'text_kz'), ('ru', 'text_ru')):
+                if mission.get(field):
+                    by_language.setdefault(language, []).append(i)
+            by_id.setdefault(mission.get('id'), i)
+        self.by_topic = MappingProxyType({k: tuple(v) for k, v in by_topic.items()})
+        self.by_level = MappingProxyType({k: tuple(v) for k, v in by_level.items()})
+        self.by_topic_level = MappingProxyType({k: tuple(v) for k, v in by_topic_level.items()})
+        self.by_language = MappingProxyType({k: frozenset(v) for k, v in by_language.items()})
+        self.by_id = MappingProxyType(by_id)
+        self.all_missions = tuple(range(len(missions)))
+
+        characters = set()
+        scenarios = {}
+        for entry in data.get('scenarios') or []:
+            character = entry.get('character', self.default_character)
+            characters.add(character)
+            scenarios.setdefault(character, []).append(
+                {k: v for k, v in entry.items() if k != 'character'})
+        self.scenarios = MappingProxyType({
+            (character, language): _freeze([localize(e, language)
+                                            for e in sorted(entries, key=lambda e: e.get('scenario', 0))])
+            for character, entries in scenarios.items()
+            for language in ('kk', 'ru')
+        })
+
+        def by_character(entries):
+            index = {}
+            for entry in entries or []:
+                character = entry.get('character', self.default_character)
+                characters.add(character)
+                index[character] = _freeze({k: v for k, v in entry.items() if k != 'character'})
+            return MappingProxyType(index)
+
+        self.learning_content = by_character(data.get('learning_content'))
+        self.game_missions = by_character(data.get('game_missions'))
+
+        for character in characters:
+            aliases.setdefault(_norm(character), character)
+        self.aliases = MappingProxyType(aliases)
+
+    def resolve_character(self, name):
+        return self.aliases.get(_norm(name), self.default_character)
+
+    def match_topic(self, topic):
+        """Exact normalized topic key, else the first key containing it"""
+        key = _norm(topic)
+        if not key or key in self.by_topic:
+            return key
+        for candidate in self.by_topic:
+            if key in candidate:
+                return candidate
+        return key
+
+
+class ContentCatalog:
+    """
+    Loads fallback content once and serves it from in-memory indexes.
+
+    Args:
+        path: fallback_content.json location
+        check_interval: minimum seconds between file change checks
+        max_users: users whose served missions are remembered for no-repeat picks
+    """
+
+    def __init__(self, path, check_interval=5.0, max_users=10000):
+        self.path = path
+        self.check_interval = check_interval
+        self.max_users = max_users
+        self._snapshot = _Snapshot({}, None)
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+        self._seen = OrderedDict()      # user_key -> set of mission positions served
+        self._seen_lock = threading.Lock()
+        self.reload(force=True)
+
+    def _file_version(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def reload(self, force=False):
+        """Re-read the file if it changed. Returns True when a new snapshot was installed."""
+        if not self._reload_lock.acquire(blocking=force):
+            return False    # another thread is already reloading
+        try:
+            self._checked_at = time.monotonic()
+            version = self._file_version()
+            if version is None or (not force and version == self._snapshot.version):
+                return False
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    snapshot = _Snapshot(json.load(f), version)
+            except (OSError, ValueError) as e:
+                print(f"[CATALOG] Keeping previous content, failed to load {self.path}: {e}")
+                return False
+            self._snapshot = snapshot
+            with self._seen_lock:
+                self._seen.clear()
+            print(f"[CATALOG] Loaded {len(snapshot.missions)} missions from {self.path}")
+            return True
+        finally:
+            self._reload_lock.release()
+
+    @property
+    def current(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+        return self._snapshot
+
+    # ===== MISSIONS =====
+
+    def missions(self, topic=None, level=None, language=None):
+        """Frozen missions for the most specific index that has entries"""
+        snap = self.current
+        return tuple(snap.missions[i] for i in self._candidates(snap, topic, level, language))
+
+    def _candidates(self, snap, topic, level, language):
+        key = snap.match_topic(topic) if topic else None
+        if key and level is not None and (key, level) in snap.by_topic_level:
+            pool = snap.by_topic_level[(key, level)]
+        elif key and key in snap.by_topic:
+            pool = snap.by_topic[key]
+        elif level is not None and level in snap.by_level:
+            pool = snap.by_level[level]
+        else:
+            pool = snap.all_missions
+        if language and language in snap.by_language:
+            localized = tuple(i for i in pool if i in snap.by_language[language])
+            pool = localized or pool
+        return pool
+
+    def mission(self, mission_id):
+        snap = self.current
+        i = snap.by_id.get(mission_id)
+        return thaw(snap.missions[i]) if i is not None else None
+
+    def pick_mission(self, topic=None, level=None, language=None, user_key=None):
+        """
+        Random mission for topic/level. With a user_key, missions already served
+        to that user are skipped until the matching pool is exhausted.
+        """
+        snap = self.current
+        pool = self._candidates(snap, topic, level, language)
+        if not pool:
+            return None
+        if user_key is None:
+            return thaw(snap.missions[random.choice(pool)])
+        with self._seen_lock:
+            seen = self._seen.pop(user_key, set())
+            fresh = [i for i in pool if i not in seen]
+            if not fresh:
+                seen.difference_update(pool)
+                fresh = list(pool)
+            choice = random.choice(fresh)
+            seen.add(choice)
+            self._seen[user_key] = seen
+            while len(self._seen) > self.max_users:
+                self._seen.popitem(last=False)
+        return thaw(snap.missions[choice])
+
+    # ===== CHARACTER CONTENT =====
+
+    def resolve_character(self, name):
+        return self.current.resolve_character(name)
+
+    def scenario(self, character, scenario_number=1, language='kk'):
+        """Fallback scenario for a character, clamped to the last one available"""
+        snap = self.current
+        language = 'kk' if _suffix(language) == 'kz' else 'ru'
+        entries = (snap.scenarios.get((snap.resolve_character(character), language))
+                   or snap.scenarios.get((snap.default_character, language)))
+        if not entries:
+            return None
+        try:
+            number = int(scenario_number)
+        except (TypeError, ValueError):
+            number = 1
+        return thaw(entries[max(0, min(number - 1, len(entries) - 1))])
+
+    def learning_content(self, topic, level=1):
+        snap = self.current
+        entry = (snap.learning_content.get(snap.resolve_character(topic))
+                 or snap.learning_content.get(snap.default_character))
+        if entry is None:
+            return None
+        return dict(thaw(entry), level=level)
+
+    def game_mission(self, character):
+        snap = self.current
+        entry = (snap.game_missions.get(snap.resolve_character(character))
+                 or snap.game_missions.get(snap.default_character))
+        return thaw(entry) if entry is not None else None
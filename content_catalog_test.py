@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the fallback content catalog (content_catalog.py)
+"""
+
+import json
+import os
+import tempfile
+
+from content_catalog import ContentCatalog
+
+CONTENT = {
+    'default_character': 'Абылай хан',
+    'character_aliases': {'Абай Кунанбаев': 'Абай'},
+    'missions': [
+        {'id': 'abai_1', 'topic': 'Абай Құнанбайұлы', 'text_kz': 'Абай', 'text_ru': 'Абай'},
+        {'id': 'abai_2', 'topic': 'Абай Құнанбайұлы', 'text_kz': 'Абай 2', 'level': 3},
+        {'id': 'ablai_1', 'topic': 'Абылай хан', 'text_kz': 'Абылай', 'text_ru': 'Абылай'},
+    ],
+    'scenarios': [
+        {'character': 'Абылай хан', 'scenario': 2, 'text_kz': 'Екінші', 'text_ru': 'Второй',
+         'options': [{'id': 'A', 'text_kz': 'Иә', 'text_ru': 'Да', 'isCorrect': True}], 'correctAnswer': 'A'},
+        {'character': 'Абылай хан', 'scenario': 1, 'text_kz': 'Бірінші', 'text_ru': 'Первый',
+         'options': [], 'correctAnswer': 'A', 'nextScenarioSetup': 'Келесі...'},
+        {'character': 'Абай', 'scenario': 1, 'text_kz': 'Абай сценарийі', 'text_ru': 'Сценарий Абая',
+         'options': [], 'correctAnswer': 'B'},
+    ],
+    'game_missions': [{'character': 'Абылай хан', 'text': 'Ойын', 'options': ['a', 'b', 'c'], 'correctIndex': 1}],
+    'learning_content': [{'character': 'Абай', 'text_kz': 'Мәтін', 'questions_kz': []}],
+}
+
+
+def _catalog(tmp, content=CONTENT, **kwargs):
+    path = os.path.join(tmp, 'fallback_content.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(content, f, ensure_ascii=False)
+    return ContentCatalog(path, **kwargs), path
+
+
+def test_scenarios_are_localized_ordered_and_aliased():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog, _ = _catalog(tmp)
+        second = catalog.scenario('Абылай хан', 2, 'ru')
+        assert second['text'] == 'Второй'
+        assert second['options'] == [{'id': 'A', 'text': 'Да', 'isCorrect': True}]
+        assert catalog.scenario('Абылай хан', 9, 'kk')['text'] == 'Екінші'
+        assert catalog.scenario('Абылай хан', 1, 'ru')['nextScenarioSetup'] == 'Келесі...'
+        assert catalog.scenario('Абай Кунанбаев', 1, 'kk')['text'] == 'Абай сценарийі'
+        assert catalog.scenario('Белгісіз', 1, 'kk')['text'] == 'Бірінші'
+
+
+def test_lookups_fall_back_from_specific_to_general():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog, _ = _catalog(tmp)
+        assert [m['id'] for m in catalog.missions(topic='абай құнанбайұлы', level=3)] == ['abai_2']
+        assert len(catalog.missions(topic='Абай', language='ru')) == 1
+        assert len(catalog.missions(level=7)) == 3
+        assert catalog.mission('ablai_1')['text_kz'] == 'Абылай'
+        assert catalog.game_mission('Абай')['correctIndex'] == 1
+        assert catalog.learning_content('Абай Кунанбаев', level=4)['level'] == 4
+
+
+def test_returned_entries_are_copies():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog, _ = _catalog(tmp)
+        mission = catalog.mission('abai_1')
+        mission['text_kz'] = 'changed'
+        assert catalog.mission('abai_1')['text_kz'] == 'Абай'
+
+
+def test_pick_mission_does_not_repeat_until_pool_exhausted():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog, _ = _catalog(tmp)
+        picks = [catalog.pick_mission(topic='Абай', user_key='u1')['id'] for _ in range(2)]
+        assert sorted(picks) == ['abai_1', 'abai_2']
+        assert catalog.pick_mission(topic='Абай', user_key='u1')['id'] in picks
+
+
+def test_reload_swaps_snapshot_and_keeps_old_on_bad_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog, path = _catalog(tmp, check_interval=0)
+        updated = dict(CONTENT, missions=CONTENT['missions'][:1])
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(updated, f, ensure_ascii=False)
+        os.utime(path, ns=(0, 10 ** 9))
+        assert len(catalog.missions()) == 1
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"missions": [')
+        os.utime(path, ns=(0, 2 * 10 ** 9))
+        assert len(catalog.missions()) == 1
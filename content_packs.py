@@ -0,0 +1,199 @@
+"""
+Pre-serialized content packs.
+
+A pack bundles the catalog content for one (language, level, character):
+missions, scenarios, learning content and the game fallback mission. It is
+serialized to JSON once per catalog version, compressed once with gzip (and
+brotli when the `brotli` package is installed) and served as raw bytes with a
+strong ETag, so repeat requests cost a 304 and first requests no JSON encoding.
+
+The catalog fallback bodies of the AI routes (a character's scenario, game
+mission or learning content) are cached and encoded the same way, so a
+fallback answer is a dict lookup rather than a jsonify per request.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+
+from flask import Response
+
+from content_catalog import localize, thaw
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+LANGUAGES = ('kk', 'ru')
+CACHE_CONTROL = 'public, max-age=300'
+# kind -> (response field, whether the body carries 'fallback': True)
+FALLBACKS = {
+    'scenario': ('scenario', True),
+    'game_mission': ('mission', True),
+    'learning_content': ('content', False),
+}
+
+
+class ContentPack:
+    """Immutable encoded representations of one pack"""
+
+    def __init__(self, payload):
+        self.identity = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(self.identity).hexdigest()[:32]
+        self.etag = digest
+        self.encodings = {None: self.identity, 'gzip': gzip.compress(self.identity, 9, mtime=0)}
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(self.identity, quality=11)
+
+    def etag_for(self, encoding):
+        # Each content-coding is a different representation, so it gets its own strong validator
+        return f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+
+
+def _accepted_encodings(header):
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header, available):
+    """Best of br > gzip > identity that the client accepts"""
+    accepted = _accepted_encodings(header)
+    for encoding in ('br', 'gzip'):
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def etag_matches(header, pack):
+    """If-None-Match check; any encoding variant of the pack counts as a match"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag.strip('"').split('-')[0] == pack.etag:
+            return True
+    return False
+
+
+class ContentPacks:
+    """Lazily built, per-catalog-version cache of content packs"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._packs = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def key(self, language=None, level=None, character=None):
+        language = 'kk' if language in (None, '', 'kk', 'kz') else 'ru'
+        level = int(level) if level not in (None, '') else None
+        character = self.catalog.resolve_character(character) if character else None
+        return language, level, character
+
+    def _cached(self, key, build):
+        snapshot = self.catalog.current
+        with self._lock:
+            if self._version != snapshot.version:
+                self._packs.clear()
+                self._version = snapshot.version
+            pack = self._packs.get(key)
+        if pack is None:
+            pack = ContentPack(build(snapshot))
+            with self._lock:
+                if self._version == snapshot.version:
+                    pack = self._packs.setdefault(key, pack)
+        return pack
+
+    def get(self, language=None, level=None, character=None):
+        key = self.key(language, level, character)
+        return self._cached(key, lambda snapshot: self._build_payload(snapshot, *key))
+
+    def fallback(self, kind, character, language='kk', number=1, level=1):
+        """
+        Encoded API body for a catalog fallback `kind` (see FALLBACKS), e.g.
+        {"success": true, "scenario": {...}, "fallback": true}
+        """
+        field, flagged = FALLBACKS[kind]
+        snapshot = self.catalog.current
+        character = snapshot.resolve_character(character)
+        language = self.key(language)[0]
+        try:
+            number, level = int(number), int(level)
+        except (TypeError, ValueError):
+            number, level = 1, 1
+        if kind == 'scenario':
+            # Clamp as catalog.scenario() does, so the key space stays bounded
+            entries = (snapshot.scenarios.get((character, language))
+                       or snapshot.scenarios.get((snapshot.default_character, language)) or ())
+            number = max(1, min(number, len(entries)))
+            build = lambda: self.catalog.scenario(character, number, language)
+        elif kind == 'game_mission':
+            build = lambda: self.catalog.game_mission(character)
+        else:
+            build = lambda: self.catalog.learning_content(character, level=level)
+
+        def payload(snapshot):
+            body = {'success': True, field: build()}
+            if flagged:
+                body['fallback'] = True
+            return body
+
+        return self._cached((kind, character, language, number, level), payload)
+
+    def _build_payload(self, snapshot, language, level, character):
+        missions = [localize(thaw(m), language) for m in self.catalog.missions(level=level, language=language)]
+        characters = [character] if character else sorted({c for c, _ in snapshot.scenarios})
+        scenarios = {c: thaw(snapshot.scenarios.get((c, language), ())) for c in characters}
+        learning = {c: thaw(snapshot.learning_content[c]) for c in characters if c in snapshot.learning_content}
+        games = {c: thaw(snapshot.game_missions[c]) for c in characters if c in snapshot.game_missions}
+        return {
+            'language': language,
+            'level': level,
+            'character': character,
+            'missions': missions,
+            'scenarios': scenarios,
+            'learning_content': learning,
+            'game_missions': games,
+        }
+
+    def response(self, request, language=None, level=None, character=None):
+        """Flask response for a pack honouring If-None-Match and Accept-Encoding"""
+        pack = self.get(language, level, character)
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'), pack.encodings)
+        headers = {
+            'ETag': pack.etag_for(encoding),
+            'Cache-Control': CACHE_CONTROL,
+            'Vary': 'Accept-Encoding',
+        }
+        if etag_matches(request.headers.get('If-None-Match'), pack):
+            return Response(status=304, headers=headers)
+        return _send(pack, encoding, headers)
+
+    def fallback_response(self, request, kind, character, language='kk', number=1, level=1):
+        """Flask response for fallback() in the best encoding the client accepts (not cacheable: POST)"""
+        pack = self.fallback(kind, character, language, number, level)
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'), pack.encodings)
+        return _send(pack, encoding, {'Vary': 'Accept-Encoding'})
+
+
+def _send(pack, encoding, headers):
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(pack.encodings[encoding], status=200, headers=headers,
+                    content_type='application/json; charset=utf-8')
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for pre-serialized content packs (content_packs.py)
+"""
+
+import gzip
+import json
+import os
+import tempfile
+
+from flask import Flask, request
+
+from content_catalog import ContentCatalog
+from content_packs import ContentPacks, choose_encoding
+
+CONTENT = {
+    'missions': [
+        {'id': 'abai_1', 'topic': 'Абай', 'text_kz': 'Абай ақын', 'text_ru': 'Абай поэт', 'level': 2},
+        {'id': 'ablai_1', 'topic': 'Абылай хан', 'text_kz': 'Абылай', 'level': 3},
+    ],
+    'scenarios': [{'character': 'Абай', 'scenario': 1, 'text_kz': 'Сценарий', 'text_ru': 'Сценарий RU',
+                   'options': [], 'correctAnswer': 'A'}],
+}
+
+
+def _app(tmp):
+    path = os.path.join(tmp, 'fallback_content.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(CONTENT, f, ensure_ascii=False)
+    packs = ContentPacks(ContentCatalog(path))
+    app = Flask(__name__)
+
+    @app.route('/pack')
+    def pack():
+        return packs.response(request, request.args.get('lang'), request.args.get('level'),
+                              request.args.get('character'))
+    return app.test_client(), packs
+
+
+def test_pack_is_built_once_and_localized():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, packs = _app(tmp)
+        pack = packs.get('ru', 2, 'абай')
+        assert packs.get('ru', '2', 'Абай') is pack
+        payload = json.loads(pack.identity)
+        assert payload['missions'][0]['text'] == 'Абай поэт'
+        assert payload['scenarios']['Абай'][0]['text'] == 'Сценарий RU'
+
+
+def test_gzip_etag_and_not_modified():
+    with tempfile.TemporaryDirectory() as tmp:
+        client, _ = _app(tmp)
+        first = client.get('/pack?lang=kk&level=2', headers={'Accept-Encoding': 'gzip'})
+        assert first.status_code == 200
+        assert first.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(first.data))['missions'][0]['text'] == 'Абай ақын'
+
+        again = client.get('/pack?lang=kk&level=2', headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304
+        assert again.data == b''
+
+        other = client.get('/pack?lang=ru&level=2', headers={'If-None-Match': first.headers['ETag']})
+        assert other.status_code == 200
+        assert 'Content-Encoding' not in other.headers
+
+
+def test_encoding_negotiation():
+    available = {None: b'', 'gzip': b'', 'br': b''}
+    assert choose_encoding('gzip, br', available) == 'br'
+    assert choose_encoding('br;q=0, gzip', available) == 'gzip'
+    assert choose_encoding('', available) is None
+    assert choose_encoding('br', {None: b'', 'gzip': b''}) is None
+
+
+def test_fallback_bodies_are_encoded_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, packs = _app(tmp)
+        pack = packs.fallback('scenario', 'абай', 'ru', number=7)
+        assert packs.fallback('scenario', 'Абай', 'ru', number=1) is pack
+        assert json.loads(pack.identity) == {
+            'success': True, 'fallback': True,
+            'scenario': {'scenario': 1, 'text': 'Сценарий RU', 'options': [], 'correctAnswer': 'A'},
+        }
+
+        app = Flask(__name__)
+        with app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+            response = packs.fallback_response(request, 'learning_content', 'Абай', level=2)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'ETag' not in response.headers
+        assert json.loads(gzip.decompress(response.data)) == {'success': True, 'content': None}
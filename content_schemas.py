@@ -0,0 +1,402 @@
+"""
+Content schemas for generated missions and scenarios.
+
+Each schema is declared once and compiled at import time into a flat list of
+check closures plus deterministic repairs. validate_and_repair() fixes what can
+be fixed without another model call (letter answers, string indices, missing
+option ids, isCorrect/correctAnswer disagreement, ragged question lists) and
+reports whatever is still wrong.
+"""
+
+import copy
+
+from llm_json import StreamingJSONParser
+
+OPTION_IDS = 'ABCDEFGH'
+
+
+def _letter_index(value):
+    """'B', 'b)', 'B. ...' -> 1; anything else -> None"""
+    if not isinstance(value, str):
+        return None
+    text = value.strip().upper()
+    if text and text[0] in OPTION_IDS and (len(text) == 1 or not text[1].isalpha()):
+        return OPTION_IDS.index(text[0])
+    return None
+
+
+def _as_index(value, options):
+    """Coerce an answer reference (int, '2', 'C', option text) to an option index"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip()
+        for i, option in enumerate(options or []):
+            if isinstance(option, str) and option.strip() == text:
+                return i
+        if text.lstrip('-').isdigit():
+            return int(text)
+        return _letter_index(text)
+    return None
+
+
+def _as_bool(value):
+    if isinstance(value, str) and value.strip().lower() in {'true', 'false'}:
+        return value.strip().lower() == 'true'
+    return value
+
+
+# ===== REPAIRS =====
+# Each repair mutates the object in place and returns a short description or None.
+
+def _strip_strings(obj):
+    changed = False
+    for key, value in obj.items():
+        if isinstance(value, str) and value != value.strip():
+            obj[key] = value.strip()
+            changed = True
+    return 'stripped whitespace' if changed else None
+
+
+def _repair_scenario_number(obj):
+    value = obj.get('scenario')
+    if isinstance(value, str) and value.strip().isdigit():
+        obj['scenario'] = int(value.strip())
+        return 'scenario number coerced to int'
+    return None
+
+
+def _repair_scenario_options(obj):
+    options = obj.get('options')
+    if not isinstance(options, list):
+        return None
+    notes = []
+    repaired = []
+    for i, option in enumerate(options):
+        if isinstance(option, str):
+            option = {'text': option}
+            notes.append('string options converted')
+        if not isinstance(option, dict):
+            repaired.append(option)
+            continue
+        option_id = option.get('id')
+        letter = _letter_index(option_id) if option_id is not None else None
+        expected = OPTION_IDS[i] if i < len(OPTION_IDS) else str(i)
+        if letter is None:
+            option['id'] = expected
+            notes.append('option ids assigned')
+        elif option_id != OPTION_IDS[letter]:
+            option['id'] = OPTION_IDS[letter]
+            notes.append('option ids normalized')
+        if 'isCorrect' in option:
+            fixed = _as_bool(option['isCorrect'])
+            if fixed is not option['isCorrect']:
+                option['isCorrect'] = fixed
+                notes.append('isCorrect coerced to bool')
+        repaired.append(option)
+    obj['options'] = repaired
+    return ', '.join(sorted(set(notes))) or None
+
+
+def _repair_correct_answer(obj):
+    options = obj.get('options')
+    if not isinstance(options, list) or not all(isinstance(o, dict) for o in options):
+        return None
+    ids = [o.get('id') for o in options]
+    answer = obj.get('correctAnswer')
+    letter = _letter_index(answer)
+    normalized = OPTION_IDS[letter] if letter is not None else None
+    if normalized in ids:
+        note = None
+        if answer != normalized:
+            obj['correctAnswer'] = normalized
+            note = 'correctAnswer normalized'
+        flags = [o.get('isCorrect') is True for o in options]
+        wanted = [o.get('id') == normalized for o in options]
+        if flags != wanted:
+            for option, flag in zip(options, wanted):
+                option['isCorrect'] = flag
+            note = 'isCorrect aligned with correctAnswer'
+        return note
+    marked = [o.get('id') for o in options if o.get('isCorrect') is True]
+    if len(marked) == 1:
+        obj['correctAnswer'] = marked[0]
+        return 'correctAnswer derived from isCorrect'
+    return None
+
+
+def _repair_mission_answers(obj):
+    options_kz = obj.get('options_kz')
+    answers = obj.get('correct_answers')
+    if not isinstance(answers, list) or not isinstance(options_kz, list):
+        return None
+    fixed = []
+    changed = False
+    for i, answer in enumerate(answers):
+        options = options_kz[i] if i < len(options_kz) and isinstance(options_kz[i], list) else []
+        index = _as_index(answer, options)
+        if index is not None and index != answer:
+            changed = True
+            answer = index
+        fixed.append(answer)
+    if changed:
+        obj['correct_answers'] = fixed
+        return 'correct_answers coerced to indices'
+    return None
+
+
+def _repair_mission_lengths(obj):
+    lists = [obj.get(k) for k in ('questions_kz', 'options_kz', 'correct_answers') if k in obj]
+    if len(lists) < 2 or not all(isinstance(v, list) for v in lists):
+        return None
+    shortest = min(len(v) for v in lists)
+    if shortest == 0 or all(len(v) == shortest for v in lists):
+        return None
+    for key in ('questions_kz', 'options_kz', 'correct_answers'):
+        if isinstance(obj.get(key), list):
+            obj[key] = obj[key][:shortest]
+    return f'question lists truncated to {shortest}'
+
+
+def _repair_game_mission(obj):
+    notes = []
+    options = obj.get('options')
+    if isinstance(options, list) and any(isinstance(o, dict) for o in options):
+        obj['options'] = [o.get('text', '') if isinstance(o, dict) else o for o in options]
+        notes.append('option objects flattened')
+    index = _as_index(obj.get('correctIndex'), obj.get('options'))
+    if index is not None and index != obj.get('correctIndex'):
+        obj['correctIndex'] = index
+        notes.append('correctIndex coerced')
+    return ', '.join(notes) or None
+
+
+# ===== CROSS-FIELD RULES =====
+# Each rule returns an error message or None. `needs` lists the fields it reads.
+
+def _rule_one_correct_option(obj):
+    options = obj['options']
+    if not all(isinstance(o, dict) for o in options):
+        return 'options must be objects'
+    correct = [o for o in options if o.get('isCorrect') is True]
+    if len(correct) != 1:
+        return f'exactly one option must have isCorrect=true (found {len(correct)})'
+    return None
+
+
+def _rule_correct_answer_exists(obj):
+    ids = [o.get('id') for o in obj['options'] if isinstance(o, dict)]
+    if obj['correctAnswer'] not in ids:
+        return f"correctAnswer {obj['correctAnswer']!r} is not an option id"
+    marked = [o.get('id') for o in obj['options'] if isinstance(o, dict) and o.get('isCorrect') is True]
+    if marked and marked != [obj['correctAnswer']]:
+        return 'correctAnswer disagrees with isCorrect'
+    return None
+
+
+def _rule_unique_option_ids(obj):
+    ids = [o.get('id') for o in obj['options'] if isinstance(o, dict)]
+    if len(ids) != len(set(ids)):
+        return 'option ids must be unique'
+    return None
+
+
+def _rule_mission_lengths(obj):
+    counts = {k: len(obj[k]) for k in ('questions_kz', 'options_kz', 'correct_answers')}
+    if len(set(counts.values())) != 1:
+        return 'questions_kz, options_kz and correct_answers lengths differ: ' + ', '.join(
+            f'{k}={v}' for k, v in counts.items())
+    return None
+
+
+def _rule_mission_option_lists(obj):
+    for i, options in enumerate(obj['options_kz']):
+        if not isinstance(options, list) or len(options) < 2:
+            return f'options_kz[{i}] must list at least 2 options'
+        if not all(isinstance(o, str) and o.strip() for o in options):
+            return f'options_kz[{i}] must contain non-empty strings'
+    return None
+
+
+def _rule_mission_answer_range(obj):
+    for i, (answer, options) in enumerate(zip(obj['correct_answers'], obj['options_kz'])):
+        if isinstance(answer, bool) or not isinstance(answer, int):
+            return f'correct_answers[{i}] must be an integer'
+        if isinstance(options, list) and not 0 <= answer < len(options):
+            return f'correct_answers[{i}]={answer} is out of range'
+    return None
+
+
+def _rule_game_correct_index(obj):
+    index = obj['correctIndex']
+    if isinstance(index, bool) or not isinstance(index, int):
+        return 'correctIndex must be an integer'
+    if not 0 <= index < len(obj['options']):
+        return f'correctIndex {index} is out of range'
+    return None
+
+
+# ===== SCHEMA SPECS =====
+
+SCENARIO_SPEC = {
+    'name': 'scenario',
+    'fields': {
+        'scenario': {'type': (int, str)},
+        'text': {'type': str, 'min_length': 10},
+        'options': {'type': list, 'min_items': 2, 'max_items': 6},
+        'correctAnswer': {'type': str},
+        'wrongConsequence': {'type': str, 'min_length': 1},
+        'correctConsequence': {'type': str, 'min_length': 1},
+        'historicalContext': {'type': str, 'required': False},
+        'nextScenarioSetup': {'type': str, 'required': False},
+    },
+    'repairs': [_strip_strings, _repair_scenario_number, _repair_scenario_options, _repair_correct_answer],
+    'rules': [
+        (('options', 'correctAnswer'), _rule_one_correct_option),
+        (('options',), _rule_unique_option_ids),
+        (('options', 'correctAnswer'), _rule_correct_answer_exists),
+    ],
+}
+
+MISSION_SPEC = {
+    'name': 'mission',
+    'fields': {
+        'text_kz': {'type': str, 'min_length': 20},
+        'questions_kz': {'type': list, 'min_items': 1, 'items': str},
+        'options_kz': {'type': list, 'min_items': 1, 'items': list},
+        'correct_answers': {'type': list, 'min_items': 1},
+        'text_ru': {'type': str, 'required': False},
+        'topic': {'type': str, 'required': False},
+    },
+    'repairs': [_strip_strings, _repair_mission_answers, _repair_mission_lengths],
+    'rules': [
+        (('options_kz',), _rule_mission_option_lists),
+        (('questions_kz', 'options_kz', 'correct_answers'), _rule_mission_lengths),
+        (('options_kz', 'correct_answers'), _rule_mission_answer_range),
+    ],
+}
+
+GAME_MISSION_SPEC = {
+    'name': 'game_mission',
+    'fields': {
+        'text': {'type': str, 'min_length': 11},
+        'options': {'type': list, 'min_items': 3, 'items': str},
+        'correctIndex': {'type': (int, str)},
+        'explanation': {'type': str, 'required': False},
+    },
+    'repairs': [_strip_strings, _repair_game_mission],
+    'rules': [
+        (('options', 'correctIndex'), _rule_game_correct_index),
+    ],
+}
+
+
+class CompiledSchema:
+    """Validator built once from a spec; call validate_and_repair() per object"""
+
+    def __init__(self, spec):
+        self.name = spec['name']
+        self.field_types = {name: f['type'] for name, f in spec['fields'].items()}
+        self.required = tuple(name for name, f in spec['fields'].items() if f.get('required', True))
+        self._repairs = tuple(spec.get('repairs', ()))
+        # (needed_fields, check) pairs; field checks first, then cross-field rules
+        self._checks = tuple(self._compile_fields(spec['fields'])) + tuple(
+            (frozenset(needs), rule) for needs, rule in spec.get('rules', ()))
+
+    @staticmethod
+    def _compile_fields(fields):
+        for name, f in fields.items():
+            types = f['type'] if isinstance(f['type'], tuple) else (f['type'],)
+
+            def check_type(obj, name=name, types=types):
+                value = obj[name]
+                if isinstance(value, bool) and bool not in types:
+                    return f'{name} has unexpected type bool'
+                if not isinstance(value, types):
+                    return f'{name} has unexpected type {type(value).__name__}'
+                return None
+            yield frozenset([name]), check_type
+
+            if 'min_length' in f:
+                def check_length(obj, name=name, minimum=f['min_length']):
+                    value = obj[name]
+                    if isinstance(value, str) and len(value.strip()) < minimum:
+                        return f'{name} is shorter than {minimum} characters'
+                    return None
+                yield frozenset([name]), check_length
+
+            if 'min_items' in f or 'max_items' in f:
+                def check_items(obj, name=name, lo=f.get('min_items', 0), hi=f.get('max_items')):
+                    value = obj[name]
+                    if isinstance(value, list) and (len(value) < lo or (hi is not None and len(value) > hi)):
+                        bound = f'{lo}..{hi}' if hi is not None else f'at least {lo}'
+                        return f'{name} must have {bound} items (got {len(value)})'
+                    return None
+                yield frozenset([name]), check_items
+
+            if 'items' in f:
+                def check_item_types(obj, name=name, item_type=f['items']):
+                    value = obj[name]
+                    if isinstance(value, list) and not all(isinstance(v, item_type) for v in value):
+                        return f'{name} items must be {item_type.__name__}'
+                    return None
+                yield frozenset([name]), check_item_types
+
+    def repair(self, obj):
+        """Apply deterministic repairs in place; returns the list of repairs made"""
+        applied = []
+        if not isinstance(obj, dict):
+            return applied
+        for repair in self._repairs:
+            note = repair(obj)
+            if note:
+                applied.append(note)
+        return applied
+
+    def validate(self, obj, partial=False):
+        """Return a list of error messages (empty when valid)"""
+        if not isinstance(obj, dict):
+            return [f'{self.name} must be a JSON object']
+        errors = []
+        if not partial:
+            errors.extend(f'missing required field: {name}' for name in self.required if name not in obj)
+        present = obj.keys()
+        failed = set()
+        for needs, check in self._checks:
+            if not needs <= present or needs & failed:
+                continue
+            error = check(obj)
+            if error:
+                errors.append(error)
+                failed |= needs
+        return errors
+
+    def validate_and_repair(self, obj):
+        """Repair a copy of `obj`, then validate it. Returns (obj, errors, repairs)."""
+        obj = copy.deepcopy(obj)
+        repairs = self.repair(obj)
+        return obj, self.validate(obj), repairs
+
+    def is_valid(self, obj):
+        return not self.validate(obj)
+
+    def check_field(self, name, value, parsed):
+        """Streaming hook: reject only what repairs cannot fix in the fields seen so far"""
+        candidate = copy.deepcopy(parsed)
+        self.repair(candidate)
+        errors = self.validate(candidate, partial=True)
+        return errors[0] if errors else None
+
+    def parser(self):
+        """StreamingJSONParser wired to this schema"""
+        return StreamingJSONParser(fields=self.field_types, required=self.required,
+                                   check_field=self.check_field)
+
+
+SCENARIO_SCHEMA = CompiledSchema(SCENARIO_SPEC)
+MISSION_SCHEMA = CompiledSchema(MISSION_SPEC)
+GAME_MISSION_SCHEMA = CompiledSchema(GAME_MISSION_SPEC)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the compiled content schemas (content_schemas.py)
+"""
+
+import json
+
+from content_schemas import SCENARIO_SCHEMA, MISSION_SCHEMA, GAME_MISSION_SCHEMA
+from llm_json import SchemaViolation
+
+SCENARIO = {
+    'scenario': 2,
+    'text': 'Жоңғар әскері шекараға жақындады. Не істейсіз?',
+    'options': [{'id': 'A', 'text': 'Шабуыл', 'isCorrect': False},
+                {'id': 'B', 'text': 'Бірігу', 'isCorrect': True},
+                {'id': 'C', 'text': 'Шегіну', 'isCorrect': False}],
+    'correctAnswer': 'B',
+    'wrongConsequence': 'Жеңіліс',
+    'correctConsequence': 'Жеңіс',
+}
+
+MISSION = {
+    'text_kz': 'Абай Құнанбайұлы 1845 жылы Шыңғыстау өңірінде туған.',
+    'questions_kz': ['Абай қай жылы туған?', 'Абай қай өңірде туған?'],
+    'options_kz': [['1845', '1865'], ['Шыңғыстау', 'Алатау']],
+    'correct_answers': [0, 0],
+}
+
+
+def test_valid_objects_pass_unchanged():
+    obj, errors, repairs = SCENARIO_SCHEMA.validate_and_repair(SCENARIO)
+    assert errors == [] and repairs == []
+    assert obj == SCENARIO
+    assert MISSION_SCHEMA.is_valid(MISSION)
+
+
+def test_scenario_letter_and_flags_are_repaired():
+    broken = json.loads(json.dumps(SCENARIO))
+    broken['correctAnswer'] = 'b) Бірігу'
+    broken['options'][0]['isCorrect'] = 'true'
+    del broken['options'][2]['id']
+    obj, errors, repairs = SCENARIO_SCHEMA.validate_and_repair(broken)
+    assert errors == []
+    assert obj['correctAnswer'] == 'B'
+    assert [o['isCorrect'] for o in obj['options']] == [False, True, False]
+    assert obj['options'][2]['id'] == 'C'
+    assert repairs
+    # The input is never mutated
+    assert broken['correctAnswer'] == 'b) Бірігу'
+
+
+def test_mission_answers_coerced_and_lists_truncated():
+    broken = dict(MISSION, correct_answers=['A', 'Алатау', 0])
+    obj, errors, repairs = MISSION_SCHEMA.validate_and_repair(broken)
+    assert errors == []
+    assert obj['correct_answers'] == [0, 1]
+    assert len(repairs) == 2
+
+
+def test_unrepairable_errors_are_reported():
+    obj, errors, _ = MISSION_SCHEMA.validate_and_repair(dict(MISSION, correct_answers=[5, 0]))
+    assert any('out of range' in e for e in errors)
+    obj, errors, _ = GAME_MISSION_SCHEMA.validate_and_repair({'text': 'қысқа', 'options': ['a', 'b', 'c'],
+                                                             'correctIndex': 'C'})
+    assert obj['correctIndex'] == 2
+    assert errors == ['text is shorter than 11 characters']
+
+
+def test_parser_rejects_stream_only_when_repair_cannot_help():
+    parser = SCENARIO_SCHEMA.parser()
+    # A lowercase letter answer is repairable, so streaming continues
+    text = json.dumps(dict(SCENARIO, correctAnswer='b'), ensure_ascii=False)
+    parser.feed(text)
+    assert parser.done
+
+    parser = MISSION_SCHEMA.parser()
+    try:
+        parser.feed('{"text_kz": "' + MISSION['text_kz'] + '", "options_kz": [["жалғыз"]], ')
+    except SchemaViolation as e:
+        assert e.field == 'options_kz'
+    else:
+        raise AssertionError('single-option question lists must be rejected early')
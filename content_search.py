@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Full-text search over BATYR BOL learning content.
+
+Texts are tokenized with Kazakh/Russian aware normalization: Kazakh-specific
+letters are folded to their closest Russian counterparts (so "Казак" finds
+"Қазақ"), common suffixes are stripped and stopwords dropped. Passages are
+kept in an inverted index that is updated on every add() and remove() and
+ranked with BM25.
+
+CLI:
+    python content_search.py "абылай хан"
+"""
+
+import ast
+import functools
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+import sys
+import threading
+import unicodedata
+
+# Kazakh letters -> nearest Russian letter; ё -> е
+_FOLD = str.maketrans({
+    'ә': 'а', 'ғ': 'г', 'қ': 'к', 'ң': 'н', 'ө': 'о', 'ұ': 'у', 'ү': 'у', 'һ': 'х', 'і': 'и', 'ё': 'е',
+})
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+STOPWORDS = frozenset('''
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по
+только ее мне было вот от меня еще нет о из ему теперь когда даже ну ли если уже
+или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей
+может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего
+раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь
+этом один почти мой тем чтобы нее были куда зачем всех никогда можно при наконец
+два об другой хоть после над больше тот через эти нас про всего них какая много
+разве три эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя
+такой им более всегда конечно всю между это год году
+мен бен пен және да де та те ол бул осы сол мына ана биз сиз сен мен олар
+ушин деп еди болды болып бар жок неге кандай ким не кай калай
+'''.split())
+
+# Longest suffixes first; stripped repeatedly for agglutinative Kazakh forms
+_SUFFIXES = tuple(sorted(set('''
+лардын лердин дардын дердин тардын тердин лардан лерден ларга лерге лармен лермен
+нын нин дын дин тын тин нан нен дан ден тан тен ларды лерди
+лар лер дар дер тар тер га ге ка ке на не да де та те ны ни ды ди ты ти
+мен бен пен сы си ын ин ы и
+ами ями ого его ому ему ыми ими ах ях ам ям ов ев ей ий ый ой ая яя ое ее ые ие ом ем ую юю ых их ым им
+а я о е у ю ь
+'''.split()), key=len, reverse=True))
+_MIN_STEM = 3
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFC', text or '').lower()
+    return text.translate(_FOLD)
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(token):
+    for _ in range(3):
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+                token = token[:-len(suffix)]
+                break
+        else:
+            break
+    return token
+
+
+def tokenize(text):
+    """Normalized, stemmed terms (numbers such as years are kept as-is)"""
+    terms = []
+    for token in _TOKEN_RE.findall(normalize(text)):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        terms.append(token if token.isdigit() else stem(token))
+    return terms
+
+
+class ContentSearchIndex:
+    """
+    Incremental inverted index with BM25 ranking.
+
+    Each passage is a dict with at least 'title' and 'text'; any other keys
+    (source, lang, mission id, ...) are returned with the hit. Titles are
+    weighted `title_boost` times.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, title_boost=2):
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self._postings = {}      # term -> {doc_no: tf}
+        self._doc_len = []
+        self._docs = []
+        self._doc_terms = []     # doc_no -> its terms, so removal only touches its own postings
+        self._free = []          # doc_nos of removed passages, reused by add()
+        self._ids = {}           # external id -> doc_no
+        self._total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, doc_id, passage):
+        """Index a passage; re-adding an id replaces the previous version"""
+        terms = tokenize(passage.get('title', '')) * self.title_boost + tokenize(passage.get('text', ''))
+        tf = {}
+        for term in terms:
+            tf[term] = tf.get(term, 0) + 1
+        with self._lock:
+            if doc_id in self._ids:
+                self._remove(self._ids.pop(doc_id))
+            if self._free:
+                doc_no = self._free.pop()
+                self._docs[doc_no] = dict(passage, id=doc_id)
+                self._doc_len[doc_no] = len(terms)
+                self._doc_terms[doc_no] = tuple(tf)
+            else:
+                doc_no = len(self._docs)
+                self._docs.append(dict(passage, id=doc_id))
+                self._doc_len.append(len(terms))
+                self._doc_terms.append(tuple(tf))
+            self._ids[doc_id] = doc_no
+            self._total_len += len(terms)
+            for term, count in tf.items():
+                self._postings.setdefault(term, {})[doc_no] = count
+
+    def remove(self, doc_id):
+        """Drop a passage; returns False if `doc_id` is not indexed"""
+        with self._lock:
+            doc_no = self._ids.pop(doc_id, None)
+            if doc_no is None:
+                return False
+            self._remove(doc_no)
+            return True
+
+    def _remove(self, doc_no):
+        for term in self._doc_terms[doc_no]:
+            postings = self._postings[term]
+            del postings[doc_no]
+            if not postings:
+                del self._postings[term]
+        self._total_len -= self._doc_len[doc_no]
+        self._doc_len[doc_no] = 0
+        self._docs[doc_no] = None
+        self._doc_terms[doc_no] = ()
+        self._free.append(doc_no)
+
+    def search(self, query, limit=10, **filters):
+        """
+        Rank passages for `query`. Keyword filters match passage fields
+        exactly, e.g. search('абай', lang='kz', source='missions').
+        """
+        terms = set(tokenize(query))
+        if not terms or limit <= 0:
+            return []
+        wanted = [(k, v) for k, v in filters.items() if v is not None]
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                return []
+            docs, lens = self._docs, self._doc_len
+            # BM25 length norm of a passage is c0 + c1 * length, so add() has nothing to rebuild
+            k1, b = self.k1, self.b
+            c0, c1 = k1 * (1 - b), k1 * b / ((self._total_len / n) or 1.0)
+            # Rarest terms first. A term adds less than its weight to any score, so once the weights
+            # still to come sum to less than the current k-th best score, unscored passages cannot
+            # make the top `limit` and the remaining terms only update the known candidates.
+            ordered = sorted(filter(None, map(self._postings.get, terms)), key=len)
+            weighted = [(math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5)) * (k1 + 1), postings)
+                        for postings in ordered]
+            remaining = sum(weight for weight, _ in weighted)
+            scores = {}
+            pruned = False
+            for weight, postings in weighted:
+                remaining -= weight
+                if not pruned:
+                    if scores:
+                        get = scores.get
+                        for doc_no, tf in postings.items():
+                            scores[doc_no] = get(doc_no, 0.0) + weight * tf / (tf + c0 + c1 * lens[doc_no])
+                    else:
+                        scores.update((doc_no, weight * tf / (tf + c0 + c1 * lens[doc_no]))
+                                      for doc_no, tf in postings.items())
+                    if remaining > 0:
+                        pruned = self._prune(scores, remaining, limit, wanted)
+                else:
+                    get = postings.get
+                    for doc_no in scores:
+                        tf = get(doc_no)
+                        if tf:
+                            scores[doc_no] += weight * tf / (tf + c0 + c1 * lens[doc_no])
+            best = self._top(scores, limit, wanted if not pruned else None)
+            return [dict(docs[doc_no], score=round(score, 4), snippet=_snippet(docs[doc_no]['text'], terms))
+                    for doc_no, score in best]
+
+    def _matches(self, doc_no, wanted):
+        doc = self._docs[doc_no]
+        return all(doc.get(k) == v for k, v in wanted)
+
+    def _prune(self, scores, remaining, limit, wanted):
+        """
+        Keep only candidates that can still make the top `limit` (and pass the
+        filters); returns False, leaving `scores` alone, while unscored
+        passages could still get there
+        """
+        if len(scores) < limit:
+            return False
+        # Filtering only lowers the k-th best score, so check the cheap unfiltered bound first
+        threshold = heapq.nlargest(limit, scores.values())[-1]
+        if remaining >= threshold:
+            return False
+        if wanted:
+            top = self._top(scores, limit, wanted)
+            if len(top) < limit or remaining >= top[-1][1]:
+                return False
+            threshold = top[-1][1]
+        survivors = {d: s for d, s in scores.items() if s + remaining >= threshold}
+        if wanted:
+            survivors = {d: s for d, s in survivors.items() if self._matches(d, wanted)}
+        scores.clear()
+        scores.update(survivors)
+        return True
+
+    def _top(self, scores, limit, wanted):
+        key = lambda item: item[1]
+        if not wanted:
+            return heapq.nlargest(limit, scores.items(), key=key)
+        # Filter the best few first; scan every candidate only when too few of those match
+        head = heapq.nlargest(limit * 4, scores.items(), key=key)
+        best = [item for item in head if self._matches(item[0], wanted)][:limit]
+        if len(best) < limit and len(head) < len(scores):
+            best = heapq.nlargest(limit, (item for item in scores.items() if self._matches(item[0], wanted)),
+                                  key=key)
+        return best
+
+    # ===== PERSISTENCE =====
+
+    def save(self, path):
+        """Write the index (passages and postings, compacted) to a gzipped JSON file"""
+        with self._lock:
+            live = [doc_no for doc_no, doc in enumerate(self._docs) if doc is not None]
+            renumber = {old: new for new, old in enumerate(live)}
+            state = {
+                'params': {'k1': self.k1, 'b': self.b, 'title_boost': self.title_boost},
+                'docs': [self._docs[d] for d in live],
+                'doc_len': [self._doc_len[d] for d in live],
+                'postings': {term: [[renumber[d], tf] for d, tf in postings.items()]
+                             for term, postings in self._postings.items() if postings},
+            }
+        tmp = f'{path}.tmp'
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Index previously written by save(); passages are not re-tokenized"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            state = json.load(f)
+        index = cls(**state['params'])
+        index._docs = state['docs']
+        index._doc_len = state['doc_len']
+        index._ids = {doc['id']: doc_no for doc_no, doc in enumerate(index._docs)}
+        index._total_len = sum(index._doc_len)
+        index._postings = {term: dict(map(tuple, postings)) for term, postings in state['postings'].items()}
+        doc_terms = [[] for _ in index._docs]
+        for term, postings in index._postings.items():
+            for doc_no in postings:
+                doc_terms[doc_no].append(term)
+        index._doc_terms = [tuple(terms) for terms in doc_terms]
+        return index
+
+
+def _snippet(text, terms, width=200):
+    """Sentence with the most query terms, trimmed to `width` characters"""
+    sentences = re.split(r'(?<=[.!?])\s+', text or '')
+    best = max(sentences, key=lambda s: len(terms.intersection(tokenize(s))), default='')
+    return best if len(best) <= width else best[:width].rsplit(' ', 1)[0] + '…'
+
+
+# ===== CORPORA =====
+
+def index_catalog(index, catalog):
+    """Curated missions and learning content from a content_catalog.ContentCatalog"""
+    for i, mission in enumerate(catalog.missions()):
+        for lang in ('kz', 'ru'):
+            text = mission.get(f'text_{lang}')
+            if text:
+                index.add(f"mission:{i}:{lang}", {
+                    'title': mission.get('topic', ''), 'text': text, 'lang': lang,
+                    'source': 'missions', 'mission_id': mission.get('id'),
+                })
+    for character in catalog.current.learning_content:
+        content = catalog.learning_content(character)
+        index.add(f'learning:{character}', {
+            'title': character, 'text': content.get('text_kz', ''), 'lang': 'kz', 'source': 'learning_content',
+        })
+    return index
+
+
+def index_educational_content(index, items):
+    """bb_bot.EDUCATIONAL_CONTENT entries ({'title': {'kz', 'ru'}, 'text': {...}, 'key_facts': {...}})"""
+    for i, item in enumerate(items or []):
+        for lang, text in (item.get('text') or {}).items():
+            facts = ' '.join((item.get('key_facts') or {}).get(lang, []))
+            index.add(f'educational:{i}:{lang}', {
+                'title': (item.get('title') or {}).get(lang, ''), 'text': f'{text} {facts}'.strip(),
+                'lang': lang, 'source': 'educational_content',
+            })
+    return index
+
+
+def index_learning_database(index, database):
+    """learning_model.AdaptiveLearningModel.content_database ({type: [{'title', 'text', ...}]})"""
+    for content_type, items in (database or {}).items():
+        for i, item in enumerate(items):
+            index.add(f'learning_model:{content_type}:{i}', {
+                'title': item.get('title', ''), 'text': item.get('text', ''), 'lang': 'ru',
+                'source': 'learning_model', 'type': content_type, 'difficulty': item.get('difficulty'),
+            })
+    return index
+
+
+def load_module_literal(path, name):
+    """
+    Read a top-level literal assignment (e.g. EDUCATIONAL_CONTENT) from a module
+    without importing it, so bot-only dependencies are not required.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError) as e:
+        print(f"[SEARCH] Could not read {path}: {e}")
+        return None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == name for t in node.targets):
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError:
+                return None
+    return None
+
+
+def build_default_index(catalog, base_dir=None):
+    """Index every content corpus shipped with the app"""
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+    index = ContentSearchIndex()
+    index_catalog(index, catalog)
+    index_educational_content(index, load_module_literal(os.path.join(base_dir, 'bb_bot.py'), 'EDUCATIONAL_CONTENT'))
+    try:
+        from learning_model import AdaptiveLearningModel
+        index_learning_database(index, AdaptiveLearningModel().content_database)
+    except ImportError as e:
+        print(f"[SEARCH] learning_model content not indexed: {e}")
+    return index
+
+
+if __name__ == '__main__':
+    from content_catalog import ContentCatalog
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    search_index = build_default_index(ContentCatalog(os.path.join(here, 'fallback_content.json')), here)
+    for hit in search_index.search(' '.join(sys.argv[1:]) or 'абылай хан', limit=5):
+        print(f"{hit['score']:7.3f}  [{hit['source']}/{hit['lang']}] {hit['title']}: {hit['snippet']}")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the content search index (content_search.py)
+"""
+
+import os
+import tempfile
+
+from content_search import ContentSearchIndex, load_module_literal, tokenize
+
+
+def _index():
+    index = ContentSearchIndex()
+    index.add('khanate', {'title': 'Қазақ хандығы', 'lang': 'kz', 'source': 'missions',
+                          'text': 'Қазақ хандығы 1465 жылы құрылды. Керей мен Жәнібек хандар руларды біріктірді.'})
+    index.add('abai', {'title': 'Абай', 'lang': 'kz', 'source': 'missions',
+                       'text': 'Абай Құнанбайұлы ақын және философ болған. Ол қара сөздерін жазды.'})
+    index.add('khanate_ru', {'title': 'Казахское ханство', 'lang': 'ru', 'source': 'missions',
+                             'text': 'Казахское ханство было основано в 1465 году ханами Кереем и Жанибеком.'})
+    return index
+
+
+def test_kazakh_letters_fold_and_suffixes_strip():
+    assert tokenize('Қазақ хандығының') == tokenize('казак хандыгы')
+    assert tokenize('ханства') == tokenize('ханство')
+    assert tokenize('и в на') == []
+    assert '1465' in tokenize('1465 жылы')
+
+
+def test_ranking_and_filters():
+    index = _index()
+    results = index.search('казак хандыгы')
+    assert results[0]['id'] == 'khanate'
+    assert results[0]['snippet'].startswith('Қазақ хандығы 1465')
+    assert [r['id'] for r in index.search('1465', lang='ru')] == ['khanate_ru']
+    assert index.search('математика') == []
+
+
+def test_incremental_add_and_replace():
+    index = _index()
+    index.add('zhambyl', {'title': 'Жамбыл', 'text': 'Жамбыл Жабаев айтыскер ақын болған.', 'lang': 'kz'})
+    assert index.search('айтыскер')[0]['id'] == 'zhambyl'
+    index.add('zhambyl', {'title': 'Жамбыл', 'text': 'Жамбыл жүз жыл өмір сүрді.', 'lang': 'kz'})
+    assert index.search('айтыскер') == []
+    assert len(index) == 4
+
+
+def test_bot_lessons_are_read_without_importing_the_bot():
+    here = os.path.dirname(os.path.abspath(__file__))
+    lessons = load_module_literal(os.path.join(here, 'bb_bot.py'), 'EDUCATIONAL_CONTENT')
+    assert lessons and 'kz' in lessons[0]['title']
+
+
+def test_save_and_load_round_trip():
+    index = _index()
+    index.add('abai', {'title': 'Абай', 'lang': 'kz', 'source': 'missions', 'text': 'Абай қара сөздер жазды.'})
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.json.gz')
+        index.save(path)
+        loaded = ContentSearchIndex.load(path)
+    assert len(loaded) == len(index) == 3
+    for query in ('казак хандыгы', 'абай', '1465'):
+        assert [(r['id'], r['score']) for r in loaded.search(query)] == \
+            [(r['id'], r['score']) for r in index.search(query)]
+
+
+def test_remove_frees_postings_and_slots():
+    index = _index()
+    assert index.remove('abai') and not index.remove('abai')
+    assert index.search('абай') == [] and len(index) == 2
+    assert 'абай' not in index._postings
+    index.add('zhambyl', {'title': 'Жамбыл', 'text': 'Жамбыл Жабаев айтыскер ақын болған.', 'lang': 'kz'})
+    assert len(index._docs) == 3      # the freed slot was reused
+    assert index.search('айтыскер')[0]['id'] == 'zhambyl'
+    assert index.search('казак хандыгы')[0]['id'] == 'khanate'
+
+
+def test_pruned_search_matches_exhaustive_bm25():
+    import math
+    import random
+    rng = random.Random(3)
+    words = 'хан би батыр жүз дала жер ел тарих соғыс бейбіт сауда қала ақын жыр'.split()
+    skew = [1 / (n + 1) for n in range(len(words))]     # long and short posting lists, so pruning kicks in
+    index = ContentSearchIndex()
+    passages = {}
+    for i in range(300):
+        passages[f'p{i}'] = {'title': rng.choice(words), 'text': ' '.join(rng.choices(words, skew, k=rng.randint(3, 30))),
+                             'lang': rng.choice(('kz', 'ru'))}
+        index.add(f'p{i}', passages[f'p{i}'])
+    tf = {doc_id: {} for doc_id in passages}
+    for doc_id, p in passages.items():
+        for term in tokenize(p['title']) * index.title_boost + tokenize(p['text']):
+            tf[doc_id][term] = tf[doc_id][term] + 1 if term in tf[doc_id] else 1
+    avg = sum(sum(t.values()) for t in tf.values()) / len(tf)
+
+    def exhaustive(query, lang=None):
+        scores = {}
+        for term in set(tokenize(query)):
+            df = sum(1 for t in tf.values() if term in t)
+            weight = math.log(1 + (len(tf) - df + 0.5) / (df + 0.5)) * (index.k1 + 1)
+            for doc_id, t in tf.items():
+                if term in t and (lang is None or passages[doc_id]['lang'] == lang):
+                    norm = index.k1 * (1 - index.b + index.b * sum(t.values()) / avg)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * t[term] / (t[term] + norm)
+        return sorted(round(s, 4) for s in scores.values())[::-1][:5]
+
+    for _ in range(30):
+        query = ' '.join(rng.sample(words, 3))
+        for lang in (None, 'kz'):
+            assert [r['score'] for r in index.search(query, limit=5, lang=lang)] == exhaustive(query, lang)
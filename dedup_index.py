@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Near-duplicate detection for mission texts.
+
+Texts are reduced to word shingles, summarised as MinHash signatures and
+bucketed with LSH banding, so a query only compares against the handful of
+stored texts that share a band. Used to keep generated missions from repeating
+curated content or earlier generations.
+
+CLI:
+    python dedup_index.py fallback_content.json [--threshold 0.6] [--write OUT]
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import zlib
+from collections import deque
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def shingles(text, k=3):
+    """Set of k-word shingles of the normalized text"""
+    words = _WORD_RE.findall((text or '').lower())
+    if len(words) <= k:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+    """Fixed family of universal hash permutations (seeded, so signatures are stable)"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+    def signature(self, shingle_set):
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in shingle_set]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        p = _MERSENNE_PRIME
+        return tuple(min((a * h + b) % p for h in hashes) & _MAX_HASH for a, b in self._perms)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class DedupIndex:
+    """
+    MinHash LSH index.
+
+    With the defaults (64 permutations, 16 bands of 4 rows) texts with a
+    Jaccard similarity above ~0.5 almost always share a band; candidates are
+    then filtered by the estimated similarity against `threshold`.
+
+    Texts added with add_recent() form a ring of the last `max_recent`: the
+    oldest is dropped when a new one comes in, so a long-running process that
+    keeps adding generated texts stays bounded. add() entries are permanent.
+    `on_evict(doc_id)` is called for each dropped id, so callers can drop
+    whatever else they keep under that id.
+    """
+
+    def __init__(self, threshold=0.6, num_perm=64, bands=16, shingle_size=3, max_recent=None, on_evict=None):
+        if num_perm % bands:
+            raise ValueError('num_perm must be divisible by bands')
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self._signatures = {}
+        self._buckets = [dict() for _ in range(bands)]
+        self.max_recent = max_recent
+        self.on_evict = on_evict
+        self._recent = deque()
+        self._recent_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._signatures
+
+    def signature(self, text):
+        return self.hasher.signature(shingles(text, self.shingle_size))
+
+    def _band_keys(self, sig):
+        r = self.rows
+        return [sig[i * r:(i + 1) * r] for i in range(self.bands)]
+
+    def add(self, doc_id, text=None, signature=None):
+        sig = signature if signature is not None else self.signature(text)
+        with self._lock:
+            self._add(doc_id, sig)
+        return sig
+
+    def _add(self, doc_id, sig):
+        if doc_id in self._signatures:
+            self._remove(doc_id)
+        self._signatures[doc_id] = sig
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            bucket.setdefault(key, set()).add(doc_id)
+
+    def add_recent(self, text=None, signature=None, prefix='recent'):
+        """Add under a new `prefix:n` id to the ring of recent texts; returns the id"""
+        doc_id = f'{prefix}:{next(self._recent_ids)}'
+        sig = signature if signature is not None else self.signature(text)
+        evicted = []
+        with self._lock:
+            self._add(doc_id, sig)
+            self._recent.append(doc_id)
+            while self.max_recent is not None and len(self._recent) > self.max_recent:
+                evicted.append(self._recent.popleft())
+                self._remove(evicted[-1])
+        if self.on_evict is not None:
+            for old_id in evicted:
+                self.on_evict(old_id)
+        return doc_id
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        sig = self._signatures.pop(doc_id, None)
+        if sig is None:
+            return
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            ids = bucket.get(key)
+            if ids:
+                ids.discard(doc_id)
+                if not ids:
+                    del bucket[key]
+
+    def query(self, text=None, signature=None, threshold=None):
+        """Return [(doc_id, similarity)] above threshold, most similar first"""
+        sig = signature if signature is not None else self.signature(text)
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, self._band_keys(sig)):
+                ids = bucket.get(key)
+                if ids:
+                    candidates |= ids
+            scored = [(doc_id, similarity(sig, self._signatures[doc_id])) for doc_id in candidates]
+        matches = [m for m in scored if m[1] >= threshold]
+        matches.sort(key=lambda m: m[1], reverse=True)
+        return matches
+
+    def find_duplicate(self, text=None, signature=None, threshold=None):
+        """Closest stored (doc_id, similarity) above threshold, or None"""
+        matches = self.query(text, signature=signature, threshold=threshold)
+        return matches[0] if matches else None
+
+
+def mission_texts(mission):
+    """(suffix, text) pairs of a mission that take part in deduplication"""
+    for field in ('text_kz', 'text_ru', 'text'):
+        text = mission.get(field)
+        if isinstance(text, str) and text.strip():
+            yield field, text
+
+
+def index_missions(index, missions, prefix='fallback'):
+    # Positions keep doc ids unique even when the corpus repeats a mission id
+    for i, mission in enumerate(missions):
+        for field, text in mission_texts(mission):
+            index.add(f'{prefix}:{i}:{field}', text)
+    return index
+
+
+def load_corpus_index(path, threshold=0.6):
+    """Index the curated missions of fallback_content.json (empty if unreadable)"""
+    index = DedupIndex(threshold=threshold)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            missions = json.load(f).get('missions', [])
+    except (OSError, ValueError) as e:
+        print(f"[DEDUP] Could not index {path}: {e}")
+        return index
+    return index_missions(index, missions)
+
+
+def dedupe_missions(missions, threshold=0.6):
+    """
+    Keep the first mission of every near-duplicate group.
+    Returns (kept, dropped) where dropped is [(mission, duplicate_of_id, similarity)].
+    """
+    index = DedupIndex(threshold=threshold)
+    kept, dropped = [], []
+    for i, mission in enumerate(missions):
+        signatures = [(field, index.signature(text)) for field, text in mission_texts(mission)]
+        duplicate = None
+        for field, sig in signatures:
+            duplicate = index.find_duplicate(signature=sig)
+            if duplicate:
+                break
+        if duplicate:
+            original = missions[int(duplicate[0].split(':')[1])]
+            dropped.append((mission, original.get('id'), duplicate[1]))
+            continue
+        kept.append(mission)
+        for field, sig in signatures:
+            index.add(f'corpus:{i}:{field}', signature=sig)
+    return kept, dropped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find near-duplicate missions in a content file')
+    parser.add_argument('path', nargs='?', default='fallback_content.json')
+    parser.add_argument('--threshold', type=float, default=0.6,
+                        help='estimated Jaccard similarity treated as duplicate (default 0.6)')
+    parser.add_argument('--write', metavar='OUT', help='write the deduplicated content to OUT')
+    args = parser.parse_args(argv)
+
+    with open(args.path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    missions = data.get('missions', [])
+    kept, dropped = dedupe_missions(missions, threshold=args.threshold)
+
+    for mission, duplicate_of, score in dropped:
+        print(f"{mission.get('id')}  ~ {duplicate_of}  ({score:.2f})  {mission.get('topic', '')}")
+    print(f"{len(missions)} missions, {len(dropped)} near-duplicates, {len(kept)} kept")
+
+    if args.write:
+        data['missions'] = kept
+        with open(args.write, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {args.write}")
+    return 1 if dropped and not args.write else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the MinHash near-duplicate index (dedup_index.py)
+"""
+
+from dedup_index import DedupIndex, dedupe_missions, shingles
+
+ABLAI = ('Абылай хан (1711-1781) — Қазақ хандығының ұлы ханы, дипломат және қолбасшы. '
+         'Ол үш жүзді біріктіріп, жоңғар шапқыншылығына қарсы күресті. 1771 жылы ол '
+         'Түркістанда ресми түрде хан болып жарияланды.')
+ABAI = ('Абай Құнанбайұлы (1845-1904) — ұлы қазақ ақыны, композитор және философ. '
+        'Ол қазақ жазба әдебиетінің негізін қалады және орыс әдебиетін аударды.')
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert shingles('Абай, ақын!') == shingles('абай ақын')
+    assert shingles('') == set()
+
+
+def test_near_duplicate_found_and_distinct_text_not():
+    index = DedupIndex(threshold=0.6)
+    index.add('ablai', ABLAI)
+    index.add('abai', ABAI)
+    reworded = ABLAI.replace('ұлы ханы', 'ең ұлы ханы')
+    match = index.find_duplicate(reworded)
+    assert match is not None and match[0] == 'ablai'
+    assert index.find_duplicate('Ұлы Жібек жолы Қытайды Еуропамен байланыстырған көне сауда жолы.') is None
+
+
+def test_remove_drops_document_from_buckets():
+    index = DedupIndex()
+    index.add('ablai', ABLAI)
+    index.remove('ablai')
+    assert len(index) == 0
+    assert index.find_duplicate(ABLAI) is None
+
+
+def test_dedupe_keeps_first_of_each_group():
+    missions = [{'id': 'a', 'text_kz': ABLAI}, {'id': 'b', 'text_kz': ABAI},
+                {'id': 'a2', 'text_kz': ABLAI + ' Қосымша сөйлем.'}]
+    kept, dropped = dedupe_missions(missions)
+    assert [m['id'] for m in kept] == ['a', 'b']
+    assert dropped[0][0]['id'] == 'a2' and dropped[0][1] == 'a'
+
+
+def test_recent_ring_drops_oldest_and_keeps_permanent_entries():
+    evicted = []
+    index = DedupIndex(max_recent=2, on_evict=evicted.append)
+    index.add('curated', ABAI)
+    first = index.add_recent(ABLAI, prefix='generated')
+    index.add_recent('Ұлы Жібек жолы Қытайды Еуропамен байланыстырған көне сауда жолы.', prefix='generated')
+    assert first == 'generated:1' and index.find_duplicate(ABLAI)[0] == first
+    index.add_recent('Наурыз — көктем мерекесі, ол жыл сайын наурыз айында тойланады.', prefix='generated')
+    assert len(index) == 3 and first not in index and evicted == [first]
+    assert index.find_duplicate(ABLAI) is None
+    assert index.find_duplicate(ABAI)[0] == 'curated'
+
+
+def test_generated_repeat_is_rerolled_and_counted_as_retry(monkeypatch):
+    import server
+    from llm_metrics import llm_metrics
+    monkeypatch.setattr(server, '_generated_dedup_indexes', {})
+    outputs = iter([{'text_kz': ABLAI, 'topic': 'Абылай хан'}, {'text_kz': ABAI, 'topic': 'Абай'},
+                    {'text_kz': ABLAI, 'topic': 'Абылай хан'}, {'text_kz': ABLAI, 'topic': 'Абылай хан'}])
+    prompts = []
+
+    def generate(profile, call):
+        prompts.append(list(profile.get('completedMissions') or []))
+        return True, next(outputs), None
+
+    monkeypatch.setattr(server, '_openai_generate_personal_mission', generate)
+    monkeypatch.setattr(server, '_mission_dedup_index', DedupIndex())
+    server.get_mission_dedup_index().add('curated', ABLAI)
+    llm_metrics.reset()
+
+    assert server._generate_unique_personal_mission({'level': 1}) == (True, {'text_kz': ABAI, 'topic': 'Абай'}, None)
+    assert prompts == [[], ['Абылай хан']]
+    success, _, error = server._generate_unique_personal_mission({'level': 1})
+    assert not success and 'curated' in error
+    stats = llm_metrics.snapshot()['generate_personalized_mission']['gpt-4o-mini']
+    assert stats['calls'] == 2 and stats['retries'] == 2 and stats['fallbacks'] == {'duplicate': 1}
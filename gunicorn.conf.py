@@ -0,0 +1,58 @@
+"""
+Gunicorn settings for BATYR BOL (render.yaml: `gunicorn server:app -c gunicorn.conf.py`).
+
+Workers are threaded (gthread). A request waiting on OpenAI holds one thread,
+not a whole process, so logins and static files keep being served while
+generations are in flight. server.py caps AI-bound requests per process at
+AI_MAX_CONCURRENCY (default 8), which leaves the remaining threads for
+everything else.
+
+One worker by default: login sessions are kept in the server process
+(server.sessions), so with several workers a session would only be valid on
+the worker that created it. Scale with GUNICORN_THREADS; raise
+WEB_CONCURRENCY only after sessions move to shared storage. Store writes from any thread of any worker go
+through server.store_transaction(), which holds the user_store lock across
+load and save.
+
+Workers write metric snapshots to METRICS_DIR so that /metrics, whichever
+worker answers it, reports totals for the whole server. Clan XP totals in the
+user store are reconciled once before the workers start.
+"""
+
+import glob
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+
+# LLM calls are capped by OPENAI_TIMEOUT (30 s) and retried up to 3 times
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+# No preload: server.py starts thread pools at import, which must not cross a fork
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Per-worker metric snapshots (metrics.py); inherited by the workers
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f"batyrbol-metrics-{os.getenv('PORT', '8000')}"))
+
+
+def on_starting(server):
+    # Snapshots of a previous run would be counted as exited workers
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(path)
+    # Clan XP totals are kept by delta; fix any drift before serving the leaderboard
+    from clan_xp import reconcile_file
+    reconcile_file(os.getenv('DATA_FILE', 'unified_users.json'))
+
+
+def worker_exit(server, worker):
+    from metrics import metrics
+    metrics.flush()
@@ -0,0 +1,120 @@
+"""
+Streaming text extraction for official source pages.
+
+The extractor is fed the page incrementally (chunks from a streamed HTTP
+response or a plain string). Boilerplate containers (nav, header, footer,
+aside, forms) and non-text elements (script, style, svg, ...) are skipped, and
+parsing stops as soon as `max_chars` characters of text have been collected,
+so the rest of a multi-megabyte page is never read or parsed. Optionally the
+href of every link is collected as well (used by the source crawler).
+"""
+
+import re
+from html.parser import HTMLParser
+
+DEFAULT_MAX_CHARS = 4000
+CHUNK_CHARS = 16 * 1024
+
+SKIP_TAGS = frozenset({
+    'script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe', 'object',
+    'nav', 'header', 'footer', 'aside', 'form', 'button', 'select', 'menu',
+})
+
+_WS_RE = re.compile(r'\s+')
+
+
+class StreamingTextExtractor(HTMLParser):
+    """
+    HTMLParser that keeps at most `max_chars` characters of visible text.
+
+    feed() returns True once enough text has been collected; callers should
+    stop reading the source at that point.
+    """
+
+    def __init__(self, max_chars=DEFAULT_MAX_CHARS, collect_links=False):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.links = [] if collect_links else None
+        self.done = False
+        self._chunks = []
+        self._pending = []      # text runs between two tags (may span feed() calls)
+        self._length = 0
+        self._skip_depth = 0
+
+    def feed(self, data):
+        if not self.done:
+            super().feed(data)
+        return self.done
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        text = _WS_RE.sub(' ', ''.join(self._pending)).strip()
+        self._pending.clear()
+        if not text or self.done:
+            return
+        self._chunks.append(text)
+        self._length += len(text) + 1
+        if self.max_chars and self._length >= self.max_chars:
+            self.done = True
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag == 'a' and self.links is not None:
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in SKIP_TAGS and self._skip_depth > 0:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth and not self.done:
+            self._pending.append(data)
+
+    def get_text(self):
+        self._flush()
+        text = ' '.join(self._chunks)
+        if self.max_chars and len(text) > self.max_chars:
+            cut = text.rfind(' ', 0, self.max_chars)
+            text = text[:cut if cut > self.max_chars // 2 else self.max_chars]
+        return text
+
+
+def _run(parser, source):
+    if isinstance(source, str):
+        for start in range(0, len(source), CHUNK_CHARS):
+            if parser.feed(source[start:start + CHUNK_CHARS]):
+                break
+    else:
+        for chunk in source:
+            if parser.feed(chunk):
+                break
+    if not parser.done:
+        parser.close()
+    return parser
+
+
+def extract_text(source, max_chars=DEFAULT_MAX_CHARS):
+    """
+    Visible article text of an HTML page.
+
+    Args:
+        source: the HTML as a string, or an iterable of string chunks
+        max_chars: stop once this much text is collected (0 means no limit)
+    """
+    return _run(StreamingTextExtractor(max_chars), source).get_text()
+
+
+def extract_text_and_links(source, max_chars=0):
+    """(visible text, list of raw href values) of an HTML page"""
+    parser = _run(StreamingTextExtractor(max_chars, collect_links=True), source)
+    return parser.get_text(), parser.links
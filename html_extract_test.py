@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for streaming HTML text extraction (html_extract.py)
+"""
+
+from html_extract import StreamingTextExtractor, extract_text, extract_text_and_links
+
+PAGE = (
+    '<html><head><title>Тарих</title><style>p { color: red }</style></head><body>'
+    '<header><nav><a href="/">Басты бет</a><a href="/news">Жаңалықтар</a></nav></header>'
+    '<main><article><h1>Қазақ хандығы</h1>'
+    '<p>Қазақ хандығы 1465 жылы   Керей мен Жәнібек   хандардың тұсында құрылды.</p>'
+    '<script>var tracking = "ignored";</script>'
+    '<p>Хандықтың орталығы Созақ болды &amp; кейін Түркістан.</p></article></main>'
+    '<aside>Ұқсас мақалалар</aside><footer>© 2024 gov.kz</footer></body></html>'
+)
+
+
+def test_boilerplate_is_skipped():
+    text = extract_text(PAGE, max_chars=0)
+    assert 'Қазақ хандығы 1465 жылы Керей мен Жәнібек хандардың тұсында құрылды.' in text
+    assert 'Созақ болды & кейін' in text
+    for noise in ('Басты бет', 'tracking', 'color', 'Ұқсас', '2024'):
+        assert noise not in text
+
+
+def test_stops_once_enough_text_is_collected():
+    consumed = []
+
+    def chunks():
+        for i in range(1000):
+            consumed.append(i)
+            yield f'<p>Абылай хан {i} батырларды жинады.</p>'
+
+    text = extract_text(chunks(), max_chars=200)
+    assert len(text) <= 200
+    assert text.startswith('Абылай хан 0')
+    assert len(consumed) < 20
+
+
+def test_chunk_boundaries_inside_tags():
+    pieces = [PAGE[i:i + 7] for i in range(0, len(PAGE), 7)]
+    assert extract_text(pieces, max_chars=0) == extract_text(PAGE, max_chars=0)
+
+
+def test_feed_reports_done():
+    parser = StreamingTextExtractor(max_chars=10)
+    assert parser.feed('<p>Абай Құнанбайұлы</p>') is True
+    assert parser.feed('<p>ignored</p>') is True
+    assert 'ignored' not in parser.get_text()
+
+
+def test_links_are_collected_even_from_navigation():
+    text, links = extract_text_and_links(PAGE)
+    assert links == ['/', '/news']
+    assert 'Басты бет' not in text
@@ -0,0 +1,245 @@
+"""
+Incremental JSON parsing for LLM output.
+
+StreamingJSONParser consumes a completion chunk by chunk and validates the
+top-level fields of the returned object as they arrive, so a generation that
+provably cannot satisfy the expected schema can be aborted before the rest of
+the completion is paid for. Common defects are repaired on the fly:
+markdown fences and prose around the object are ignored, trailing commas are
+dropped and raw control characters inside strings are accepted.
+"""
+
+import json
+
+# First significant character of a JSON value -> value kind
+_KIND_BY_CHAR = {'{': 'object', '[': 'array', '"': 'string', 't': 'boolean', 'f': 'boolean', 'n': 'null'}
+_KIND_BY_TYPE = {dict: 'object', list: 'array', str: 'string', int: 'number', float: 'number',
+                 bool: 'boolean', type(None): 'null'}
+
+
+class SchemaViolation(ValueError):
+    """Raised as soon as streamed output can no longer satisfy the schema"""
+
+    def __init__(self, field, reason):
+        super().__init__(f'{field}: {reason}')
+        self.field = field
+        self.reason = reason
+
+
+def _kind_of_char(ch):
+    if ch in _KIND_BY_CHAR:
+        return _KIND_BY_CHAR[ch]
+    if ch == '-' or ch.isdigit():
+        return 'number'
+    return None
+
+
+def _expected_kinds(expected):
+    types = expected if isinstance(expected, tuple) else (expected,)
+    return {_KIND_BY_TYPE[t] for t in types}
+
+
+class StreamingJSONParser:
+    """
+    Incremental parser for a single top-level JSON object.
+
+    Args:
+        fields: {name: type or tuple of types} checked when each value starts
+                (by its first character) and again when it is complete
+        required: field names that must be present when the object closes
+                  (defaults to all keys of `fields`)
+        check_field: optional callable(name, value, parsed_so_far) returning
+                     an error message (str) or None, run on every completed field
+    """
+
+    def __init__(self, fields=None, required=None, check_field=None):
+        self.fields = fields or {}
+        self.required = tuple(self.fields if required is None else required)
+        self.check_field = check_field
+        self._kinds = {name: _expected_kinds(t) for name, t in self.fields.items()}
+
+        self._out = []            # repaired text of the object
+        self._started = False
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # Top-level member tracking: 'key' -> 'colon' -> 'value' -> 'after'
+        self._member_state = 'key'
+        self._key_start = None
+        self._current_key = None
+        self._value_start = None
+        self.parsed = {}
+
+    def feed(self, chunk):
+        """Consume a chunk of text. Raises SchemaViolation on early rejection."""
+        for ch in chunk:
+            if self.done:
+                return
+            if not self._started:
+                if ch == '{':
+                    self._started = True
+                    self._depth = 1
+                    self._out.append(ch)
+                continue
+            self._consume(ch)
+
+    def _consume(self, ch):
+        out = self._out
+        if self._in_string:
+            out.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == '\\':
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 1 and self._member_state == 'key' and self._key_start is not None:
+                    self._current_key = json.loads(''.join(out[self._key_start:]), strict=False)
+                    self._key_start = None
+                    self._member_state = 'colon'
+            return
+
+        if ch in ' \t\r\n':
+            out.append(ch)
+            return
+
+        if self._depth == 1 and self._member_state == 'value' and self._value_start is None:
+            self._start_value(ch)
+
+        if ch == '"':
+            self._in_string = True
+            if self._depth == 1 and self._member_state == 'key':
+                self._key_start = len(out)
+            out.append(ch)
+        elif ch in '{[':
+            self._depth += 1
+            out.append(ch)
+        elif ch in '}]':
+            self._drop_trailing_comma()
+            if self._depth == 1 and ch == '}':
+                self._finish_value()
+                out.append(ch)
+                self._depth = 0
+                self._finish_object()
+                return
+            self._depth -= 1
+            out.append(ch)
+        elif ch == ':' and self._depth == 1 and self._member_state == 'colon':
+            self._member_state = 'value'
+            self._value_start = None
+            out.append(ch)
+        elif ch == ',' and self._depth == 1:
+            self._finish_value()
+            self._member_state = 'key'
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    def _start_value(self, ch):
+        self._value_start = len(self._out)
+        name = self._current_key
+        kind = _kind_of_char(ch)
+        expected = self._kinds.get(name)
+        if expected is not None and kind not in expected:
+            raise SchemaViolation(name, f'expected {"/".join(sorted(expected))}, got {kind or repr(ch)}')
+
+    def _finish_value(self):
+        if self._member_state != 'value' or self._value_start is None:
+            return
+        name = self._current_key
+        raw = ''.join(self._out[self._value_start:]).strip()
+        try:
+            value = json.loads(raw, strict=False)
+        except json.JSONDecodeError as e:
+            raise SchemaViolation(name, f'malformed value ({e.msg})')
+        expected = self.fields.get(name)
+        if expected is not None:
+            types = expected if isinstance(expected, tuple) else (expected,)
+            if isinstance(value, bool) and bool not in types:
+                raise SchemaViolation(name, 'unexpected boolean')
+            if not isinstance(value, types):
+                raise SchemaViolation(name, f'unexpected type {type(value).__name__}')
+        self.parsed[name] = value
+        if self.check_field is not None:
+            error = self.check_field(name, value, self.parsed)
+            if error:
+                raise SchemaViolation(name, error)
+        self._member_state = 'after'
+        self._value_start = None
+
+    def _drop_trailing_comma(self):
+        out = self._out
+        i = len(out) - 1
+        while i >= 0 and out[i] in ' \t\r\n':
+            i -= 1
+        if i >= 0 and out[i] == ',':
+            del out[i]
+
+    def _finish_object(self):
+        self.done = True
+        for name in self.required:
+            if name not in self.parsed:
+                raise SchemaViolation(name, 'missing required field')
+
+    @property
+    def text(self):
+        """Repaired JSON text consumed so far"""
+        return ''.join(self._out)
+
+    def close(self):
+        """Signal end of stream and return the parsed object"""
+        if not self._started:
+            raise json.JSONDecodeError('No JSON object found', '', 0)
+        if not self.done:
+            text = self.text
+            raise json.JSONDecodeError('Truncated JSON object', text, len(text))
+        return json.loads(self.text, strict=False)
+
+
+def parse_json_text(text, fields=None, required=None, check_field=None):
+    """Parse a complete (possibly fenced or chatty) model response"""
+    parser = StreamingJSONParser(fields=fields, required=required, check_field=check_field)
+    parser.feed(text or '')
+    return parser.close()
+
+
+def stream_json_completion(client, parser, call=None, **create_kwargs):
+    """
+    Stream a chat completion into `parser` and return the parsed object.
+
+    Once the object is complete the rest of the stream is drained without
+    parsing, so the final `include_usage` chunk is still read and `call` gets
+    the provider's token counts. The HTTP stream is closed early only when the
+    parser raises SchemaViolation, so a rejected response stops generating.
+    `call` is an optional llm_metrics.LLMCall that receives token usage.
+    """
+    stream = client.chat.completions.create(
+        stream=True,
+        stream_options={'include_usage': True},
+        **create_kwargs
+    )
+    content_chunks = 0
+    usage_seen = False
+    try:
+        for chunk in stream:
+            if getattr(chunk, 'usage', None) is not None:
+                usage_seen = True
+                if call is not None:
+                    call.record_usage(chunk)
+                break       # the usage chunk is the last one
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                content_chunks += 1
+                if not parser.done:
+                    parser.feed(delta)
+    finally:
+        # Aborted streams never report usage; one content delta is ~one token
+        if call is not None and not usage_seen:
+            call.record_usage({'completion_tokens': content_chunks})
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+    return parser.close()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the incremental LLM JSON parser (llm_json.py)
+"""
+
+import json
+
+from llm_json import StreamingJSONParser, SchemaViolation, parse_json_text, stream_json_completion
+
+SCENARIO_FIELDS = {
+    'scenario': (int, str),
+    'text': str,
+    'options': list,
+    'correctAnswer': str,
+    'wrongConsequence': str,
+    'correctConsequence': str,
+}
+
+MISSION_FIELDS = {
+    'text_kz': str,
+    'questions_kz': list,
+    'options_kz': list,
+    'correct_answers': list,
+}
+
+SCENARIO = {
+    'scenario': 1,
+    'text': 'Жоңғар сарбаздары {шекараға} жақындады, "не істеу керек"?',
+    'options': [{'id': 'A', 'text': 'Шабуыл', 'isCorrect': False},
+                {'id': 'B', 'text': 'Бірігу', 'isCorrect': True}],
+    'correctAnswer': 'B',
+    'wrongConsequence': 'Жеңіліс',
+    'correctConsequence': 'Жеңіс',
+}
+
+
+def _feed_in_chunks(parser, text, size=7):
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser.close()
+
+
+def test_chunked_stream_matches_json_loads():
+    text = json.dumps(SCENARIO, ensure_ascii=False, indent=2)
+    parser = StreamingJSONParser(fields=SCENARIO_FIELDS)
+    assert _feed_in_chunks(parser, text) == SCENARIO
+
+
+def test_repairs_fences_prose_and_trailing_commas():
+    text = ('Міне жауап:\n```json\n{"text_kz": "Мәтін",\n "questions_kz": ["a", "b",],\n'
+            ' "options_kz": [["1", "2"], ["3", "4"],],\n "correct_answers": [0, 1],\n}\n```\nСәттілік!')
+    content = parse_json_text(text, fields=MISSION_FIELDS)
+    assert content['questions_kz'] == ['a', 'b']
+    assert content['correct_answers'] == [0, 1]
+
+
+def test_wrong_type_is_rejected_at_first_character():
+    parser = StreamingJSONParser(fields=SCENARIO_FIELDS)
+    parser.feed('{"scenario": 1, "text": "Мәтін", "options": ')
+    try:
+        parser.feed('"A) Шабуыл B) Бірігу ...')
+    except SchemaViolation as e:
+        assert e.field == 'options'
+    else:
+        raise AssertionError('options given as a string must be rejected')
+
+
+def test_missing_required_field_rejected_when_object_closes():
+    try:
+        parse_json_text('{"text": "Мәтін", "options": []}', fields=SCENARIO_FIELDS)
+    except SchemaViolation as e:
+        assert e.field in SCENARIO_FIELDS
+    else:
+        raise AssertionError('missing fields must be rejected')
+
+
+def test_check_field_sees_fields_parsed_so_far():
+    def check(name, value, parsed):
+        if name == 'options_kz' and len(value) != len(parsed.get('questions_kz', [])):
+            return 'options_kz must match questions_kz'
+        return None
+
+    parser = StreamingJSONParser(fields=MISSION_FIELDS, check_field=check)
+    try:
+        parser.feed('{"text_kz": "x", "questions_kz": ["a", "b"], "options_kz": [["1"]], ')
+    except SchemaViolation as e:
+        assert e.field == 'options_kz'
+    else:
+        raise AssertionError('cross-field check should fail before the object ends')
+
+
+class _Delta:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content):
+        self.delta = _Delta(content)
+
+
+class _Chunk:
+    def __init__(self, content):
+        self.choices = [_Choice(content)]
+        self.usage = None
+
+
+class _UsageChunk:
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.choices = []
+        self.usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+
+
+class _Stream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.consumed += 1
+            yield piece if isinstance(piece, _UsageChunk) else _Chunk(piece)
+
+    def close(self):
+        self.closed = True
+
+
+class _Client:
+    def __init__(self, stream):
+        self.chat = self
+        self.completions = self
+        self.stream = stream
+
+    def create(self, **kwargs):
+        assert kwargs['stream'] is True
+        return self.stream
+
+
+def test_stream_is_closed_on_early_rejection():
+    pieces = ['{"scenario": 1, ', '"text": "x", ', '"options": 42', ', "correctAnswer": "B"'] + ['...'] * 100
+    stream = _Stream(pieces)
+    try:
+        stream_json_completion(_Client(stream), StreamingJSONParser(fields=SCENARIO_FIELDS), model='stub')
+    except SchemaViolation:
+        pass
+    else:
+        raise AssertionError('expected SchemaViolation')
+    assert stream.closed
+    assert stream.consumed < 10
+
+
+def test_usage_chunk_after_complete_object_is_recorded():
+    from llm_metrics import LLMMetrics
+    pieces = ['{"scenario": 1, "text": "x", "options": ["a", "b"], ', '"correctAnswer": "a", ',
+              '"wrongConsequence": "w", "correctConsequence": "c"}', '\n', _UsageChunk(120, 35)]
+    stream = _Stream(pieces)
+    metrics = LLMMetrics()
+    with metrics.track('test', 'stub') as call:
+        result = stream_json_completion(_Client(stream), StreamingJSONParser(fields=SCENARIO_FIELDS), call=call,
+                                        model='stub')
+        assert (call.prompt_tokens, call.completion_tokens) == (120, 35)
+    assert result['correctAnswer'] == 'a'
+    assert stream.consumed == len(pieces)
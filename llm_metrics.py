@@ -0,0 +1,250 @@
+"""
+LLM usage instrumentation for BATYR BOL.
+
+Records per endpoint and model: prompt/completion tokens, wall time, retries,
+fallback reasons and cache hits. Aggregates are kept in memory (counters and
+histograms) and every call is appended to a rolling JSONL log.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Histogram bucket upper bounds (seconds / tokens)
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0)
+TOKEN_BUCKETS = (100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000)
+
+# USD per 1M tokens: (prompt, completion). Used for spend estimates only.
+MODEL_PRICES_PER_1M = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'llama-3.1-8b-instant': (0.05, 0.08),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative on export, Prometheus style)"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        cumulative = {}
+        running = 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            cumulative[str(bound)] = running
+        cumulative['+Inf'] = self.count
+        return {'buckets': cumulative, 'sum': round(self.sum, 6), 'count': self.count}
+
+
+class LLMCall:
+    """Mutable record for a single instrumented LLM request"""
+
+    def __init__(self, endpoint, model):
+        self.endpoint = endpoint
+        self.model = model
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.repairs = []
+        self.fallback_reason = None
+        self.cache_hit = False
+        self.model_called = True
+        self.error = None
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def record_usage(self, response):
+        """Accumulate token usage from an OpenAI-style response (or usage object)"""
+        usage = getattr(response, 'usage', response)
+        if usage is None:
+            return
+        if isinstance(usage, dict):
+            prompt = usage.get('prompt_tokens')
+            completion = usage.get('completion_tokens')
+        else:
+            prompt = getattr(usage, 'prompt_tokens', None)
+            completion = getattr(usage, 'completion_tokens', None)
+        self.prompt_tokens += int(prompt or 0)
+        self.completion_tokens += int(completion or 0)
+
+    def retry(self):
+        self.retries += 1
+
+    def repaired(self, notes):
+        """Record deterministic repairs applied to the model output"""
+        self.repairs.extend(notes)
+
+    def fallback(self, reason):
+        self.fallback_reason = reason
+
+    def skipped(self, reason):
+        """Fallback chosen before any model request: counted, but kept out of the latency histogram"""
+        self.fallback_reason = reason
+        self.model_called = False
+
+    def hit(self):
+        self.cache_hit = True
+
+    def to_log_entry(self):
+        return {
+            'ts': datetime.now().isoformat(),
+            'endpoint': self.endpoint,
+            'model': self.model,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'duration_ms': round(self.duration * 1000, 1),
+            'retries': self.retries,
+            'repairs': self.repairs,
+            'fallback_reason': self.fallback_reason,
+            'cache_hit': self.cache_hit,
+            'error': self.error,
+        }
+
+
+class _Series:
+    """Aggregates for one (endpoint, model) pair"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.repairs = 0
+        self.cache_hits = 0
+        self.fallbacks = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.completion_hist = Histogram(TOKEN_BUCKETS)
+
+
+class LLMMetrics:
+    """Thread-safe LLM usage registry with a size-capped JSONL log"""
+
+    def __init__(self, log_path=None, max_log_bytes=5 * 1024 * 1024, backups=3):
+        self.log_path = log_path
+        self.max_log_bytes = max_log_bytes
+        self.backups = backups
+        self._series = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    @contextmanager
+    def track(self, endpoint, model):
+        """
+        Instrument one endpoint request. Usage:
+
+            with llm_metrics.track('generate_scenario', 'gpt-4o-mini') as call:
+                response = client.chat.completions.create(...)
+                call.record_usage(response)
+        """
+        call = LLMCall(endpoint, model)
+        try:
+            yield call
+        except Exception as e:
+            call.error = type(e).__name__
+            raise
+        finally:
+            call.duration = time.perf_counter() - call.started
+            self._record(call)
+
+    def record_cache_hit(self, endpoint, model):
+        """Record a request served from cache without calling the model"""
+        call = LLMCall(endpoint, model)
+        call.hit()
+        self._record(call)
+
+    def _record(self, call):
+        with self._lock:
+            series = self._series.setdefault((call.endpoint, call.model), _Series())
+            series.calls += 1
+            if call.error:
+                series.errors += 1
+            if call.cache_hit:
+                series.cache_hits += 1
+            elif call.model_called:
+                series.latency.observe(call.duration)
+                series.completion_hist.observe(call.completion_tokens)
+            series.prompt_tokens += call.prompt_tokens
+            series.completion_tokens += call.completion_tokens
+            series.retries += call.retries
+            series.repairs += len(call.repairs)
+            if call.fallback_reason:
+                series.fallbacks[call.fallback_reason] = series.fallbacks.get(call.fallback_reason, 0) + 1
+        self._write_log(call.to_log_entry())
+
+    def _write_log(self, entry):
+        if not self.log_path:
+            return
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        try:
+            with self._log_lock:
+                self._rotate_if_needed(len(line.encode('utf-8')))
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"[LLM_METRICS] Failed to write usage log: {e}")
+
+    def _rotate_if_needed(self, incoming):
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            return
+        if size + incoming <= self.max_log_bytes:
+            return
+        for i in range(self.backups - 1, 0, -1):
+            src = f'{self.log_path}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.log_path}.{i + 1}')
+        if self.backups > 0:
+            os.replace(self.log_path, f'{self.log_path}.1')
+        else:
+            os.remove(self.log_path)
+
+    def snapshot(self):
+        """Return aggregates grouped by endpoint, then model"""
+        result = {}
+        with self._lock:
+            for (endpoint, model), s in self._series.items():
+                prompt_price, completion_price = MODEL_PRICES_PER_1M.get(model, (0.0, 0.0))
+                cost = (s.prompt_tokens * prompt_price + s.completion_tokens * completion_price) / 1_000_000
+                result.setdefault(endpoint, {})[model] = {
+                    'calls': s.calls,
+                    'errors': s.errors,
+                    'cache_hits': s.cache_hits,
+                    'retries': s.retries,
+                    'repairs': s.repairs,
+                    'prompt_tokens': s.prompt_tokens,
+                    'completion_tokens': s.completion_tokens,
+                    'estimated_cost_usd': round(cost, 6),
+                    'fallbacks': dict(s.fallbacks),
+                    'latency_seconds': s.latency.snapshot(),
+                    'completion_tokens_histogram': s.completion_hist.snapshot(),
+                }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+llm_metrics = LLMMetrics(
+    log_path=os.getenv('LLM_USAGE_LOG', 'llm_usage.jsonl') or None,
+    max_log_bytes=int(os.getenv('LLM_USAGE_LOG_MAX_BYTES', str(5 * 1024 * 1024))),
+)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the LLM usage instrumentation (llm_metrics.py)
+"""
+
+import json
+import os
+import tempfile
+
+from llm_metrics import LLMMetrics
+
+
+class _Usage:
+    prompt_tokens = 120
+    completion_tokens = 480
+
+
+class _Response:
+    usage = _Usage()
+
+
+def test_track_records_tokens_latency_and_log():
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'usage.jsonl')
+        metrics = LLMMetrics(log_path=log_path)
+
+        with metrics.track('generate_scenario', 'gpt-4o-mini') as call:
+            call.record_usage(_Response())
+            call.retry()
+            call.fallback('invalid_json')
+
+        series = metrics.snapshot()['generate_scenario']['gpt-4o-mini']
+        assert series['calls'] == 1
+        assert series['prompt_tokens'] == 120
+        assert series['completion_tokens'] == 480
+        assert series['retries'] == 1
+        assert series['fallbacks'] == {'invalid_json': 1}
+        assert series['latency_seconds']['count'] == 1
+        assert series['estimated_cost_usd'] > 0
+
+        with open(log_path, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        assert entries[0]['endpoint'] == 'generate_scenario'
+        assert entries[0]['fallback_reason'] == 'invalid_json'
+
+
+def test_errors_and_cache_hits_are_counted():
+    metrics = LLMMetrics(log_path=None)
+    try:
+        with metrics.track('generate_mission', 'gpt-4o-mini'):
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    metrics.record_cache_hit('generate_mission', 'gpt-4o-mini')
+
+    series = metrics.snapshot()['generate_mission']['gpt-4o-mini']
+    assert series['calls'] == 2
+    assert series['errors'] == 1
+    assert series['cache_hits'] == 1
+    # Cache hits do not pollute the latency histogram
+    assert series['latency_seconds']['count'] == 1
+
+
+def test_skipped_calls_count_as_fallbacks_without_latency():
+    metrics = LLMMetrics(log_path=None)
+    with metrics.track('generate_scenario', 'gpt-4o-mini') as call:
+        call.skipped('missing_api_key')
+
+    series = metrics.snapshot()['generate_scenario']['gpt-4o-mini']
+    assert series['calls'] == 1
+    assert series['fallbacks'] == {'missing_api_key': 1}
+    assert series['latency_seconds']['count'] == 0
+
+
+def test_log_rotation_respects_size_cap():
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'usage.jsonl')
+        metrics = LLMMetrics(log_path=log_path, max_log_bytes=600, backups=2)
+        for _ in range(20):
+            with metrics.track('generate_content_openai', 'gpt-4o-mini'):
+                pass
+        assert os.path.getsize(log_path) <= 600
+        assert os.path.exists(log_path + '.1')
+        assert not os.path.exists(log_path + '.3')
@@ -0,0 +1,314 @@
+"""
+Request and store metrics in Prometheus text format (GET /metrics).
+
+Each process keeps counters, gauges and fixed-bucket histograms in memory.
+With METRICS_DIR set (gunicorn.conf.py sets it), every worker also writes a
+snapshot to METRICS_DIR/<pid>.json every `flush_interval` seconds, and
+/metrics merges all of them:
+- counters and histograms are summed over every file, including those of
+  workers that have exited, so totals never go backwards;
+- gauges (requests in flight) are summed over live workers only.
+Snapshots of exited workers are folded into one _exited.json, so the
+directory holds one file per live worker plus that one, however often
+gunicorn replaces workers.
+The worker answering the scrape uses its live values; the others are at most
+`flush_interval` seconds old.
+
+instrument_app() adds per-route latency histograms, status counters and an
+in-flight gauge to a Flask app. Routes are labelled by their URL rule
+(`/api/clans/members`), never by the raw path, to bound label cardinality.
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+import user_store
+from llm_metrics import Histogram
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STORE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+EXITED_SNAPSHOT = '_exited.json'
+
+
+def _labels(kwargs):
+    return tuple(sorted((k, str(v)) for k, v in kwargs.items()))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots):
+    """Sum snapshots: ({(name, labels): value} for counters and gauges, {...: [counts, sum]} for histograms)"""
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get('counters', []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in snapshot.get('gauges', []):
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+        for name, labels, counts, total in snapshot.get('histograms', []):
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+            if len(merged[0]) == len(counts):
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+    return counters, gauges, histograms
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True     # exists, owned by someone else
+    return True
+
+
+class MetricsRegistry:
+    """
+    Args:
+        namespace: prefix of every metric name
+        shared_dir: directory for per-worker snapshots (None: this process only)
+        flush_interval: seconds between snapshot writes
+    """
+
+    def __init__(self, namespace='batyrbol', shared_dir=None, flush_interval=5.0):
+        self.namespace = namespace
+        self.shared_dir = shared_dir
+        self.flush_interval = flush_interval
+        self._meta = {}          # name -> (type, help, buckets)
+        self._counters = {}      # (name, labels) -> value
+        self._gauges = {}
+        self._histograms = {}    # (name, labels) -> Histogram
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    # ===== DECLARATION / RECORDING =====
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text, None)
+
+    def gauge(self, name, help_text):
+        self._meta[name] = ('gauge', help_text, None)
+
+    def histogram(self, name, help_text, buckets):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._start_flusher()
+
+    def add(self, name, value, **labels):
+        """Move a gauge up or down"""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+        self._start_flusher()
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._meta[name][2])
+            histogram.observe(value)
+        self._start_flusher()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    # ===== SNAPSHOTS =====
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [[n, l, v] for (n, l), v in self._counters.items()],
+                'gauges': [[n, l, v] for (n, l), v in self._gauges.items()],
+                'histograms': [[n, l, list(h.counts), h.sum] for (n, l), h in self._histograms.items()],
+            }
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.shared_dir, f'{pid}.json')
+
+    def flush(self):
+        if not self.shared_dir:
+            return
+        path = self._snapshot_path(os.getpid())
+        try:
+            os.makedirs(self.shared_dir, exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"[METRICS] Could not write {path}: {e}")
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _start_flusher(self):
+        if self.shared_dir and self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                    self._flusher.start()
+                    atexit.register(self.flush)
+
+    def collect(self):
+        """Snapshots of this process (live) and of every other worker that wrote one"""
+        snapshots = [self.snapshot()]
+        if not self.shared_dir:
+            return snapshots
+        own = self._snapshot_path(os.getpid())
+        exited = os.path.join(self.shared_dir, EXITED_SNAPSHOT)
+        dead = []
+        for path in glob.glob(os.path.join(self.shared_dir, '*.json')):
+            if path == own:
+                continue
+            snapshot = _read_snapshot(path)
+            if snapshot is None:
+                continue
+            if path != exited and not _pid_alive(snapshot.get('pid', 0)):
+                snapshot['gauges'] = []
+                dead.append(path)
+            snapshots.append(snapshot)
+        if dead:
+            self._fold_exited(dead)
+        return snapshots
+
+    def _fold_exited(self, paths):
+        """Add the snapshots of exited workers to _exited.json and delete them"""
+        exited = os.path.join(self.shared_dir, EXITED_SNAPSHOT)
+        with user_store.locked(exited):
+            aggregate = _read_snapshot(exited) or {}
+            # Names merged by an earlier fold that could not delete them (still on disk)
+            folded = {name for name in aggregate.get('folded', [])
+                      if os.path.exists(os.path.join(self.shared_dir, name))}
+            merging = [aggregate] if aggregate else []
+            for path in paths:
+                name = os.path.basename(path)
+                snapshot = _read_snapshot(path)
+                if name in folded or snapshot is None or _pid_alive(snapshot.get('pid', 0)):
+                    continue
+                merging.append(snapshot)
+                folded.add(name)
+            counters, _, histograms = _merge(merging)
+            user_store.write_json(exited, {
+                'pid': 0, 'gauges': [], 'folded': sorted(folded),
+                'counters': [[n, [list(p) for p in l], v] for (n, l), v in counters.items()],
+                'histograms': [[n, [list(p) for p in l], counts, total] for (n, l), (counts, total) in histograms.items()],
+            })
+            for name in folded:
+                try:
+                    os.remove(os.path.join(self.shared_dir, name))
+                except OSError:
+                    pass
+
+    # ===== EXPOSITION =====
+
+    def render(self):
+        """All workers' metrics merged, in Prometheus text format 0.0.4"""
+        counters, gauges, histograms = _merge(self.collect())
+
+        lines = []
+        for name, (kind, help_text, buckets) in sorted(self._meta.items()):
+            full = f'{self.namespace}_{name}'
+            lines.append(f'# HELP {full} {help_text}')
+            lines.append(f'# TYPE {full} {kind}')
+            if kind == 'histogram':
+                for (metric, labels), (counts, total) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    running = 0
+                    for bound, n in zip(buckets + ('+Inf',), counts):
+                        running += n
+                        le = bound if bound == '+Inf' else _format_value(bound)
+                        lines.append(f'{full}_bucket{_format_labels(labels, [("le", str(le))])} {running}')
+                    lines.append(f'{full}_sum{_format_labels(labels)} {_format_value(round(total, 6))}')
+                    lines.append(f'{full}_count{_format_labels(labels)} {running}')
+            else:
+                values = counters if kind == 'counter' else gauges
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{full}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+def instrument_app(app, registry):
+    """Per-route latency, status counts and requests in flight for a Flask app"""
+    registry.histogram('http_request_duration_seconds', 'Request latency by route', HTTP_BUCKETS)
+    registry.counter('http_requests_total', 'Requests by route and status code')
+    registry.gauge('http_requests_in_flight', 'Requests being handled')
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        registry.add('http_requests_in_flight', 1)
+
+    @app.after_request
+    def _record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _record_request(exc):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        registry.add('http_requests_in_flight', -1)
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        status = g.pop('_metrics_status', 500)
+        registry.observe('http_request_duration_seconds', time.perf_counter() - started,
+                         method=request.method, route=route)
+        registry.inc('http_requests_total', method=request.method, route=route, status=status)
+
+
+metrics = MetricsRegistry(
+    shared_dir=os.getenv('METRICS_DIR') or None,
+    flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', '5')),
+)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for request/store metrics and the Prometheus exposition (metrics.py)
+"""
+
+import json
+import os
+import tempfile
+
+from flask import Flask
+
+from metrics import MetricsRegistry, instrument_app
+
+
+def _registry(shared_dir=None):
+    registry = MetricsRegistry(shared_dir=shared_dir, flush_interval=3600)
+    registry.counter('jobs_total', 'Jobs')
+    registry.gauge('busy', 'Busy workers')
+    registry.histogram('job_seconds', 'Job time', (0.1, 1.0))
+    return registry
+
+
+def test_render_prometheus_text():
+    registry = _registry()
+    registry.inc('jobs_total', kind='a"b')
+    registry.add('busy', 2)
+    registry.observe('job_seconds', 0.05, kind='x')
+    registry.observe('job_seconds', 5, kind='x')
+    text = registry.render()
+    assert '# TYPE batyrbol_jobs_total counter' in text
+    assert 'batyrbol_jobs_total{kind="a\\"b"} 1' in text
+    assert 'batyrbol_busy 2' in text
+    assert 'batyrbol_job_seconds_bucket{kind="x",le="0.1"} 1' in text
+    assert 'batyrbol_job_seconds_bucket{kind="x",le="1"} 1' in text
+    assert 'batyrbol_job_seconds_bucket{kind="x",le="+Inf"} 2' in text
+    assert 'batyrbol_job_seconds_count{kind="x"} 2' in text
+
+
+def test_workers_are_merged_and_dead_gauges_dropped():
+    with tempfile.TemporaryDirectory() as shared:
+        registry = _registry(shared)
+        registry.inc('jobs_total', 3)
+        registry.add('busy', 1)
+        registry.observe('job_seconds', 0.5)
+        exited = {'pid': 2 ** 22 + 12345, 'counters': [['jobs_total', [], 4]], 'gauges': [['busy', [], 7]],
+                  'histograms': [['job_seconds', [], [1, 0, 0], 0.01]]}
+        with open(os.path.join(shared, 'exited.json'), 'w') as f:
+            json.dump(exited, f)
+        text = registry.render()
+        assert 'batyrbol_jobs_total 7' in text
+        assert 'batyrbol_busy 1' in text
+        assert 'batyrbol_job_seconds_bucket{le="0.1"} 1' in text
+        assert 'batyrbol_job_seconds_count 2' in text
+
+
+def test_exited_workers_are_folded_into_one_file():
+    with tempfile.TemporaryDirectory() as shared:
+        registry = _registry(shared)
+        registry.inc('jobs_total', 1)
+        for i in range(3):
+            exited = {'pid': 2 ** 22 + 12345 + i, 'counters': [['jobs_total', [], 2]], 'gauges': [['busy', [], 7]],
+                      'histograms': [['job_seconds', [], [1, 0, 0], 0.01]]}
+            with open(os.path.join(shared, f'{exited["pid"]}.json'), 'w') as f:
+                json.dump(exited, f)
+        assert 'batyrbol_jobs_total 7' in registry.render()
+        assert sorted(name for name in os.listdir(shared) if name.endswith('.json')) == ['_exited.json']
+        text = registry.render()
+        assert 'batyrbol_jobs_total 7' in text
+        assert 'batyrbol_job_seconds_count 3' in text
+        assert '\nbatyrbol_busy ' not in text      # gauges of exited workers are dropped
+
+
+def test_routes_are_labelled_by_rule():
+    registry = MetricsRegistry()
+    app = Flask(__name__)
+    instrument_app(app, registry)
+
+    @app.route('/clans/<name>')
+    def clan(name):
+        return name
+
+    client = app.test_client()
+    client.get('/clans/Алаш')
+    client.get('/missing')
+    text = registry.render()
+    assert 'batyrbol_http_requests_total{method="GET",route="/clans/<name>",status="200"} 1' in text
+    assert 'route="<unmatched>",status="404"' in text
+    assert 'batyrbol_http_requests_in_flight 0' in text
+
+
+def test_metrics_endpoint_needs_the_metrics_or_admin_token(monkeypatch):
+    import server
+    client = server.app.test_client()
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    monkeypatch.setattr(server.request_profiler, 'admin_token', None)
+    assert client.get('/metrics').status_code == 401
+    monkeypatch.setenv('METRICS_TOKEN', 'scrape')
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape'}).status_code == 200
+    monkeypatch.setattr(server.request_profiler, 'admin_token', 'admin')
+    assert client.get('/metrics', headers={'X-Admin-Token': 'admin'}).status_code == 200
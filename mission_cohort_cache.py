@@ -0,0 +1,167 @@
+"""
+Cohort cache for personalized missions.
+
+The personalized prompt only depends on the level, a few weak areas and the
+missions already completed, so most students fall into a small number of
+cohorts. Each cohort keeps a pool of generated variants; a request is served
+from the pool (skipping topics the student already completed) and the pool is
+topped up in the background instead of spending a completion per request.
+Background refills share the AI concurrency limiter with the request
+threads: a refill only runs when a slot is free right away, otherwise it is
+skipped and retried on a later hit.
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_metrics import llm_metrics
+
+METRICS_ENDPOINT = 'generate_personalized_mission'
+METRICS_MODEL = 'gpt-4o-mini'
+
+
+def _normalize(value):
+    return ' '.join(str(value).lower().split())
+
+
+def _topic_of(mission):
+    """completedMissions items are topic strings or {'topic': ...} records"""
+    if isinstance(mission, dict):
+        mission = mission.get('topic') or mission.get('title') or ''
+    return _normalize(mission) if mission else ''
+
+
+class MissionCohortCache:
+    """
+    Pool of pre-generated missions per normalized profile.
+
+    Args:
+        generate: callable(profile) -> (success, content, error), normally
+                  server._generate_unique_personal_mission
+        pool_size: variants kept ready per cohort
+        max_serves: times one variant is handed out before it is retired
+        ttl: seconds a variant stays servable
+        completed_bucket: completed-mission counts are bucketed by this size
+        max_weak_areas: weak areas that take part in the key (the prompt uses 3)
+        max_cohorts: cohorts kept in memory (least recently used are dropped)
+        limiter: optional concurrency.ConcurrencyLimiter a refill must get a
+                 slot from (without waiting) before it calls generate
+    """
+
+    def __init__(self, generate, pool_size=4, max_serves=25, ttl=6 * 3600,
+                 completed_bucket=5, max_weak_areas=3, max_cohorts=256, workers=2, limiter=None):
+        self.generate = generate
+        self.limiter = limiter
+        self.pool_size = pool_size
+        self.max_serves = max_serves
+        self.ttl = ttl
+        self.completed_bucket = completed_bucket
+        self.max_weak_areas = max_weak_areas
+        self.max_cohorts = max_cohorts
+        self._cohorts = OrderedDict()   # key -> list of variant dicts
+        self._inflight = set()
+        self._skipped = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mission-refill')
+
+    def cohort_key(self, profile):
+        """(language, level, sorted weak areas, completed bucket)"""
+        weak = sorted({_normalize(w) for w in profile.get('weakAreas') or [] if w})[:self.max_weak_areas]
+        completed = len(profile.get('completedMissions') or [])
+        bucket = min(completed // self.completed_bucket, 4)
+        return (profile.get('language', 'kk'), int(profile.get('level', 1)), tuple(weak), bucket)
+
+    def cohort_profile(self, key):
+        """Representative profile used to generate variants for a cohort"""
+        language, level, weak, _ = key
+        return {'level': level, 'weakAreas': list(weak), 'completedMissions': [], 'language': language}
+
+    def get(self, profile):
+        """
+        Return a cached mission for this profile or None. For known cohorts a
+        background refill is scheduled whenever the pool is below pool_size.
+        """
+        key = self.cohort_key(profile)
+        completed = {_topic_of(m) for m in profile.get('completedMissions') or []}
+        now = time.time()
+        with self._lock:
+            pool = self._cohorts.get(key)
+            chosen = None
+            if pool is not None:
+                self._cohorts.move_to_end(key)
+                pool[:] = [v for v in pool if now - v['created'] < self.ttl and v['serves'] < self.max_serves]
+                eligible = [v for v in pool if v['topic'] not in completed]
+                if eligible:
+                    least = min(v['serves'] for v in eligible)
+                    chosen = random.choice([v for v in eligible if v['serves'] == least])
+                    chosen['serves'] += 1
+        # Unknown cohorts are seeded by the caller's synchronous generation
+        if pool is not None:
+            self._schedule_refill(key)
+        if chosen is None:
+            return None
+        llm_metrics.record_cache_hit(METRICS_ENDPOINT, METRICS_MODEL)
+        return dict(chosen['content'], cohort_cached=True)
+
+    def put(self, profile, content):
+        """Add a freshly generated mission to the profile's cohort pool"""
+        self._add(self.cohort_key(profile), content)
+
+    def _add(self, key, content):
+        variant = {'content': content, 'topic': _topic_of(content), 'created': time.time(), 'serves': 0}
+        with self._lock:
+            pool = self._cohorts.setdefault(key, [])
+            self._cohorts.move_to_end(key)
+            # Same topic twice in one pool is wasted diversity: keep the newer one
+            pool[:] = [v for v in pool if not v['topic'] or v['topic'] != variant['topic']]
+            pool.append(variant)
+            del pool[:-self.pool_size]
+            while len(self._cohorts) > self.max_cohorts:
+                self._cohorts.popitem(last=False)
+
+    def _schedule_refill(self, key):
+        with self._lock:
+            pool = self._cohorts.get(key) or []
+            if len(pool) >= self.pool_size or key in self._inflight:
+                return
+            self._inflight.add(key)
+        self._executor.submit(self._refill, key)
+
+    def _refill(self, key):
+        acquired = False
+        try:
+            # Never queue behind (or crowd out) request threads for an AI slot
+            if self.limiter is not None:
+                acquired = self.limiter.acquire(blocking=False)
+                if not acquired:
+                    with self._lock:
+                        self._skipped += 1
+                    return
+            success, content, error = self.generate(self.cohort_profile(key))
+            if success:
+                self._add(key, content)
+            else:
+                print(f"[MISSION_CACHE] Refill failed for {key}: {error}")
+        except Exception as e:
+            print(f"[MISSION_CACHE] Refill error for {key}: {e}")
+        finally:
+            if acquired:
+                self.limiter.release()
+            with self._lock:
+                self._inflight.discard(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cohorts': len(self._cohorts),
+                'variants': sum(len(p) for p in self._cohorts.values()),
+                'refilling': len(self._inflight),
+                'refills_skipped': self._skipped,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cohorts.clear()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the personalized mission cohort cache (mission_cohort_cache.py)
+"""
+
+import threading
+
+from concurrency import ConcurrencyLimiter
+from mission_cohort_cache import MissionCohortCache
+
+
+class _Generator:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, profile):
+        with self.lock:
+            self.calls += 1
+            n = self.calls
+        return True, {'text_kz': f'Мәтін {n}', 'topic': f'Тақырып {n}'}, None
+
+
+def _wait_for_refills(cache):
+    cache._executor.submit(lambda: None).result()
+    while cache.stats()['refilling']:
+        cache._executor.submit(lambda: None).result()
+
+
+def test_equivalent_profiles_share_a_cohort():
+    cache = MissionCohortCache(_Generator())
+    a = {'level': 2, 'weakAreas': ['Абай', 'хандық'], 'completedMissions': ['x'], 'language': 'kk'}
+    b = {'level': 2, 'weakAreas': ['Хандық ', 'абай'], 'completedMissions': ['y', 'z'], 'language': 'kk'}
+    assert cache.cohort_key(a) == cache.cohort_key(b)
+    assert cache.cohort_key(a) != cache.cohort_key(dict(a, level=3))
+
+
+def test_miss_then_hits_with_background_refill():
+    generate = _Generator()
+    cache = MissionCohortCache(generate, pool_size=3)
+    profile = {'level': 1, 'weakAreas': [], 'completedMissions': []}
+
+    assert cache.get(profile) is None
+    assert generate.calls == 0          # the caller seeds unknown cohorts
+    cache.put(profile, {'text_kz': 'Бастапқы', 'topic': 'Бастапқы'})
+
+    for _ in range(4):
+        assert cache.get(profile)['cohort_cached'] is True
+        _wait_for_refills(cache)
+    assert cache.stats()['variants'] == 3
+    assert generate.calls == 2
+
+
+def test_completed_topics_are_skipped():
+    cache = MissionCohortCache(lambda p: (False, None, 'disabled'), pool_size=2)
+    profile = {'level': 1, 'completedMissions': [{'topic': 'Абай'}]}
+    cache.put(profile, {'text_kz': 'a', 'topic': 'Абай'})
+    assert cache.get(profile) is None
+    cache.put(profile, {'text_kz': 'b', 'topic': 'Қазақ хандығы'})
+    assert cache.get(profile)['topic'] == 'Қазақ хандығы'
+    _wait_for_refills(cache)
+
+
+def test_variants_retire_after_max_serves():
+    cache = MissionCohortCache(lambda p: (False, None, 'disabled'), max_serves=2)
+    profile = {'level': 1}
+    cache.put(profile, {'text_kz': 'a', 'topic': 'a'})
+    assert cache.get(profile) is not None
+    assert cache.get(profile) is not None
+    assert cache.get(profile) is None
+    _wait_for_refills(cache)
+
+
+def test_refill_is_skipped_without_a_free_ai_slot():
+    generate = _Generator()
+    limiter = ConcurrencyLimiter(limit=1, wait=5)
+    cache = MissionCohortCache(generate, pool_size=3, limiter=limiter)
+    profile = {'level': 1}
+    cache.put(profile, {'text_kz': 'a', 'topic': 'a'})
+
+    assert limiter.acquire()            # a request holds the only slot
+    assert cache.get(profile) is not None
+    _wait_for_refills(cache)            # returns at once: the refill did not wait for the slot
+    assert generate.calls == 0 and cache.stats()['refills_skipped'] == 1
+    assert limiter.stats()['rejected'] == 0 and limiter.stats()['skipped'] == 1
+    limiter.release()
+
+    cache.get(profile)
+    _wait_for_refills(cache)
+    assert generate.calls == 1 and cache.stats()['variants'] == 2
+    assert limiter.stats()['in_flight'] == 0
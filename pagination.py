@@ -0,0 +1,75 @@
+"""
+Cursor pagination and field projection for list endpoints.
+
+A page is requested with `?limit=20&after=<cursor>&fields=name,xp`:
+- `after` is the opaque cursor returned as `next` by the previous page. It
+  encodes the sort key of the last row sent, so pages stay stable when rows
+  are inserted before the cursor (unlike offsets);
+- only the `limit` smallest rows past the cursor are selected (a heap, not a
+  full sort), and only the requested `fields` are serialized.
+"""
+
+import base64
+import heapq
+import json
+
+
+class PageError(ValueError):
+    """Invalid limit, cursor or fields parameter (answered with 400)"""
+
+
+def encode_cursor(sort_key):
+    raw = json.dumps(list(sort_key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise PageError('Invalid cursor')
+    if not isinstance(key, list):
+        raise PageError('Invalid cursor')
+    return tuple(key)
+
+
+def parse_fields(value, allowed, default):
+    """Requested fields in `allowed` order; `default` when the parameter is absent"""
+    if not value:
+        return tuple(default)
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise PageError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in allowed if field in requested)
+
+
+def parse_page(args, allowed_fields, default_fields, default_limit=20, max_limit=100):
+    """(limit, after sort key or None, fields) from request args"""
+    try:
+        limit = int(args.get('limit', default_limit))
+    except ValueError:
+        raise PageError('Invalid limit')
+    limit = max(1, min(limit, max_limit))
+    after = args.get('after')
+    return (limit, decode_cursor(after) if after else None,
+            parse_fields(args.get('fields'), allowed_fields, default_fields))
+
+
+def paginate(rows, sort_key, limit, after=None, fields=None):
+    """
+    One page of `rows` ordered by `sort_key(row)` (a tuple), starting after
+    the `after` key. Returns (projected rows, next cursor or None).
+    """
+    if after is not None:
+        rows = (row for row in rows if sort_key(row) > after)
+    try:
+        page = heapq.nsmallest(limit + 1, rows, key=sort_key)
+    except TypeError:   # cursor key of the wrong shape for this list
+        raise PageError('Invalid cursor')
+    next_cursor = encode_cursor(sort_key(page[limit - 1])) if len(page) > limit else None
+    page = page[:limit]
+    if fields is not None:
+        page = [{field: row.get(field) for field in fields} for row in page]
+    return page, next_cursor
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for cursor pagination and field projection (pagination.py)
+"""
+
+import pytest
+
+from pagination import PageError, decode_cursor, encode_cursor, paginate, parse_page
+
+ROWS = [{'name': f'Клан {i:02d}', 'xp': (i * 7) % 5, 'leader': f'l{i}@x'} for i in range(23)]
+
+
+def _key(row):
+    return (-row['xp'], row['name'])
+
+
+def test_pages_cover_every_row_once_in_order():
+    seen, after = [], None
+    while True:
+        page, cursor = paginate(iter(ROWS), _key, 5, after)
+        seen += page
+        if cursor is None:
+            break
+        after = decode_cursor(cursor)
+    assert seen == sorted(ROWS, key=_key)
+
+
+def test_fields_are_projected():
+    page, _ = paginate(ROWS, _key, 2, fields=('name',))
+    assert page == [{'name': 'Клан 02'}, {'name': 'Клан 07'}]
+
+
+def test_parse_page_validates_args():
+    limit, after, fields = parse_page({'limit': '500', 'after': encode_cursor((-4, 'Клан 03')), 'fields': 'xp,name'},
+                                      ('name', 'xp', 'leader'), ('name',))
+    assert (limit, after, fields) == (100, (-4, 'Клан 03'), ('name', 'xp'))
+    for args in ({'limit': 'x'}, {'after': '!!'}, {'fields': 'password'}):
+        with pytest.raises(PageError):
+            parse_page(args, ('name',), ('name',))
+
+
+def test_cursor_of_wrong_shape_is_rejected():
+    with pytest.raises(PageError):
+        paginate(ROWS, _key, 5, after=('Клан 03',))
+
+
+def test_clan_members_hide_emails_without_session(tmp_path, monkeypatch):
+    import server
+    import user_store
+    path = str(tmp_path / 'users.json')
+    monkeypatch.setattr(server, 'data_file', path)
+    users = {f'm{i}@school.kz': {'id': f'id{i}', 'name': f'M{i}', 'xp': 10 * i, 'clan': 'Alpha'} for i in range(3)}
+    user_store.write_json(path, {'web_users': users, 'tg_users': {}, 'tg_links': {},
+                                 'clans': {'Alpha': {'leader': 'm0@school.kz', 'members': list(users), 'xp': 30}}})
+    client = server.app.test_client()
+
+    first = client.get('/api/clans/members?name=Alpha&limit=2').get_json()
+    assert first['members'] == [{'id': 'id2', 'name': 'M2', 'xp': 20}, {'id': 'id1', 'name': 'M1', 'xp': 10}]
+    assert decode_cursor(first['next']) == (-10, 'id1')
+
+    assert client.get('/api/clans/members?name=Alpha&fields=name,email').status_code == 401
+    session_id = server.create_session('m0@school.kz')
+    response = client.get('/api/clans/members?name=Alpha&fields=name,email', headers={'X-Session-Id': session_id})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert [m['email'] for m in response.get_json()['members']] == ['m2@school.kz', 'm1@school.kz', 'm0@school.kz']
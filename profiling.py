@@ -0,0 +1,243 @@
+"""
+On-demand profiling of live requests.
+
+A request is profiled when either:
+- it carries `X-Profile: 1` (or `?_profile=1`) together with the admin token
+  (`X-Admin-Token` or `Authorization: Bearer`, compared with ADMIN_TOKEN), or
+- its route is listed in PROFILE_SAMPLE, e.g.
+  `PROFILE_SAMPLE=/api/clans/leaderboard=100,/api/login=20` profiles about
+  1 in 100 leaderboard requests and 1 in 20 logins.
+
+Each profiled request leaves three files in the output directory:
+- `<id>.pstats`: deterministic cProfile data (`python -m pstats <id>.pstats`,
+  snakeviz);
+- `<id>.folded`: stacks of the request thread sampled every `interval`
+  seconds, in collapsed format (`flamegraph.pl <id>.folded > out.svg`,
+  speedscope);
+- `<id>.json`: route, status, duration and sample count.
+Only the newest `max_profiles` are kept. cProfile hooks only the thread
+that enables it, so concurrent requests are not instrumented. One profile
+runs per process at a time: a request that asks while another is being
+profiled is served normally.
+"""
+
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, jsonify, request, send_from_directory
+
+_SLUG_RE = re.compile(r'[^A-Za-z0-9]+')
+_PROFILE_ID_RE = re.compile(r'^[\w.-]+$')
+EXTENSIONS = ('.pstats', '.folded', '.json')
+
+
+def parse_sample_rates(spec):
+    """'/a=100,/b=20' -> {'/a': 100, '/b': 20} (invalid entries are skipped)"""
+    rates = {}
+    for item in (spec or '').split(','):
+        route, _, every = item.strip().rpartition('=')
+        try:
+            if route and int(every) > 0:
+                rates[route] = int(every)
+        except ValueError:
+            print(f"[PROFILE] Ignoring PROFILE_SAMPLE entry {item!r}")
+    return rates
+
+
+def is_admin(req, token):
+    if not token:
+        return False
+    supplied = req.headers.get('X-Admin-Token', '')
+    auth = req.headers.get('Authorization', '')
+    if not supplied and auth.startswith('Bearer '):
+        supplied = auth[len('Bearer '):]
+    return hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8'))
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename != __file__:    # leave out the profiler's own hooks
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Args:
+        output_dir: where profile files are written
+        admin_token: token required for on-demand profiling and the listing
+        sample_rates: {url rule: N} to profile about 1 in N requests of a route
+        max_profiles: profiles kept (oldest removed first)
+        interval: stack sampling period in seconds
+    """
+
+    def __init__(self, output_dir, admin_token=None, sample_rates=None, max_profiles=50, interval=0.005):
+        self.output_dir = output_dir
+        self.admin_token = admin_token
+        self.sample_rates = sample_rates or {}
+        self.max_profiles = max_profiles
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    def _wanted(self):
+        flag = request.headers.get('X-Profile') or request.args.get('_profile')
+        if flag and flag != '0' and is_admin(request, self.admin_token):
+            return 'on-demand'
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        every = self.sample_rates.get(rule)
+        if every and random.randrange(every) == 0:
+            return 'sampled'
+        return None
+
+    def start(self):
+        """before_request: begin profiling this request when it was asked for or sampled"""
+        reason = self._wanted()
+        if reason is None or not self._busy.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        try:
+            sampler.start()
+            profile.enable()
+        except Exception as e:      # e.g. another profiler (debugger, coverage) is active
+            sampler.stop()
+            self._busy.release()
+            print(f"[PROFILE] Could not start profiling: {e}")
+            return
+        g._profile = (profile, sampler, reason, time.perf_counter())
+
+    def tag_response(self, response):
+        """after_request: tell the caller which profile to fetch"""
+        state = g.get('_profile')
+        if state is not None:
+            g._profile_status = response.status_code
+            g._profile_id = self._new_id()
+            response.headers['X-Profile-Id'] = g._profile_id
+        return response
+
+    def finish(self, exc=None):
+        """teardown_request: stop profiling and write the files"""
+        state = g.pop('_profile', None)
+        if state is None:
+            return
+        profile, sampler, reason, started = state
+        try:
+            profile.disable()
+            duration = time.perf_counter() - started
+            sampler.stop()
+            profile_id = g.pop('_profile_id', None) or self._new_id()
+            self._write(profile_id, profile, sampler, {
+                'id': profile_id,
+                'reason': reason,
+                'method': request.method,
+                'path': request.path,
+                'route': request.url_rule.rule if request.url_rule is not None else None,
+                'status': g.pop('_profile_status', 500),
+                'duration_ms': round(duration * 1000, 2),
+                'samples': sum(sampler.stacks.values()),
+                'created_at': datetime.now().isoformat(timespec='milliseconds'),
+            })
+        finally:
+            self._busy.release()
+
+    def _new_id(self):
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        slug = _SLUG_RE.sub('-', route).strip('-')[:40] or 'root'
+        return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{slug}-{os.getpid()}-{random.randrange(16 ** 4):04x}"
+
+    def _write(self, profile_id, profile, sampler, meta):
+        base = os.path.join(self.output_dir, profile_id)
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            profile.dump_stats(base + '.pstats')
+            with open(base + '.folded', 'w', encoding='utf-8') as f:
+                f.write(sampler.folded())
+            with open(base + '.json', 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"[PROFILE] Could not write profile {profile_id}: {e}")
+            return
+        print(f"[PROFILE] {meta['method']} {meta['path']} {meta['duration_ms']} ms -> {base}.pstats/.folded")
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        profiles = self.list()
+        for meta in profiles[self.max_profiles:]:
+            for ext in EXTENSIONS:
+                try:
+                    os.remove(os.path.join(self.output_dir, meta['id'] + ext))
+                except OSError:
+                    pass
+
+    def list(self):
+        """Metadata of the stored profiles, newest first"""
+        profiles = []
+        try:
+            names = os.listdir(self.output_dir)
+        except OSError:
+            return profiles
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.output_dir, name), 'r', encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        profiles.sort(key=lambda meta: (meta.get('created_at', ''), meta.get('id', '')), reverse=True)
+        return profiles
+
+    def install(self, app):
+        app.before_request(self.start)
+        app.after_request(self.tag_response)
+        app.teardown_request(self.finish)
+
+    # ===== ADMIN VIEWS =====
+
+    def list_view(self):
+        if not is_admin(request, self.admin_token):
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+        return jsonify({'success': True, 'profiles': self.list(), 'sample_rates': self.sample_rates})
+
+    def file_view(self, filename):
+        if not is_admin(request, self.admin_token):
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+        stem, ext = os.path.splitext(filename)
+        if ext not in EXTENSIONS or not _PROFILE_ID_RE.match(stem):
+            return jsonify({'success': False, 'message': 'Not found'}), 404
+        return send_from_directory(os.path.abspath(self.output_dir), filename, as_attachment=True)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for on-demand request profiling (profiling.py)
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from flask import Flask
+
+from profiling import RequestProfiler, parse_sample_rates
+
+
+def _client(output_dir, **kwargs):
+    app = Flask(__name__)
+    profiler = RequestProfiler(output_dir, admin_token='secret', interval=0.001, **kwargs)
+    profiler.install(app)
+
+    @app.route('/slow')
+    def slow():
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            json.loads('{"a": [1, 2, 3]}')
+        return 'done'
+
+    app.add_url_rule('/profiles', 'profiles', profiler.list_view)
+    app.add_url_rule('/profiles/<path:filename>', 'profile_file', profiler.file_view)
+    return app.test_client()
+
+
+def test_admin_request_is_profiled():
+    with tempfile.TemporaryDirectory() as out:
+        client = _client(out)
+        response = client.get('/slow', headers={'X-Profile': '1', 'X-Admin-Token': 'secret'})
+        profile_id = response.headers['X-Profile-Id']
+        assert sorted(os.listdir(out)) == sorted(profile_id + ext for ext in ('.json', '.folded', '.pstats'))
+
+        listing = client.get('/profiles', headers={'Authorization': 'Bearer secret'}).json['profiles']
+        assert listing[0]['id'] == profile_id and listing[0]['route'] == '/slow' and listing[0]['status'] == 200
+        folded = client.get(f'/profiles/{profile_id}.folded', headers={'X-Admin-Token': 'secret'}).data.decode()
+        assert 'slow (profiling_test.py' in folded
+
+
+def test_flag_without_token_is_ignored():
+    with tempfile.TemporaryDirectory() as out:
+        client = _client(out)
+        response = client.get('/slow?_profile=1', headers={'X-Admin-Token': 'wrong'})
+        assert 'X-Profile-Id' not in response.headers and not os.listdir(out)
+        assert client.get('/profiles').status_code == 401
+
+
+def test_sampled_route_and_retention():
+    with tempfile.TemporaryDirectory() as out:
+        client = _client(out, sample_rates=parse_sample_rates('/slow=1,bad'), max_profiles=2)
+        for _ in range(4):
+            client.get('/slow')
+        assert len(os.listdir(out)) == 6
@@ -0,0 +1,101 @@
+"""
+Versioned JSON responses for read-heavy GET endpoints (clan list, leaderboard).
+
+The data version is derived from the user store file (mtime + size), so every
+worker sees a write made by any other worker or by the bot with no shared
+state. The version gives each response:
+- a strong ETag computed *before* the store is read, so a client polling an
+  unchanged leaderboard gets a 304 for the cost of one stat();
+- a per-worker cache of the serialized body. An entry is reused while the
+  version matches and it is younger than `ttl`, and dropped on local writes.
+
+Responses carry `Cache-Control: no-cache`, so browsers revalidate every poll
+with If-None-Match instead of showing stale standings.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+
+def file_version(path):
+    """Version string of a file; changes whenever it is rewritten"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return '0'
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+class ResponseCache:
+    """
+    Args:
+        version: callable() -> str, the current data version
+        ttl: seconds a cached body may be served even when the version matches
+        max_entries: bodies kept (least recently used are dropped)
+    """
+
+    def __init__(self, version, ttl=5.0, max_entries=128):
+        self.version = version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()    # key -> (version, stored_at, body)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def etag(key, version):
+        return hashlib.sha1(f'{key}\0{version}'.encode('utf-8')).hexdigest()[:20]
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or time.monotonic() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def _put(self, key, version, body):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def respond(self, key, build):
+        """
+        Response for `key` at the current data version. `build()` returns the
+        JSON payload and is only called when neither a 304 nor a cached body
+        can be sent.
+        """
+        version = self.version()
+        etag = self.etag(key, version)
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+        # contains_weak: the compression middleware sends the ETag back weakened
+        if request.if_none_match.contains_weak(etag):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status=304, headers=headers)
+
+        body = self._get(key, version)
+        if body is None:
+            body = current_app.json.dumps(build()).encode('utf-8')
+            self._put(key, version, body)
+        return Response(body, mimetype='application/json', headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'not_modified': self.not_modified}
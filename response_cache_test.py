@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for versioned JSON responses (response_cache.py)
+"""
+
+import json
+import os
+import tempfile
+
+from flask import Flask
+
+from response_cache import ResponseCache, file_version
+
+
+def _setup(store):
+    app = Flask(__name__)
+    cache = ResponseCache(lambda: file_version(store), ttl=60)
+    builds = []
+
+    @app.route('/board')
+    def board():
+        def build():
+            builds.append(1)
+            with open(store, encoding='utf-8') as f:
+                return {'success': True, 'clans': json.load(f)}
+        return cache.respond('board', build)
+
+    return app.test_client(), cache, builds
+
+
+def _write(store, data, mtime_ns):
+    with open(store, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.utime(store, ns=(mtime_ns, mtime_ns))
+
+
+def test_etag_match_returns_304_without_building():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'users.json')
+        _write(store, {'Алаш': 10}, 1_000_000_000)
+        client, cache, builds = _setup(store)
+
+        first = client.get('/board')
+        assert first.status_code == 200 and first.json['clans'] == {'Алаш': 10}
+        etag = first.headers['ETag']
+        assert first.headers['Cache-Control'] == 'no-cache'
+
+        assert client.get('/board', headers={'If-None-Match': etag}).status_code == 304
+        assert client.get('/board', headers={'If-None-Match': 'W/' + etag}).status_code == 304
+        assert client.get('/board').status_code == 200
+        assert len(builds) == 1
+        assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'not_modified': 2}
+
+
+def test_store_write_changes_version_and_body():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'users.json')
+        _write(store, {'Алаш': 10}, 1_000_000_000)
+        client, cache, builds = _setup(store)
+        etag = client.get('/board').headers['ETag']
+
+        _write(store, {'Алаш': 25}, 2_000_000_000)
+        changed = client.get('/board', headers={'If-None-Match': etag})
+        assert changed.status_code == 200 and changed.json['clans'] == {'Алаш': 25}
+        assert changed.headers['ETag'] != etag and len(builds) == 2
+
+
+def test_invalidate_drops_cached_bodies():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'users.json')
+        _write(store, {}, 1_000_000_000)
+        client, cache, builds = _setup(store)
+        client.get('/board')
+        cache.invalidate()
+        client.get('/board')
+        assert len(builds) == 2
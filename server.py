@@ -3,18 +3,39 @@ from flask_cors import CORS
 import os
 import json
 import hashlib
+import hmac
 import sys
 import re
 import random
-from html.parser import HTMLParser
 from urllib.parse import urlparse
-import requests
-from datetime import datetime
+import importlib.util
+from datetime import datetime, timedelta
 import time
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 import threading
+from llm_metrics import llm_metrics
+from llm_json import SchemaViolation, parse_json_text, stream_json_completion
+from content_schemas import SCENARIO_SCHEMA, MISSION_SCHEMA, GAME_MISSION_SCHEMA
+from mission_cohort_cache import MissionCohortCache
+from dedup_index import DedupIndex, index_missions
+from content_catalog import ContentCatalog
+from content_search import build_default_index
+from content_packs import ContentPacks
+from source_fetcher import SourceFetcher
+from html_extract import extract_text
+from static_assets import StaticAssets
+from compression import CompressionMiddleware
+from concurrency import ConcurrencyLimiter
+from response_cache import ResponseCache, file_version
+from pagination import PageError, paginate, parse_page
+import clan_xp
+from clan_xp import ClanRanking
+import user_store
+from contextlib import contextmanager
+from metrics import metrics, instrument_app, STORE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from profiling import RequestProfiler, is_admin, parse_sample_rates
 
 # Try to import uuid, fallback to simple string generator if not available
 try:
@@ -31,94 +52,227 @@ def generate_uuid():
     """Generate a unique ID for sessions and users"""
     return _generate_uuid()
 
-# Safe import for OpenAI
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+# OpenAI is imported on first use: the SDK alone takes ~0.5 s to import,
+# which every serverless cold start would otherwise pay
+OPENAI_AVAILABLE = importlib.util.find_spec('openai') is not None
+if not OPENAI_AVAILABLE:
     print("[WARNING] OpenAI module not found. Install with: pip install openai")
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
-
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
-app.config['SESSION_TIMEOUT'] = 24 * 60 * 60  # 24 hours in seconds
-
 # OpenAI API Key (для генерации сценариев)
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+# Per-request cap so a hung completion can't hold a request thread indefinitely
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '30'))
 
-# Data storage
-data_file = 'unified_users.json'
+def _openai_client(api_key):
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, timeout=OPENAI_TIMEOUT)
+
+# Admin-triggered (X-Profile + ADMIN_TOKEN) or sampled (PROFILE_SAMPLE) request profiles
+request_profiler = RequestProfiler(
+    os.getenv('PROFILE_DIR', os.path.join(os.getcwd(), '.profiles')),
+    admin_token=os.getenv('ADMIN_TOKEN') or None,
+    sample_rates=parse_sample_rates(os.getenv('PROFILE_SAMPLE')),
+    max_profiles=int(os.getenv('PROFILE_MAX_FILES', '50'))
+)
+
+def create_app():
+    """Build and configure the Flask app; routes below register on `app`"""
+    flask_app = Flask(__name__)
+    CORS(flask_app)  # Enable CORS for all routes
+    flask_app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
+    flask_app.config['SESSION_TIMEOUT'] = 24 * 60 * 60  # 24 hours in seconds
+    flask_app.json.ensure_ascii = False  # Kazakh/Russian text as UTF-8 instead of 6-byte \uXXXX escapes
+    instrument_app(flask_app, metrics)
+    request_profiler.install(flask_app)
+    flask_app.wsgi_app = CompressionMiddleware(
+        flask_app.wsgi_app,
+        min_size=int(os.getenv('COMPRESSION_MIN_SIZE', '1024')),
+        gzip_level=int(os.getenv('COMPRESSION_GZIP_LEVEL', '6')),
+        brotli_quality=int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+    )
+    return flask_app
+
+app = create_app()
 
-# Session storage (in production, use Redis or database)
+# At most AI_MAX_CONCURRENCY of a worker's request threads wait on the LLM at once
+ai_limiter = ConcurrencyLimiter(
+    limit=int(os.getenv('AI_MAX_CONCURRENCY', '8')),
+    wait=float(os.getenv('AI_QUEUE_WAIT', '2')),
+    retry_after=int(os.getenv('AI_RETRY_AFTER', '5'))
+)
+
+# Data storage
+data_file = os.getenv('DATA_FILE', 'unified_users.json')
+
+# Clan list / leaderboard responses, versioned by the store file (ETag + short per-worker cache)
+clan_cache = ResponseCache(lambda: file_version(data_file), ttl=float(os.getenv('CLAN_CACHE_TTL', '5')))
+
+# Clans ranked by their running XP totals (clan_xp.py): clan routes re-rank the clans they
+# change, and the whole ranking is rebuilt only when another process rewrote the store
+clan_ranking = ClanRanking()
+
+# Fallback missions, scenarios and learning content (loaded once, reloaded on change)
+content_catalog = ContentCatalog(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fallback_content.json'))
+
+# Static catalog bundles, serialized and compressed once per catalog version
+content_packs = ContentPacks(content_catalog)
+
+# Full-text and near-duplicate indexes are built on first use, not at import
+_index_lock = threading.Lock()
+_content_search_index = None
+_mission_dedup_index = None
+_generated_dedup_indexes = {}
+
+def get_content_search_index():
+    """Full-text index over curated missions, bot lessons and learning model content"""
+    global _content_search_index
+    if _content_search_index is None:
+        with _index_lock:
+            if _content_search_index is None:
+                _content_search_index = build_default_index(content_catalog)
+    return _content_search_index
+
+def _drop_generated_passage(doc_id):
+    """A generated mission left the dedup ring: stop serving it from search too"""
+    if _content_search_index is not None:
+        _content_search_index.remove(doc_id)
+
+def get_mission_dedup_index():
+    """Curated missions plus the last MISSION_DEDUP_RECENT missions generated since startup"""
+    global _mission_dedup_index
+    if _mission_dedup_index is None:
+        with _index_lock:
+            if _mission_dedup_index is None:
+                index = DedupIndex(max_recent=int(os.getenv('MISSION_DEDUP_RECENT', '5000')),
+                                   on_evict=_drop_generated_passage)
+                _mission_dedup_index = index_missions(index, content_catalog.missions())
+    return _mission_dedup_index
+
+def get_generated_dedup_index(kind):
+    """
+    Near-duplicate index per generated kind: 'mission' (personal missions and
+    learning content, see get_mission_dedup_index), 'scenario', 'game_mission'
+    (the last MISSION_DEDUP_RECENT of each generated since startup)
+    """
+    if kind == 'mission':
+        return get_mission_dedup_index()
+    index = _generated_dedup_indexes.get(kind)
+    if index is None:
+        with _index_lock:
+            index = _generated_dedup_indexes.setdefault(
+                kind, DedupIndex(max_recent=int(os.getenv('MISSION_DEDUP_RECENT', '5000'))))
+    return index
+
+# Session storage (in production, use Redis or database).
+# Sessions live in this process only: gunicorn.conf.py runs one worker by default
+# so that every request sees every session. Request threads share the dict, so
+# all access goes through _sessions_lock.
 sessions = {}
+_sessions_lock = threading.Lock()
+SESSION_TTL = timedelta(hours=24)
 
 def generate_session_id():
     """Generate a secure session ID"""
     return generate_uuid()
 
+def session_email(session_id):
+    """Email of a valid session, else None (an expired session is dropped)"""
+    if not session_id:
+        return None
+    with _sessions_lock:
+        session_data = sessions.get(session_id)
+        if session_data is None:
+            return None
+        # Check if session is older than 24 hours
+        if datetime.now() - datetime.fromisoformat(session_data['created_at']) > SESSION_TTL:
+            del sessions[session_id]
+            return None
+        return session_data['email']
+
 def is_session_valid(session_id):
     """Check if session is valid and not expired"""
-    if not session_id or session_id not in sessions:
-        return False
-    
-    session_data = sessions[session_id]
-    created_at = datetime.fromisoformat(session_data['created_at'])
-    
-    # Check if session is older than 24 hours
-    if datetime.now() - created_at > timedelta(hours=24):
-        del sessions[session_id]
-        return False
-    
-    return True
+    return session_email(session_id) is not None
 
 def create_session(email):
     """Create a new session for user"""
     session_id = generate_session_id()
-    sessions[session_id] = {
-        'email': email,
-        'created_at': datetime.now().isoformat(),
-        'last_activity': datetime.now().isoformat()
-    }
+    now = datetime.now().isoformat()
+    with _sessions_lock:
+        sessions[session_id] = {
+            'email': email,
+            'created_at': now,
+            'last_activity': now
+        }
     return session_id
 
 def update_session_activity(session_id):
     """Update last activity timestamp"""
-    if session_id in sessions:
-        sessions[session_id]['last_activity'] = datetime.now().isoformat()
+    with _sessions_lock:
+        if session_id in sessions:
+            sessions[session_id]['last_activity'] = datetime.now().isoformat()
+
+def end_session(session_id):
+    """Invalidate a session (no-op for an unknown one)"""
+    with _sessions_lock:
+        sessions.pop(session_id, None)
 
 def cleanup_expired_sessions():
     """Remove expired sessions"""
     current_time = datetime.now()
-    expired_sessions = []
-    
-    for session_id, session_data in sessions.items():
-        created_at = datetime.fromisoformat(session_data['created_at'])
-        if current_time - created_at > timedelta(hours=24):
-            expired_sessions.append(session_id)
-    
-    for session_id in expired_sessions:
-        del sessions[session_id]
+    with _sessions_lock:
+        expired_sessions = [session_id for session_id, session_data in sessions.items()
+                            if current_time - datetime.fromisoformat(session_data['created_at']) > SESSION_TTL]
+        for session_id in expired_sessions:
+            del sessions[session_id]
+
+metrics.histogram('store_operation_duration_seconds', 'User store load/save time', STORE_BUCKETS)
+metrics.counter('store_bytes_written_total', 'Bytes written to the user store')
 
 # Helper function to load users data
 def load_users():
-    if os.path.exists(data_file):
-        with open(data_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            # Ensure proper structure
-            if 'web_users' not in data:
-                return {'web_users': data, 'tg_links': {}, 'clans': {}}
-            return data
-    return {'web_users': {}, 'tg_links': {}, 'clans': {}}
+    with metrics.timer('store_operation_duration_seconds', operation='load'):
+        if os.path.exists(data_file):
+            with open(data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                # Ensure proper structure
+                if 'web_users' not in data:
+                    return {'web_users': data, 'tg_links': {}, 'clans': {}}
+                return data
+        return {'web_users': {}, 'tg_links': {}, 'clans': {}}
 
 # Helper function to save users data
 def save_users(users_data):
-    with open(data_file, 'w', encoding='utf-8') as f:
-        json.dump(users_data, f, ensure_ascii=False, indent=2)
+    # Atomic swap under the store lock: readers never see a half-written store. Clan
+    # changes in this process pass clan_ranking to clan_xp, so the ranking only moves to
+    # this write's version (writers all hold the lock, so no other write comes between)
+    with user_store.locked(data_file):
+        version = file_version(data_file)
+        with metrics.timer('store_operation_duration_seconds', operation='save'):
+            user_store.write_json(data_file, users_data)
+        clan_ranking.advance(version, file_version(data_file))
+    metrics.inc('store_bytes_written_total', os.path.getsize(data_file))
+    clan_cache.invalidate()
+
+@contextmanager
+def store_transaction():
+    """
+    `with store_transaction() as data:` loads the store, lets the block change
+    it and saves it, holding the store lock (threads and processes) throughout
+    so concurrent requests cannot overwrite each other's changes. The store is
+    saved when the block exits normally (a `return` included) and left as it
+    was when the block raises.
+    """
+    with user_store.locked(data_file):
+        data = load_users()
+        try:
+            yield data
+        except BaseException:
+            clan_ranking.invalidate()   # it may hold clan changes that are not saved
+            raise
+        save_users(data)
 
 def _verify_user_password(email: str, user: dict, password: str) -> tuple[bool, bool]:
     """
@@ -144,6 +298,7 @@ def _public_user(user: dict) -> dict:
     return {k: v for k, v in user.items() if k not in {'password', 'password_hash'}}
 
 _rate_buckets: dict[str, list[float]] = {}
+_rate_lock = threading.Lock()
 
 def _client_ip() -> str:
     forwarded = request.headers.get('X-Forwarded-For', '')
@@ -158,48 +313,23 @@ def _rate_limit(bucket_name: str, limit: int, window_seconds: int) -> tuple[bool
     """
     now = time.time()
     key = f'{bucket_name}:{_client_ip()}'
-    bucket = _rate_buckets.setdefault(key, [])
-    cutoff = now - window_seconds
-    bucket[:] = [t for t in bucket if t >= cutoff]
-    if len(bucket) >= limit:
-        oldest = min(bucket) if bucket else now
-        retry_after = max(1, int(window_seconds - (now - oldest)))
-        return True, retry_after
-    bucket.append(now)
+    with _rate_lock:
+        bucket = _rate_buckets.setdefault(key, [])
+        cutoff = now - window_seconds
+        bucket[:] = [t for t in bucket if t >= cutoff]
+        if len(bucket) >= limit:
+            oldest = min(bucket) if bucket else now
+            retry_after = max(1, int(window_seconds - (now - oldest)))
+            return True, retry_after
+        bucket.append(now)
     return False, 0
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
-
-# Define uploads directory
+# Uploads directory (created by whatever first writes to it, not at import)
 uploads_dir = os.path.join(os.getcwd(), 'uploads')
-os.makedirs(uploads_dir, exist_ok=True)
-
-class _HTMLTextExtractor(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self._chunks = []
-        self._skip_depth = 0
-
-    def handle_starttag(self, tag, attrs):
-        if tag in {'script', 'style', 'noscript'}:
-            self._skip_depth += 1
-
-    def handle_endtag(self, tag):
-        if tag in {'script', 'style', 'noscript'} and self._skip_depth > 0:
-            self._skip_depth -= 1
-
-    def handle_data(self, data):
-        if self._skip_depth == 0:
-            self._chunks.append(data.strip())
-
-    def get_text(self):
-        return ' '.join(filter(None, self._chunks))
 
-def _extract_text_from_html(html_content):
-    parser = _HTMLTextExtractor()
-    parser.feed(html_content)
-    return parser.get_text()
+def _extract_text_from_html(html_chunks):
+    # Streams the page and stops once enough article text is collected
+    return extract_text(html_chunks, max_chars=4000)
 
 def _is_allowed_source_url(url):
     parsed = urlparse(url)
@@ -209,27 +339,24 @@ def _is_allowed_source_url(url):
         'museum.kz', 'nationalmuseum.kz', 'edu.kz'
     ])
 
+# Pooled, disk-cached fetching of official sources (parallel, under one deadline)
+source_fetcher = SourceFetcher(
+    _extract_text_from_html,
+    cache_dir=os.getenv('SOURCE_CACHE_DIR', os.path.join(os.getcwd(), '.source_cache')),
+    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    deadline=float(os.getenv('SOURCE_FETCH_DEADLINE', '10'))
+)
+
 def _fetch_official_texts(urls):
     source_texts = []
     used_urls = []
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-    
-    for url in urls[:3]:
-        if not _is_allowed_source_url(url):
-            continue
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                text = _extract_text_from_html(response.text)
-                if len(text) > 200:
-                    source_texts.append(text)
-                    used_urls.append(url)
-        except Exception as e:
-            print(f"[ERROR] Failed to fetch official text from {url}: {str(e)}")
-            continue
-    
+
+    allowed = [url for url in urls if _is_allowed_source_url(url)][:3]
+    for result in source_fetcher.fetch_many(allowed):
+        if len(result.text) > 200:
+            source_texts.append(result.text)
+            used_urls.append(result.url)
+
     return source_texts, used_urls
 
 def _groq_generate_mission(topic, level=1):
@@ -300,20 +427,8 @@ def _groq_generate_mission(topic, level=1):
         
         # Try to extract JSON from response
         try:
-            # Look for JSON in the response
-            import re
-            json_match = re.search(r'\{.*\}', content_text, re.DOTALL)
-            if json_match:
-                json_text = json_match.group()
-                content = json.loads(json_text)
-            else:
-                content = json.loads(content_text)
-                
-            # Validate required fields
-            required_fields = ['text_kz', 'questions_kz', 'options_kz', 'correct_answers']
-            for field in required_fields:
-                if field not in content:
-                    return False, None, f"Missing required field: {field}"
+            content = parse_json_text(content_text, fields=MISSION_SCHEMA.field_types,
+                                      required=MISSION_SCHEMA.required)
                     
             # Validate data structure
             if not isinstance(content['questions_kz'], list) or len(content['questions_kz']) != 4:
@@ -329,6 +444,8 @@ def _groq_generate_mission(topic, level=1):
             if not isinstance(content['correct_answers'], list) or len(content['correct_answers']) != 4:
                 return False, None, "correct_answers must be a list of 4 integers"
                 
+        except SchemaViolation as e:
+            return False, None, f"Invalid field {e.field}: {e.reason}"
         except json.JSONDecodeError as e:
             print(f"[GROQ] JSON parsing error: {e}")
             print(f"[GROQ] Raw response: {content_text[:200]}...")
@@ -340,21 +457,24 @@ def _groq_generate_mission(topic, level=1):
         error_msg = f"Groq API error: {str(e)}"
         return False, None, error_msg
 
-def _openai_generate_personal_mission(user_profile):
+def _openai_generate_personal_mission(user_profile, call):
     """
     Generate personalized mission using OpenAI API (gpt-4o-mini model)
-    Takes user profile with: level, completedMissions, weakAreas, language
+    Takes user profile with: level, completedMissions, weakAreas, language,
+    and the llm_metrics call the attempt is recorded on
     Returns: (success, content, error_message)
     """
     if not OPENAI_AVAILABLE:
+        call.skipped('openai_unavailable')
         return False, None, "OpenAI module not available"
 
     try:
         openai_api_key = OPENAI_API_KEY
         if not openai_api_key or openai_api_key == 'your_openai_api_key_here':
+            call.skipped('missing_api_key')
             return False, None, "OpenAI API key not configured"
 
-        client = OpenAI(api_key=openai_api_key)
+        client = _openai_client(openai_api_key)
 
         # Extract user profile data
         level = user_profile.get('level', 1)
@@ -371,7 +491,8 @@ def _openai_generate_personal_mission(user_profile):
         }
 
         # Determine topics to avoid (already completed)
-        avoid_topics = ", ".join(completed_missions[:5]) if completed_missions else "жоқ"
+        completed_topics = [m.get('topic', '') if isinstance(m, dict) else str(m) for m in completed_missions]
+        avoid_topics = ", ".join(completed_topics[:5]) if completed_topics else "жоқ"
 
         # Determine weak areas to focus on
         focus_areas = ", ".join(weak_areas[:3]) if weak_areas else "Қазақстан тарихы жалпы"
@@ -410,26 +531,24 @@ def _openai_generate_personal_mission(user_profile):
     "topic": "Мәтіннің тақырыбы"
 }}"""
 
-        # Call OpenAI API with o4-mini model
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Using o4-mini as specified (gpt-4o-mini is the actual model name)
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=1500,
-            response_format={"type": "json_object"}
-        )
-
-        content_text = response.choices[0].message.content
-
-        # Parse JSON response
+        # Stream the completion so a malformed mission is abandoned early
+        parser = MISSION_SCHEMA.parser()
         try:
-            content = json.loads(content_text)
+            # Call OpenAI API with o4-mini model
+            content = stream_json_completion(
+                client, parser, call=call,
+                model="gpt-4o-mini",  # Using o4-mini as specified (gpt-4o-mini is the actual model name)
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=1500,
+                response_format={"type": "json_object"}
+            )
 
-            # Validate required fields
-            required_fields = ['text_kz', 'questions_kz', 'options_kz', 'correct_answers']
-            for field in required_fields:
-                if field not in content:
-                    return False, None, f"Missing required field: {field}"
+            content, errors, repairs = MISSION_SCHEMA.validate_and_repair(content)
+            call.repaired(repairs)
+            if errors:
+                call.fallback('schema:invalid')
+                return False, None, f"Invalid mission: {'; '.join(errors)}"
 
             # Add AI-generated flag
             content['ai_generated'] = True
@@ -438,16 +557,74 @@ def _openai_generate_personal_mission(user_profile):
 
             return True, content, None
 
+        except SchemaViolation as e:
+            call.fallback(f'schema:{e.field}')
+            return False, None, f"Invalid field {e.field}: {e.reason}"
+
         except json.JSONDecodeError as e:
+            call.fallback('invalid_json')
             print(f"[OPENAI] JSON parsing error: {e}")
-            print(f"[OPENAI] Raw response: {content_text[:200]}...")
+            print(f"[OPENAI] Raw response: {parser.text[:200]}...")
             return False, None, f"JSON parsing error: {str(e)}"
 
     except Exception as e:
         error_msg = f"OpenAI API error: {str(e)}"
         print(f"[OPENAI] {error_msg}")
+        call.fallback('api_error')
         return False, None, error_msg
 
+def _claim_generated(kind, text):
+    """
+    Record `text` as newly generated `kind` content, unless it nearly repeats
+    indexed content. Returns (doc_id, None), or (None, (repeated_id, similarity)).
+    """
+    index = get_generated_dedup_index(kind)
+    signature = index.signature(text)
+    duplicate = index.find_duplicate(signature=signature)
+    if duplicate is not None:
+        print(f"[DEDUP] Generated {kind} repeats {duplicate[0]} ({duplicate[1]:.2f})")
+        return None, duplicate
+    return index.add_recent(signature=signature, prefix='generated'), None
+
+def _claim_generated_mission(content):
+    """_claim_generated() for a mission; a new one also becomes searchable"""
+    doc_id, duplicate = _claim_generated('mission', content.get('text_kz', ''))
+    if doc_id is not None:
+        get_content_search_index().add(doc_id, {
+            'title': content.get('topic', ''), 'text': content.get('text_kz', ''),
+            'lang': 'kz', 'source': 'generated'
+        })
+    return duplicate
+
+def _generate_unique_personal_mission(user_profile, attempts=2):
+    """
+    Generate a personalized mission that does not repeat known content.
+    A near-duplicate is re-rolled (recorded as a retry) with its topic added to the avoid list.
+    """
+    profile = dict(user_profile)
+    with llm_metrics.track('generate_personalized_mission', 'gpt-4o-mini') as call:
+        for attempt in range(attempts):
+            if attempt:
+                call.retry()
+            success, content, error = _openai_generate_personal_mission(profile, call)
+            if not success:
+                return success, content, error
+
+            duplicate = _claim_generated_mission(content)
+            if duplicate is None:
+                return True, content, None
+            profile['completedMissions'] = [content.get('topic', '')] + list(profile.get('completedMissions') or [])
+        call.fallback('duplicate')
+
+    return False, None, f"Generated mission duplicates existing content ({duplicate[0]})"
+
+# Students with the same level / weak areas share a pool of generated missions
+personal_mission_cache = MissionCohortCache(
+    _generate_unique_personal_mission,
+    pool_size=int(os.getenv('MISSION_POOL_SIZE', '4')),
+    limiter=ai_limiter
+)
+
 def _gemini_generate(prompt):
     try:
         gemini_api_key = os.getenv('GEMINI_API_KEY', '').strip()
@@ -478,195 +655,64 @@ def _gemini_generate(prompt):
             "sources": []
         })
 
-def _get_fallback_scenario(character, scenario_number, language='kk'):
+def _fallback_scenario_response(character, scenario_number, language='kk'):
     """
-    Get fallback scenario when AI generation fails
+    Fallback scenario response when AI generation fails (pre-encoded, see content_packs)
     """
-    fallbacks = {
-        'Абылай хан': [
-            {
-                'scenario': 1,
-                'text': 'Жоңғар сарбаздары қазақ жерінің шегіне жақындады. Ата-баба қорғау үшін не істеу керек?' if language == 'kk' else 'Джунгарские войска приблизились к границам. Как защитить земли предков?',
-                'options': [
-                    {'id': 'A', 'text': 'Тез атақ жасау' if language == 'kk' else 'Немедленно атаковать', 'isCorrect': False},
-                    {'id': 'B', 'text': 'Үш жүздің барлығын біліктестіру' if language == 'kk' else 'Объединить три жуза', 'isCorrect': True},
-                    {'id': 'C', 'text': 'Түгелтеп іле шығу' if language == 'kk' else 'Отступить', 'isCorrect': False},
-                    {'id': 'D', 'text': 'Орыстарға көмек сұрау' if language == 'kk' else 'Попросить помощь у русских', 'isCorrect': False}
-                ],
-                'correctAnswer': 'B',
-                'wrongConsequence': 'Айдап күрес жеңіліске ұласты. Жоңғарлар қазақ топтарын бөлік-бөлік ұрды.' if language == 'kk' else 'Спешная атака привела к поражению. Джунгары разбили разрозненные казахские отряды.',
-                'correctConsequence': 'Үш жүзді біріктіре отырып, сіз қүшті әскер құрдыңыз. Жоңғарларға қарсы айтадай жеңіс!' if language == 'kk' else 'Объединив три жуза, вы создали мощное войско. Победа над джунгарами!',
-                'historicalContext': 'Абылай хан бірлік арқылы күшті әскер құру стратегиясын қолданды.' if language == 'kk' else 'Абылай хан использовал стратегию объединения для создания сильного войска.',
-                'nextScenarioSetup': 'Үш жүз қосылса, әрі де басқа проблемалар туындайды...'
-            },
-            {
-                'scenario': 2,
-                'text': 'Жүс ішінде жатысуы болды, әділіксіз өлімдер болды. Халықты ішінара біріктіруді қалай сақталу керек?' if language == 'kk' else 'Внутри жузов были конфликты. Как поддержать единство перед лицом врага?',
-                'options': [
-                    {'id': 'A', 'text': 'Ең күшті Node-ге құл бер' if language == 'kk' else 'Подчиниться сильнейшему', 'isCorrect': False},
-                    {'id': 'B', 'text': 'Прави-ші бий өндіктіррер сот құр' if language == 'kk' else 'Созвать совет биев для разрешения конфликтов', 'isCorrect': True},
-                    {'id': 'C', 'text': 'Ешкімге көмек көрсетпе' if language == 'kk' else 'Не вмешиваться во внутренние дела', 'isCorrect': False},
-                    {'id': 'D', 'text': 'Қауіпті адамдарды айырп тастау' if language == 'kk' else 'Изгнать смутьянов', 'isCorrect': False}
-                ],
-                'correctAnswer': 'B',
-                'wrongConsequence': 'Дау Продолжить қалып, әскер қарсы өндіктіларсы төрт жүзіне бөлінді.' if language == 'kk' else 'Конфликты продолжились, и армия ослабла перед врагом.',
-                'correctConsequence': 'Бий совет объединил өндіктіларды әділік аргументі арқылы. Халық біліктер! Әскер дайындалды!' if language == 'kk' else 'Совет биев объединил людей справедливостью. Народ готов! Армия подготовлена!',
-                'historicalContext': 'Абылай хан биев институтын қолдана отырып, немінде келген сағын істеді.' if language == 'kk' else 'Абылай хан использовал институт биев для единства.',
-                'nextScenarioSetup': 'Әскер дайындалды. Бірақ ақырында жоңғарлармен өндіктіпарлар жақындалды...'
-            }
-        ],
-        'Абай Кунанбаев': [
-            {
-                'scenario': 1,
-                'text': 'Жас балалар сөз сөйлеу әнерін үйренгісі келеді. Аларға не үйретесіз?' if language == 'kk' else 'Молодые люди хотят научиться красивой речи. Как их обучить?',
-                'options': [
-                    {'id': 'A', 'text': 'Ескі өлеңдерді оқы' if language == 'kk' else 'Читать старые стихи', 'isCorrect': False},
-                    {'id': 'B', 'text': 'Өздік өлең жазуды үйрет' if language == 'kk' else 'Учить писать собственные стихи', 'isCorrect': True},
-                    {'id': 'C', 'text': 'Басқа іс істеуге ықылас бер' if language == 'kk' else 'Позволить заняться другим', 'isCorrect': False},
-                    {'id': 'D', 'text': 'Шетел әдебиетін оқы' if language == 'kk' else 'Читать иностранную литературу', 'isCorrect': False}
-                ],
-                'correctAnswer': 'B',
-                'wrongConsequence': 'Ескі өлеңдерді қайталап жүргеніңіз балалардың шығармашылығын тоқтатты. Олар ешкімге ұқсамасса өлеңдер жаза алмады.' if language == 'kk' else 'Повторение старых стихов не развивает творчество. Молодежь не может создавать свои произведения.',
-                'correctConsequence': 'Өз сөздерімен өлең жазуды үйретіңіз - балалар шығармашыл болды! Өндіктіпарлар өндіктіпарлар түрінде қайта ойлау басталады.' if language == 'kk' else 'Обучая писать собственные стихи, вы развиваете их творчество. Молодежь начинает оригинально мыслить!',
-                'historicalContext': 'Абай өздік шығармашылықты түлектіге үйреді, ол қазақ әдебиетінің сәні болды.' if language == 'kk' else 'Абай учил ученикам самостоятельному творчеству, что стало основой казахской литературы.',
-                'nextScenarioSetup': 'Балалар өлең жаза барлығына балалық та бұлай ілінді...'
-            }
-        ],
-        'Айтеке би': [
-            {
-                'scenario': 1,
-                'text': 'Екі саудагер өнімділік туралы дауласып жатыр. Сіз әділ сот ете аласыз ба?' if language == 'kk' else 'Два купца спорят о товаре. Как разрешить этот спор справедливо?',
-                'options': [
-                    {'id': 'A', 'text': 'Күшілі тарапқа құқық бер' if language == 'kk' else 'Дать право более сильному', 'isCorrect': False},
-                    {'id': 'B', 'text': 'Екеуінің де сөзін тыңда' if language == 'kk' else 'Выслушать обе стороны', 'isCorrect': True},
-                    {'id': 'C', 'text': 'Ешкімге байланыстырма' if language == 'kk' else 'Не разбираться в спорах', 'isCorrect': False},
-                    {'id': 'D', 'text': 'Ысқақ төңнег өлеңін' if language == 'kk' else 'Призвать свидетелей', 'isCorrect': False}
-                ],
-                'correctAnswer': 'B',
-                'wrongConsequence': 'Біржақтап сот істесеңіз, халық сізге күмәнеді. Өндіктіпарлар өндіктіпарлар секе міндеттерді істей қоймайды.' if language == 'kk' else 'Несправедливое решение подрывает доверие народа. Люди перестанут обращаться к вам с делами.',
-                'correctConsequence': 'Екеуінің де сөзін тыңдау арқылы сіз әділ шешім қабылдадыңыз. Халық сіздің даналығына мойындау жасады және өндіктіпарлар сіздің сотын сезінді.' if language == 'kk' else 'Выслушав обе стороны, вы вынесли справедливое решение. Народ уважает вашу мудрость!',
-                'historicalContext': 'Айтеке би әділік жеті жарғыда айтылғандай әділік арқылы халық өндіктіпарларын сақтады.' if language == 'kk' else 'Айтеке би, как установлено в Жеті Жарғы, разрешал споры справедливо.',
-                'nextScenarioSetup': 'Әділ сот өндіктіпарлар түліктіне ықдай, түліктіктелік өндіктіпарлар келіді...'
-            }
-        ]
-    }
-
-    character_fallbacks = fallbacks.get(character, fallbacks['Абылай хан'])
-    return character_fallbacks[min(scenario_number - 1, len(character_fallbacks) - 1)]
-
-
-def _get_fallback_mission(topic):
-    fallback_content = {
-        'Қазақ хандығы': {
-            'text_kz': 'Қазақ хандығы - қазақ халқының мемлекеттігінің негізі қаланған тарихи оқиға. 1465 жылы Қазақ хандығы құрылды. Керей мен Жәнібек хандар қазақ руларын біріктіріп, жаңа мемлекет құрды.',
-            'questions_kz': [
-                'Қазақ хандығы қашан құрылды?',
-                'Қазақ хандығының негізін қалған хандар кімдер?',
-                'Қазақ хандығы қандай маңызға ие?'
-            ],
-            'text_ru': 'Казахское ханство - историческое событие, положившее основу государственности казахского народа. В 1465 году было создано Казахское ханство. Хане Керей и Жанибек объединили казахские роды и создали новое государство.',
-            'questions_ru': [
-                'Когда было создано Казахское ханство?',
-                'Кто основал Казахское ханство?',
-                'Какое значение имеет Казахское ханство?'
-            ],
-            'topic': 'Қазақ хандығы',
-            'level': 2,
-            'image_prompt': 'Казахские ханы Керей и Жанибек на фоне степей, средневековый Казахстан'
-        },
-        'Абылай хан': {
-            'text_kz': 'Абылай хан - қазақ халқының ұлы батыры, мемлекет қайраткері. Ол 18 ғасырда қазақ жүздерін біріктіріп, жоңғар шапқыншылығына қарсы күресті. Абылай хан - дана басшы, елдің бірлігіне көп еңбек сіңірген.',
-            'questions_kz': [
-                'Абылай хан қашан өмір сүрген?',
-                'Абылай хан қандай қасиеттерге ие болды?',
-                'Абылай ханның тарихи маңызы не?'
-            ],
-            'text_ru': 'Абылай хан - великий батыр и государственный деятель казахского народа. В 18 веке он объединил казахские жузы и боролся против джунгарских нашествий. Абылай хан - мудрый правитель, внесший большой вклад в единство народа.',
-            'questions_ru': [
-                'Когда жил Абылай хан?',
-                'Какими качествами обладал Абылай хан?',
-                'В чем историческое значение Абылай хана?'
-            ],
-            'topic': 'Абылай хан',
-            'level': 3,
-            'image_prompt': 'Абылай хан в батырских доспехах на фоне казахских степей, исторический портрет'
-        }
-    }
-    return fallback_content.get(topic)
-
-def _generate_learning_content_kz(topic: str, source_urls=None, level=1):
-    """
-    Generate learning content using proper fallback missions
-    """
-    # Use proper fallback missions based on topic
-    fallback_missions = {
-        'Абылай хан': {
-            'text_kz': 'Абылай хан - қазақ халқының ұлы батыры, 1711-1781 жылдары өмір сүрген. Ол Қазақ хандығын біріктіріп, жоңғар шапқыншылығына қарсы күресті. Абылай хан әділдігімен, ерлігімен және данышпандығымен танылды.',
-            'questions_kz': [
-                'Абылай хан қай жылдары өмір сүрген?',
-                'Абылай хан қандай қасиеттерімен танылды?',
-                'Абылай хан қандай жаудың шапқыншылығына қарсы күресті?'
-            ],
-            'options_kz': [
-                ['1711-1781', '1721-1791', '1731-1791', '1701-1781'],
-                ['Әділдігімен, ерлігімен', 'Ақылмен, байлығымен', 'Күшпен, қаталдығымен', 'Сымбаттылығымен, әсемдігімен'],
-                ['Жоңғар', 'Орыс', 'Қырғыз', 'Қытай']
-            ],
-            'correct_answers': [0, 0, 0],
-            'level': level
-        },
-        'Абай': {
-            'text_kz': 'Абай Құнанбайұлы - қазақ әдебиетінің классигі, 1845-1904 жылдары өмір сүрген. Ол ақын, аудармашы, композитор және философ. Абай "Қара сөз" атты философиялық еңбегін жазды, қазақ поэзиясын жаңа деңгейге көтерді.',
-            'questions_kz': [
-                'Абай қай жылдары өмір сүрген?',
-                'Абайдың қандай еңбегі ең белгілі?',
-                'Абай қандай қызметтермен айналысқан?'
-            ],
-            'options_kz': [
-                ['1845-1904', '1835-1894', '1855-1914', '1825-1884'],
-                ['Қара сөз', 'Ақ сөз', 'Қызыл сөз', 'Көк сөз'],
-                ['Ақын, аудармашы', 'Шопан, егінші', 'Темірші, ұстаз', 'Балуан, күресші']
-            ],
-            'correct_answers': [0, 0, 0],
-            'level': level
-        },
-        'Айтеке би': {
-            'text_kz': 'Айтеке би - қазақ халқының ұлы биі, XVII ғасырда өмір сүрген. Ол әділдігімен, данышпандығымен, шешендігімен танылған. Айтеке би халық арасында дауларды шешіп, әділдік орнатқан. Оның шешендік сөздері бүгінде де маңызды.',
-            'questions_kz': [
-                'Айтеке би қай ғасырда өмір сүрген?',
-                'Айтеке би қандай қасиеттерімен танылды?',
-                'Айтеке би халық арасыда не істеген?'
-            ],
-            'options_kz': [
-                ['XVII ғасыр', 'XVI ғасыр', 'XVIII ғасыр', 'XIX ғасыр'],
-                ['Әділдігімен, данышпандығымен', 'Байлығымен, күшімен', 'Сымбаттылығымен, әсемдігімен', 'Қаталдығымен, қатігездігімен'],
-                ['Дауларды шешіп, әділдік орнатқан', 'Соғыстарды басқарған', 'Елді тонап, байытқан', 'Жер аударып, көштірген']
-            ],
-            'correct_answers': [0, 0, 0],
-            'level': level
-        }
-    }
-    
-    return fallback_missions.get(topic, fallback_missions['Абылай хан'])
+    return content_packs.fallback_response(request, 'scenario', character, language, number=scenario_number)
 
 def _translate_kz_to_ru(text_kz: str):
     return f'Перевод: {text_kz}'
 
+# Fingerprinted, precompressed front-end build (python build_assets.py); source files otherwise
+static_assets = StaticAssets(os.getenv('STATIC_DIST_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dist')))
+
+def _send_static(path):
+    response = static_assets.send(path, request)
+    if response is None:
+        return send_from_directory('.', path)
+    return response
+
 @app.route('/')
 def index():
-    return send_from_directory('.', 'intro.html')
+    return _send_static('intro.html')
 
 @app.route('/health')
 def health():
     return jsonify({'status': 'healthy', 'service': 'BATYR BOL'})
 
+def _metrics_authorized():
+    """METRICS_TOKEN bearer or the admin token; closed when neither is set"""
+    token = os.getenv('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        return True
+    return is_admin(request, request_profiler.admin_token)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape target, merged over all gunicorn workers (METRICS_TOKEN bearer or admin token)"""
+    if not _metrics_authorized():
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    return metrics.render(), 200, {'Content-Type': METRICS_CONTENT_TYPE, 'Cache-Control': 'no-store'}
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_request_profiles():
+    """Stored request profiles, newest first (admin token required)"""
+    return request_profiler.list_view()
+
+@app.route('/api/admin/profiles/<path:filename>', methods=['GET'])
+def download_request_profile(filename):
+    """<id>.pstats, <id>.folded or <id>.json of one profile (admin token required)"""
+    return request_profiler.file_view(filename)
+
 @app.route('/game')
 def game():
-    return send_from_directory('.', 'igra.html')
+    return _send_static('igra.html')
 
 @app.route('/mission')
 def mission():
-    return send_from_directory('.', 'mission.html')
+    return _send_static('mission.html')
 
 @app.route('/groq-demo')
 def groq_demo():
@@ -698,9 +744,11 @@ def login_user():
             ok, should_migrate = _verify_user_password(email, user, password)
             if ok:
                 if should_migrate:
-                    user['password_hash'] = generate_password_hash(password)
-                    user.pop('password', None)
-                    save_users(all_data)
+                    with store_transaction() as locked_data:
+                        stored = locked_data.get('web_users', {}).get(email)
+                        if stored is not None and stored.get('password') == password:
+                            stored['password_hash'] = generate_password_hash(password)
+                            stored.pop('password', None)
                 
                 # Create session
                 session_id = create_session(email)
@@ -749,14 +797,13 @@ def check_session():
         if not session_id:
             return jsonify({'valid': False, 'message': 'No session provided'})
         
-        if is_session_valid(session_id):
-            session_data = sessions[session_id]
+        email = session_email(session_id)
+        if email:
             update_session_activity(session_id)
             
             # Get user data
             all_data = load_users()
             web_users = all_data.get('web_users', {})
-            email = session_data['email']
             
             if email in web_users:
                 user = _public_user(web_users[email])
@@ -796,8 +843,8 @@ def logout():
         data = request.get_json()
         session_id = data.get('session_id')
         
-        if session_id and session_id in sessions:
-            del sessions[session_id]
+        if session_id:
+            end_session(session_id)
         
         return jsonify({'success': True, 'message': 'Logged out successfully'})
         
@@ -833,20 +880,19 @@ def register_user():
         if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
             return jsonify({'success': False, 'message': 'Жарамсыз email форматы'}), 400
 
-        # Load existing users
-        all_data = load_users()
-        web_users = all_data.get('web_users', {})
-
         # Check if user already exists
-        if email in web_users:
+        if email in load_users().get('web_users', {}):
             return jsonify({'success': False, 'message': 'Бұл email тіркелген / Email уже зарегистрирован'}), 400
 
+        # Hash outside the store lock: it is the slow part of registering
+        password_hash = generate_password_hash(password)
+
         # Create new user
         user_data = {
             'id': generate_uuid(),
             'name': name,
             'email': email,
-            'password_hash': generate_password_hash(password),
+            'password_hash': password_hash,
             'xp': 0,
             'level': 1,
             'energy': 100,
@@ -860,10 +906,12 @@ def register_user():
             'language': 'kk'
         }
 
-        # Save user
-        web_users[email] = user_data
-        all_data['web_users'] = web_users
-        save_users(all_data)
+        # Save user (checked again under the lock: a concurrent request may have taken the email)
+        with store_transaction() as all_data:
+            web_users = all_data.setdefault('web_users', {})
+            if email in web_users:
+                return jsonify({'success': False, 'message': 'Бұл email тіркелген / Email уже зарегистрирован'}), 400
+            web_users[email] = user_data
 
         return jsonify({'success': True, 'user': _public_user(user_data)})
 
@@ -872,6 +920,7 @@ def register_user():
         return jsonify({'success': False, 'message': 'Қате пайда болды / Произошла ошибка'}), 500
 
 @app.route('/api/mission/generate', methods=['POST'])
+@ai_limiter.limit_view
 def generate_mission():
     """Generate personalized mission using AI with fallback system"""
     try:
@@ -898,35 +947,46 @@ def generate_mission():
         
         context = character_context.get(character, character_context['Абылай хан'])
         
-        # Try AI generation up to 3 times
-        for attempt in range(1, 4):
-            try:
-                mission = call_ai_for_mission(player_level, previous_missions, character, context)
-                if validate_ai_response(mission):
-                    return jsonify({
-                        'success': True,
-                        'mission': mission,
-                        'attempt': attempt
-                    })
-            except Exception as e:
-                print(f"AI generation attempt {attempt} failed: {e}")
-                continue
+        with llm_metrics.track('generate_mission', 'gpt-4o-mini') as call:
+            # Try AI generation up to 3 times
+            failure_reason = None
+            for attempt in range(1, 4):
+                if attempt > 1:
+                    call.retry()
+                try:
+                    mission = call_ai_for_mission(player_level, previous_missions, character, context, call=call)
+                    mission, errors, repairs = GAME_MISSION_SCHEMA.validate_and_repair(mission)
+                    call.repaired(repairs)
+                    if errors:
+                        failure_reason = 'invalid_response'
+                    elif _claim_generated('game_mission', mission['text'])[1] is not None:
+                        failure_reason = 'duplicate'     # re-rolled by the next attempt
+                    else:
+                        return jsonify({
+                            'success': True,
+                            'mission': mission,
+                            'attempt': attempt
+                        })
+                except Exception as e:
+                    if isinstance(e, SchemaViolation):
+                        failure_reason = f'schema:{e.field}'
+                    elif isinstance(e, json.JSONDecodeError):
+                        failure_reason = 'invalid_json'
+                    else:
+                        failure_reason = 'api_error'
+                    print(f"AI generation attempt {attempt} failed: {e}")
+                    continue
+            call.fallback(failure_reason)
         
         # Fallback content if all attempts fail
-        fallback_mission = get_fallback_mission(character)
-        return jsonify({
-            'success': True,
-            'mission': fallback_mission,
-            'fallback': True
-        })
+        return content_packs.fallback_response(request, 'game_mission', character)
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
-def call_ai_for_mission(player_level, previous_missions, character, context):
+def call_ai_for_mission(player_level, previous_missions, character, context, call=None):
     """Call AI to generate mission content"""
-    import openai
-    client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    client = _openai_client(os.getenv('OPENAI_API_KEY'))
     
     # Adjust complexity based on player level
     complexity_level = "простой" if player_level <= 2 else "сложный" if player_level <= 4 else "экспертный"
@@ -960,53 +1020,16 @@ def call_ai_for_mission(player_level, previous_missions, character, context):
         max_tokens=500,
         temperature=0.7
     )
+    if call is not None:
+        call.record_usage(response)
     
-    import json
-    mission_data = json.loads(response.choices[0].message.content.strip())
+    # Replies without response_format often come wrapped in markdown fences
+    mission_data = parse_json_text(response.choices[0].message.content,
+                                   fields=GAME_MISSION_SCHEMA.field_types, required=())
     return mission_data
 
-def validate_ai_response(response):
-    """Validate AI generated response"""
-    try:
-        return (
-            isinstance(response, dict) and
-            'text' in response and
-            'options' in response and
-            'correctIndex' in response and
-            isinstance(response['options'], list) and
-            len(response['options']) >= 3 and
-            0 <= response['correctIndex'] < len(response['options']) and
-            len(response['text']) > 10
-        )
-    except:
-        return False
-
-def get_fallback_mission(character):
-    """Get fallback mission when AI fails"""
-    fallback_missions = {
-        'Абылай хан': {
-            'text': 'Джунгарские войска приближаются к границам. Какое решение примете?',
-            'options': ['Собрать войско', 'Начать переговоры', 'Обратиться за помощью'],
-            'correctIndex': 1,
-            'explanation': 'Дипломатия была ключевой стратегией Абылай хана'
-        },
-        'Абай': {
-            'text': 'Молодые поэты просят научить их мастерству. Ваш ответ?',
-            'options': ['Отказаться', 'Принять учеников', 'Организовать школу'],
-            'correctIndex': 2,
-            'explanation': 'Абай был известен своей просветительской деятельностью'
-        },
-        'Айтеке би': {
-            'text': 'Две стороны спорят за землю. Как вы рассудите?',
-            'options': ['Отдать сильному', 'Разделить поровну', 'Найти компромисс'],
-            'correctIndex': 2,
-            'explanation': 'Справедливость была главным принципом биев'
-        }
-    }
-    
-    return fallback_missions.get(character, fallback_missions['Абылай хан'])
-
 @app.route('/api/content/generate-openai', methods=['POST'])
+@ai_limiter.limit_view
 def generate_content_openai():
     """Generate mission content using OpenAI GPT-4o-mini"""
     try:
@@ -1028,8 +1051,7 @@ def generate_content_openai():
             }), 400
         
         try:
-            import openai
-            client = openai.OpenAI(api_key=openai_api_key)
+            client = _openai_client(openai_api_key)
             
             # Determine content complexity based on level
             level_descriptions = {
@@ -1064,29 +1086,52 @@ def generate_content_openai():
             }}
             """
             
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Ты - эксперт по казахской истории и создатель образовательных материалов. Отвечай только в формате JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.7
-            )
-            
-            content_text = response.choices[0].message.content.strip()
-            
-            # Parse JSON response
-            try:
-                content = json.loads(content_text)
-            except json.JSONDecodeError:
-                # If JSON parsing fails, try to extract JSON from text
-                import re
-                json_match = re.search(r'\{.*\}', content_text, re.DOTALL)
-                if json_match:
-                    content = json.loads(json_match.group())
+            with llm_metrics.track('generate_content_openai', 'gpt-4o-mini') as call:
+                # A text that nearly repeats known missions is re-rolled once (recorded as a retry)
+                for attempt in range(2):
+                    if attempt:
+                        call.retry()
+                        prompt += "\nНе повторяй известные тексты: раскрой тему через другие факты и события."
+                    # Fences and trailing commas are repaired while streaming;
+                    # a wrongly typed field aborts the completion immediately
+                    parser = MISSION_SCHEMA.parser()
+                    try:
+                        content = stream_json_completion(
+                            client, parser, call=call,
+                            model="gpt-4o-mini",
+                            messages=[
+                                {"role": "system", "content": "Ты - эксперт по казахской истории и создатель образовательных материалов. Отвечай только в формате JSON."},
+                                {"role": "user", "content": prompt}
+                            ],
+                            max_tokens=2000,
+                            temperature=0.7
+                        )
+                    except SchemaViolation as e:
+                        call.fallback(f'schema:{e.field}')
+                        raise
+                    except json.JSONDecodeError:
+                        call.fallback('invalid_json')
+                        raise ValueError("Could not parse JSON response")
+
+                    content, errors, repairs = MISSION_SCHEMA.validate_and_repair(content)
+                    call.repaired(repairs)
+                    if errors:
+                        call.fallback('schema:invalid')
+                        return jsonify({
+                            'success': False,
+                            'message': 'Generated content failed validation',
+                            'errors': errors
+                        }), 502
+
+                    duplicate = _claim_generated_mission(content)
+                    if duplicate is None:
+                        break
                 else:
-                    raise ValueError("Could not parse JSON response")
+                    call.fallback('duplicate')
+                    return jsonify({
+                        'success': False,
+                        'message': f'Generated content duplicates existing content ({duplicate[0]})'
+                    }), 502
             
             return jsonify({
                 'success': True,
@@ -1119,7 +1164,6 @@ def generate_learning_content():
 
         payload = request.get_json() or {}
         topic = (payload.get('topic') or '').strip()
-        source_urls = payload.get('source_urls')
         level = int(payload.get('level', 1))
 
         if not topic and level == 1:
@@ -1136,17 +1180,8 @@ def generate_learning_content():
         if level < 1 or level > 6:
             return jsonify({'success': False, 'message': 'Invalid level'}), 400
 
-        content = _generate_learning_content_kz(topic, source_urls=source_urls, level=level)
-        
-        # Check if content contains error
-        if 'error' in content:
-            return jsonify({
-                'success': False, 
-                'message': content.get('message', 'AI service temporarily unavailable'),
-                'error': content.get('error')
-            }), 503
-            
-        return jsonify({'success': True, 'content': content})
+        # Catalog content, served pre-encoded (see content_packs)
+        return content_packs.fallback_response(request, 'learning_content', topic, level=level)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -1246,58 +1281,6 @@ Requirements:
 4. Clear consequences
 5. Adapted to difficulty level"""
 
-def _get_fallback_scenario(character, scenario_number, language):
-    """Return a fallback scenario when AI generation fails"""
-
-    def t(kz, ru):
-        """Helper for language selection"""
-        return kz if language == 'kk' else ru
-
-    fallbacks = {
-        'Абылай хан': {
-            'text': t('Жоңғар сарбаздары қазақ жерінің шегіне жақындады. Ата-баба қорғау үшін не істеу керек?',
-                     'Джунгарские войска приблизились к границам. Как защитить земли предков?'),
-            'options': [
-                {'id': 'A', 'text': t('Тез атақ жасау', 'Немедленно атаковать'), 'isCorrect': False},
-                {'id': 'B', 'text': t('Үш жүздің барлығын біліктестіру', 'Объединить три жуза'), 'isCorrect': True},
-                {'id': 'C', 'text': t('Түгелтеп іле шығу', 'Отступить'), 'isCorrect': False},
-                {'id': 'D', 'text': t('Орыстарға көмек сұрау', 'Попросить помощи у русских'), 'isCorrect': False}
-            ],
-            'correctAnswer': 'B',
-            'wrongConsequence': t('Айдап күрес жеңіліске ұласты', 'Спешная атака привела к поражению'),
-            'correctConsequence': t('Үш жүзді біріктіре отырып, сіз құрды құрдыңыз', 'Объединив три жуза, вы создали мощное войско')
-        },
-        'Абай': {
-            'text': t('Жас балалар сөз сөйлеу әнерін үйренгісі келеді. Аларға не үйретесіз?',
-                     'Молодые люди хотят научиться красивой речи. Как их обучить?'),
-            'options': [
-                {'id': 'A', 'text': t('Ескі өлеңдерді оқы', 'Читать старые стихи'), 'isCorrect': False},
-                {'id': 'B', 'text': t('Өздік өлең жазуды үйрет', 'Учить писать собственные стихи'), 'isCorrect': True},
-                {'id': 'C', 'text': t('Басқа іс істеуге ықылас бер', 'Позволить заняться другим'), 'isCorrect': False},
-                {'id': 'D', 'text': t('Шетел әдебиетін оқы', 'Читать иностранную литературу'), 'isCorrect': False}
-            ],
-            'correctAnswer': 'B',
-            'wrongConsequence': t('Балалардың шығармашылығы тоқталады', 'Творчество молодежи не развивается'),
-            'correctConsequence': t('Балалар шығармашыл болды', 'Молодежь начинает творить')
-        },
-        'Айтеке би': {
-            'text': t('Екі саудагер өнімділік туралы дауласып жатыр. Сіз әділ сот ете аласыз ба?',
-                     'Два купца спорят о товаре. Как разрешить этот спор справедливо?'),
-            'options': [
-                {'id': 'A', 'text': t('Күшілі тарапқа құқық бер', 'Дать право более сильному'), 'isCorrect': False},
-                {'id': 'B', 'text': t('Екеуінің де сөзін тыңда', 'Выслушать обе стороны'), 'isCorrect': True},
-                {'id': 'C', 'text': t('Ешкімге байланыстырма', 'Не разбираться в спорах'), 'isCorrect': False},
-                {'id': 'D', 'text': t('Ысқақ төңнег өлеңін', 'Призвать свидетелей'), 'isCorrect': False}
-            ],
-            'correctAnswer': 'B',
-            'wrongConsequence': t('Халық сіздің әділіңіз күмәнеді', 'Народ теряет доверие'),
-            'correctConsequence': t('Халық мойындату жасады', 'Народ уважает вашу мудрость')
-        }
-    }
-
-    fallback = fallbacks.get(character, fallbacks['Абылай хан'])
-    return fallback
-
 @app.route('/api/mission/generate-scenario', methods=['POST'])
 def generate_scenario():
     """
@@ -1327,73 +1310,84 @@ def generate_scenario():
             prompt = _build_scenario_prompt(character, level, scenario_number, language)
 
         # Call OpenAI API
-        try:
-            if not OPENAI_AVAILABLE:
-                return jsonify({
-                    'success': False,
-                    'message': 'OpenAI module not available'
-                }), 503
-
-            openai_api_key = OPENAI_API_KEY
-            if not openai_api_key or openai_api_key == 'your_openai_api_key_here':
-                return jsonify({
-                    'success': False,
-                    'message': 'OpenAI API key not configured'
-                }), 503
-
-            client = OpenAI(api_key=openai_api_key)
-
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Ты - эксперт по казахской истории и создатель интерактивных образовательных игр. Отвечай ТОЛЬКО валидным JSON, без markdown или пояснений."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=2000,
-                response_format={"type": "json_object"}
-            )
-
-            content_text = response.choices[0].message.content.strip()
-
-            # Parse JSON response
+        with llm_metrics.track('generate_scenario', 'gpt-4o-mini') as call, ai_limiter.slot() as acquired:
             try:
-                scenario = json.loads(content_text)
+                if not acquired:
+                    # Every AI slot is busy: answer from the catalog instead of queuing
+                    call.skipped('busy')
+                    return _fallback_scenario_response(character, scenario_number, language)
 
-                # Validate required fields
-                required_fields = ['scenario', 'text', 'options', 'correctAnswer', 'wrongConsequence', 'correctConsequence']
-                for field in required_fields:
-                    if field not in scenario:
-                        # Return fallback
-                        return jsonify({
-                            'success': True,
-                            'scenario': _get_fallback_scenario(character, scenario_number, language),
-                            'fallback': True
-                        })
-
-                return jsonify({'success': True, 'scenario': scenario})
+                if not OPENAI_AVAILABLE:
+                    call.skipped('openai_unavailable')
+                    return jsonify({
+                        'success': False,
+                        'message': 'OpenAI module not available'
+                    }), 503
 
-            except json.JSONDecodeError as e:
-                print(f"[SCENARIO] JSON parsing error: {e}")
-                return jsonify({
-                    'success': True,
-                    'scenario': _get_fallback_scenario(character, scenario_number, language),
-                    'fallback': True
-                })
+                openai_api_key = OPENAI_API_KEY
+                if not openai_api_key or openai_api_key == 'your_openai_api_key_here':
+                    call.skipped('missing_api_key')
+                    return jsonify({
+                        'success': False,
+                        'message': 'OpenAI API key not configured'
+                    }), 503
+
+                client = _openai_client(openai_api_key)
+
+                # Required fields are validated while the completion streams. A scenario that
+                # nearly repeats one generated earlier is re-rolled once (recorded as a retry).
+                try:
+                    for attempt in range(2):
+                        if attempt:
+                            call.retry()
+                            prompt += "\nНе повторяй уже созданные сценарии: выбери другую ситуацию."
+                        parser = SCENARIO_SCHEMA.parser()
+                        scenario = stream_json_completion(
+                            client, parser, call=call,
+                            model="gpt-4o-mini",
+                            messages=[
+                                {
+                                    "role": "system",
+                                    "content": "Ты - эксперт по казахской истории и создатель интерактивных образовательных игр. Отвечай ТОЛЬКО валидным JSON, без markdown или пояснений."
+                                },
+                                {
+                                    "role": "user",
+                                    "content": prompt
+                                }
+                            ],
+                            temperature=0.7,
+                            max_tokens=2000,
+                            response_format={"type": "json_object"}
+                        )
+
+                        scenario, errors, repairs = SCENARIO_SCHEMA.validate_and_repair(scenario)
+                        call.repaired(repairs)
+                        if errors:
+                            print(f"[SCENARIO] Invalid scenario after repair: {errors}")
+                            call.fallback('schema:invalid')
+                            return _fallback_scenario_response(character, scenario_number, language)
+
+                        if _claim_generated('scenario', scenario['text'])[1] is None:
+                            return jsonify({'success': True, 'scenario': scenario})
+
+                    call.fallback('duplicate')
+                    return _fallback_scenario_response(character, scenario_number, language)
+
+                except SchemaViolation as e:
+                    # Return fallback
+                    print(f"[SCENARIO] Rejected model output early: {e}")
+                    call.fallback(f'schema:{e.field}')
+                    return _fallback_scenario_response(character, scenario_number, language)
+
+                except json.JSONDecodeError as e:
+                    print(f"[SCENARIO] JSON parsing error: {e}")
+                    call.fallback('invalid_json')
+                    return _fallback_scenario_response(character, scenario_number, language)
 
-        except Exception as e:
-            print(f"[SCENARIO] OpenAI error: {str(e)}")
-            return jsonify({
-                'success': True,
-                'scenario': _get_fallback_scenario(character, scenario_number, language),
-                'fallback': True
-            })
+            except Exception as e:
+                print(f"[SCENARIO] OpenAI error: {str(e)}")
+                call.fallback('api_error')
+                return _fallback_scenario_response(character, scenario_number, language)
 
     except Exception as e:
         print(f"[SCENARIO] Generation error: {str(e)}")
@@ -1427,8 +1421,17 @@ def generate_personalized_mission():
         if user_profile['level'] < 1 or user_profile['level'] > 6:
             return jsonify({'success': False, 'message': 'Invalid level'}), 400
 
-        # Try OpenAI only
-        success, content, error = _openai_generate_personal_mission(user_profile)
+        # Serve from the cohort pool when possible, otherwise generate and seed it
+        content = personal_mission_cache.get(user_profile)
+        if content is not None:
+            return jsonify({'success': True, 'content': content})
+
+        with ai_limiter.slot() as acquired:
+            if not acquired:
+                return ai_limiter.busy_response()
+            success, content, error = _generate_unique_personal_mission(user_profile)
+        if success:
+            personal_mission_cache.put(user_profile, content)
 
         if not success:
             # Use fallback missions
@@ -1486,19 +1489,10 @@ def create_clan():
         email = data.get('email')
         clan_name = data.get('name')
         
-        all_data = load_users()
-        if clan_name in all_data['clans']:
-            return jsonify({'success': False, 'message': 'Клан с таким именем уже существует'}), 400
-            
-        all_data['clans'][clan_name] = {
-            'leader': email,
-            'members': [email],
-            'xp': 0
-        }
-        if email in all_data['web_users']:
-            all_data['web_users'][email]['clan'] = clan_name
-            
-        save_users(all_data)
+        with store_transaction() as all_data:
+            if clan_name in all_data['clans']:
+                return jsonify({'success': False, 'message': 'Клан с таким именем уже существует'}), 400
+            clan_xp.create(all_data['clans'], clan_name, email, all_data['web_users'].get(email), clan_ranking)
         return jsonify({'success': True, 'message': f'Клан {clan_name} создан'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -1510,24 +1504,93 @@ def join_clan():
         email = data.get('email')
         clan_name = data.get('name')
         
-        all_data = load_users()
-        if clan_name not in all_data['clans']:
-            return jsonify({'success': False, 'message': 'Клан не найден'}), 404
-            
-        if email not in all_data['clans'][clan_name]['members']:
-            all_data['clans'][clan_name]['members'].append(email)
-            if email in all_data['web_users']:
-                all_data['web_users'][email]['clan'] = clan_name
-                
-        save_users(all_data)
+        with store_transaction() as all_data:
+            if clan_name not in all_data['clans']:
+                return jsonify({'success': False, 'message': 'Клан не найден'}), 404
+            clan_xp.join(all_data['clans'], email, all_data['web_users'].get(email), clan_name, clan_ranking)
         return jsonify({'success': True, 'message': f'Вы вступили в клан {clan_name}'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/clans/leave', methods=['POST'])
+def leave_clan():
+    try:
+        data = request.get_json()
+        email = data.get('email')
+
+        with store_transaction() as all_data:
+            clan_name = clan_xp.leave(all_data['clans'], email, all_data['web_users'].get(email), clan_ranking)
+        if clan_name is None:
+            return jsonify({'success': False, 'message': 'Вы не состоите в клане'}), 404
+        return jsonify({'success': True, 'message': f'Вы покинули клан {clan_name}'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+CLAN_FIELDS = ('name', 'leader', 'member_count', 'xp')
+LEADERBOARD_FIELDS = ('name', 'total_xp', 'member_count', 'leader')
+MEMBER_FIELDS = ('id', 'email', 'name', 'xp', 'avatarUrl')
+
+def _page_response(key, rows, sort_key, page, list_name):
+    """Cached, ETag-versioned JSON page of rows() (list_name: rows key in the payload)"""
+    limit, after, fields = page
+
+    def build():
+        items, next_cursor = paginate(rows(), sort_key, limit, after, fields)
+        return {'success': True, list_name: items, 'next': next_cursor}
+
+    return clan_cache.respond(f'{key}?{request.query_string.decode("latin-1")}', build)
+
 @app.route('/api/clans/list', methods=['GET'])
 def list_clans():
-    all_data = load_users()
-    return jsonify({'success': True, 'clans': all_data.get('clans', {})})
+    """Clans by name: ?limit=20&after=<next>&fields=name,member_count (members: /api/clans/members)"""
+    try:
+        page = parse_page(request.args, CLAN_FIELDS, CLAN_FIELDS)
+        return _page_response('clans/list', _clan_rows, lambda row: (row['name'],), page, 'clans')
+    except PageError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+def _clan_rows():
+    for clan_name, clan_data in load_users().get('clans', {}).items():
+        yield {
+            'name': clan_name,
+            'leader': clan_data.get('leader', ''),
+            'member_count': len(clan_data.get('members', [])),
+            'xp': clan_data.get('xp', 0)
+        }
+
+@app.route('/api/clans/members', methods=['GET'])
+def list_clan_members():
+    """
+    Members of one clan by XP: ?name=<clan>&limit=20&after=<next>&fields=id,name,xp
+    `email` is only sent to a logged-in user (X-Session-Id header) who asks for it.
+    """
+    try:
+        clan_name = request.args.get('name', '')
+        page = parse_page(request.args, MEMBER_FIELDS, ('id', 'name', 'xp'), default_limit=50)
+        with_email = 'email' in page[2]
+        if with_email and not is_session_valid(request.headers.get('X-Session-Id')):
+            return jsonify({'success': False, 'message': 'Login required for member emails'}), 401
+
+        def rows():
+            all_data = load_users()
+            clan = all_data.get('clans', {}).get(clan_name)
+            if clan is None:
+                raise KeyError(clan_name)
+            web_users = all_data.get('web_users', {})
+            for member_email in clan.get('members', []):
+                user = web_users.get(member_email, {})
+                yield {'id': user.get('id', ''), 'email': member_email, 'name': user.get('name', 'Unknown'),
+                       'xp': user.get('xp', 0), 'avatarUrl': user.get('avatarUrl')}
+
+        # The cursor encodes the sort key, so it is (-xp, user id), never the email
+        response = _page_response('clans/members', rows, lambda row: (-row['xp'], row['id']), page, 'members')
+        if with_email:
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except PageError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except KeyError:
+        return jsonify({'success': False, 'message': 'Клан не найден'}), 404
 
 @app.route('/api/clans/activity', methods=['POST'])
 def track_clan_activity():
@@ -1538,32 +1601,30 @@ def track_clan_activity():
         mission_completed = data.get('mission_completed', False)
         mission_skipped = data.get('mission_skipped', False)
         
-        all_data = load_users()
+        with store_transaction() as all_data:
+            # Initialize daily activity tracking if not exists
+            if 'daily_activity' not in all_data:
+                all_data['daily_activity'] = {}
         
-        # Initialize daily activity tracking if not exists
-        if 'daily_activity' not in all_data:
-            all_data['daily_activity'] = {}
+            today = datetime.now().strftime('%Y-%m-%d')
         
-        today = datetime.now().strftime('%Y-%m-%d')
+            # Track user activity for today
+            if today not in all_data['daily_activity']:
+                all_data['daily_activity'][today] = {}
         
-        # Track user activity for today
-        if today not in all_data['daily_activity']:
-            all_data['daily_activity'][today] = {}
+            if email not in all_data['daily_activity'][today]:
+                all_data['daily_activity'][today][email] = {
+                    'mission_completed': False,
+                    'mission_skipped': False,
+                    'timestamp': datetime.now().isoformat()
+                }
         
-        if email not in all_data['daily_activity'][today]:
-            all_data['daily_activity'][today][email] = {
-                'mission_completed': False,
-                'mission_skipped': False,
-                'timestamp': datetime.now().isoformat()
-            }
+            # Update activity
+            if mission_completed:
+                all_data['daily_activity'][today][email]['mission_completed'] = True
+            elif mission_skipped:
+                all_data['daily_activity'][today][email]['mission_skipped'] = True
         
-        # Update activity
-        if mission_completed:
-            all_data['daily_activity'][today][email]['mission_completed'] = True
-        elif mission_skipped:
-            all_data['daily_activity'][today][email]['mission_skipped'] = True
-        
-        save_users(all_data)
         return jsonify({'success': True})
         
     except Exception as e:
@@ -1624,42 +1685,76 @@ def get_clan_members_status():
 
 @app.route('/api/clans/leaderboard', methods=['GET'])
 def get_clan_leaderboard():
-    """Get updated clan leaderboard after mission completion"""
+    """Clans by total member XP: ?limit=20&after=<next>&fields=name,total_xp"""
     try:
-        all_data = load_users()
-        clans = all_data.get('clans', {})
-        web_users = all_data.get('web_users', {})
-        
-        # Calculate total XP for each clan
-        clan_leaderboard = []
-        for clan_name, clan_data in clans.items():
-            total_xp = 0
-            member_count = 0
-            
-            for member_email in clan_data['members']:
-                if member_email in web_users:
-                    total_xp += web_users[member_email].get('xp', 0)
-                    member_count += 1
-            
-            clan_leaderboard.append({
-                'name': clan_name,
-                'total_xp': total_xp,
-                'member_count': member_count,
-                'leader': clan_data.get('leader', ''),
-                'members': clan_data['members']
-            })
-        
-        # Sort by total XP (descending)
-        clan_leaderboard.sort(key=lambda x: x['total_xp'], reverse=True)
-        
-        return jsonify({
-            'success': True,
-            'leaderboard': clan_leaderboard
-        })
-        
+        limit, after, fields = parse_page(request.args, LEADERBOARD_FIELDS, LEADERBOARD_FIELDS)
+
+        def build():
+            items, next_cursor = _current_clan_ranking().page(limit, after, fields)
+            return {'success': True, 'leaderboard': items, 'next': next_cursor}
+
+        return clan_cache.respond(f'clans/leaderboard?{request.query_string.decode("latin-1")}', build)
+    except PageError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def _current_clan_ranking():
+    # Totals are kept up to date on every XP change, so no member records are read here.
+    # A new version here means another process (the bot, another worker) wrote the store
+    version = file_version(data_file)
+    if clan_ranking.version != version:
+        clan_ranking.reset(load_users().get('clans', {}), version)
+    return clan_ranking
+
+@app.route('/api/metrics/llm', methods=['GET'])
+def llm_usage_metrics():
+    """LLM token, latency, retry, fallback and cache-hit aggregates per endpoint and model"""
+    if not _metrics_authorized():
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    return jsonify({'success': True, 'metrics': llm_metrics.snapshot(), 'concurrency': ai_limiter.stats()})
+
+@app.route('/api/content/search', methods=['GET'])
+def search_content():
+    """BM25 search over missions and educational content: ?q=...&lang=kz|ru&source=...&limit=10"""
+    limited, retry_after = _rate_limit('content_search', limit=120, window_seconds=60)
+    if limited:
+        return jsonify({'success': False, 'message': 'Too many requests. Try again later.'}), 429, {
+            'Retry-After': str(retry_after)
+        }
+
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'success': False, 'message': 'q required'}), 400
+    if len(query) > 200:
+        return jsonify({'success': False, 'message': 'Query too long'}), 400
+
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid limit'}), 400
+
+    results = get_content_search_index().search(
+        query, limit=limit,
+        lang=request.args.get('lang') or None,
+        source=request.args.get('source') or None
+    )
+    return jsonify({'success': True, 'query': query, 'results': results})
+
+@app.route('/api/content/pack', methods=['GET'])
+def content_pack():
+    """Pre-built bundle of fallback content: ?lang=kk|ru&level=1-6&character=..."""
+    level = request.args.get('level')
+    if level:
+        if not level.isdigit() or not 1 <= int(level) <= 6:
+            return jsonify({'success': False, 'message': 'Invalid level'}), 400
+    return content_packs.response(
+        request,
+        language=request.args.get('lang'),
+        level=level,
+        character=request.args.get('character')
+    )
+
 @app.route('/api/contact', methods=['POST'])
 def handle_contact():
     """Handle contact form submissions and send email"""
@@ -1735,12 +1830,13 @@ def challenge_duel():
 
 @app.route('/<path:path>')
 def static_files(path):
-    return send_from_directory('.', path)
+    return _send_static(path)
 
 if __name__ == '__main__':
     host = os.getenv('HOST', '0.0.0.0')
     port = int(os.getenv('PORT', 8000))
     debug = os.getenv('FLASK_ENV', 'development') == 'development'
 
+    clan_xp.reconcile_file(data_file)
     print(f"[SERVER] Flask running on http://{host}:{port}")
     app.run(host=host, port=port, debug=debug)
@@ -9,14 +9,17 @@ import json
 import hashlib
 import uuid
 import re
-from html.parser import HTMLParser
-from urllib.parse import urlparse
 import requests
 from datetime import datetime
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 import threading
+from llm_json import parse_json_text
+from content_catalog import ContentCatalog
+from source_fetcher import SourceFetcher
+from html_extract import extract_text
+from source_index import SourceIndex, format_materials, is_allowed_url
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
@@ -44,74 +47,45 @@ app = Flask(__name__)
 
 os.makedirs(uploads_dir, exist_ok=True)
 
-class _HTMLTextExtractor(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self._chunks = []
-        self._skip_depth = 0
+def _is_allowed_source_url(url: str) -> bool:
+    return is_allowed_url(url)
 
-    def handle_starttag(self, tag, attrs):
-        if tag in {'script', 'style', 'noscript'}:
-            self._skip_depth += 1
 
-    def handle_endtag(self, tag):
-        if tag in {'script', 'style', 'noscript'} and self._skip_depth > 0:
-            self._skip_depth -= 1
+def _extract_page_text(html_chunks):
+    # Only the first 4000 characters are used in the prompt, so stop there
+    return extract_text(html_chunks, max_chars=4000)
 
-    def handle_data(self, data):
-        if self._skip_depth > 0:
-            return
-        text = (data or '').strip()
-        if text:
-            self._chunks.append(text)
 
-    def get_text(self):
-        return ' '.join(self._chunks)
+_source_fetcher = SourceFetcher(
+    _extract_page_text,
+    cache_dir=os.getenv('SOURCE_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.source_cache')),
+    user_agent='BATYR-BOL/1.0'
+)
 
 
-def _is_allowed_source_url(url: str) -> bool:
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in {'http', 'https'}:
-            return False
-        host = (parsed.hostname or '').lower()
-        allowed_domains = {
-            'e-history.kz',
-            'www.e-history.kz',
-            'gov.kz',
-            'www.gov.kz',
-            'akorda.kz',
-            'www.akorda.kz',
-            'assembly.kz',
-            'www.assembly.kz',
-            'nationalmuseum.kz',
-            'www.nationalmuseum.kz',
-        }
-        return host in allowed_domains
-    except Exception:
-        return False
+# Pre-crawled passages (`python source_index.py crawl`); None until the index is built
+_source_index = SourceIndex.load(os.getenv('SOURCE_INDEX_PATH', os.path.join(os.path.dirname(__file__), 'source_index.json.gz')))
+
+
+def _retrieve_source_materials(topic, urls, use_index=True):
+    """Prompt materials and their URLs: indexed passages first, live pages otherwise"""
+    if use_index and _source_index is not None:
+        passages = _source_index.retrieve(topic)
+        if passages:
+            return format_materials(passages), list(dict.fromkeys(p['url'] for p in passages))
+    source_texts, used_urls = _fetch_official_texts(urls)
+    return '\n\n'.join([t[:4000] for t in source_texts]), used_urls
 
 
 def _fetch_official_texts(urls):
     texts = []
     used_urls = []
-    for url in urls:
-        if not _is_allowed_source_url(url):
-            continue
-        try:
-            r = requests.get(url, timeout=15, headers={'User-Agent': 'BATYR-BOL/1.0'})
-            if r.status_code != 200:
-                continue
-            parser = _HTMLTextExtractor()
-            parser.feed(r.text)
-            text = parser.get_text()
-            text = re.sub(r'\s+', ' ', text).strip()
-            if len(text) < 400:
-                continue
-            texts.append(text)
-            used_urls.append(url)
-        except Exception:
+    allowed = [url for url in urls if _is_allowed_source_url(url)]
+    for result in _source_fetcher.fetch_many(allowed):
+        if len(result.text) < 400:
             continue
+        texts.append(result.text)
+        used_urls.append(result.url)
     return texts, used_urls
 
 
@@ -157,37 +131,16 @@ def _gemini_generate(prompt: str):
     return data['candidates'][0]['content']['parts'][0]['text']
 
 
-def _load_fallback_content():
-    """Load pre-made missions from fallback_content.json"""
-    fallback_file = os.path.join(os.path.dirname(__file__), 'fallback_content.json')
-    if os.path.exists(fallback_file):
-        with open(fallback_file, 'r', encoding='utf-8') as f:
-            return json.load(f).get('missions', [])
-    return []
+# Pre-made missions from fallback_content.json, parsed once and indexed
+_content_catalog = ContentCatalog(os.path.join(os.path.dirname(__file__), 'fallback_content.json'))
 
 
-def _get_fallback_mission(topic: str = None, level: int = None):
+def _get_fallback_mission(topic: str = None, level: int = None, user_key=None):
     """Get a fallback mission, optionally filtered by topic and level"""
-    import random
-    missions = _load_fallback_content()
-    if not missions:
+    mission = _content_catalog.pick_mission(topic=topic, level=level, user_key=user_key)
+    if not mission:
         return None
     
-    # Filter by level if specified
-    if level:
-        level_missions = [m for m in missions if m.get('level', 2) == level]
-        if level_missions:
-            missions = level_missions
-    
-    if topic:
-        matching = [m for m in missions if topic.lower() in m.get('topic', '').lower()]
-        if matching:
-            mission = random.choice(matching)
-        else:
-            mission = random.choice(missions)
-    else:
-        mission = random.choice(missions)
-    
     # Generate image URL from prompt
     image_url = _generate_image_url(mission.get('image_prompt', ''))
     
@@ -203,9 +156,9 @@ def _get_fallback_mission(topic: str = None, level: int = None):
     }
 
 
-def _generate_learning_content_kz(topic: str, source_urls=None):
+def _generate_learning_content_kz(topic: str, source_urls=None, user_key=None):
     # First try to use fallback content (always works, no API needed)
-    fallback = _get_fallback_mission(topic)
+    fallback = _get_fallback_mission(topic, user_key=user_key)
     if fallback:
         return fallback
     
@@ -227,13 +180,14 @@ def _generate_learning_content_kz(topic: str, source_urls=None):
     }
 
     urls = curated_sources.get(topic, ['https://e-history.kz/kz'])
-    if isinstance(source_urls, list) and source_urls:
+    explicit_sources = isinstance(source_urls, list) and bool(source_urls)
+    if explicit_sources:
         urls = [u for u in source_urls if isinstance(u, str)]
 
-    source_texts, used_urls = _fetch_official_texts(urls)
+    # Explicitly requested pages are read live; otherwise the local index supplies the passages
+    materials, used_urls = _retrieve_source_materials(topic, urls, use_index=not explicit_sources)
     
-    if source_texts:
-        materials = '\n\n'.join([t[:4000] for t in source_texts])
+    if materials:
         prompt = (
             'Сен Қазақстан тарихы және мәдениеті бойынша оқу контентін жасайтын көмекшісің.\n'
             'Тек төмендегі ресми дереккөздерден берілген материалға сүйен.\n'
@@ -258,10 +212,10 @@ def _generate_learning_content_kz(topic: str, source_urls=None):
         )
 
     raw = _gemini_generate(prompt)
-    m = re.search(r'\{[\s\S]*\}', raw)
-    if not m:
+    try:
+        result = parse_json_text(raw)
+    except json.JSONDecodeError:
         raise RuntimeError('Gemini response parse error')
-    result = json.loads(m.group(0))
     text_kz = result.get('text_kz')
     questions_kz = result.get('questions_kz')
     if not isinstance(text_kz, str) or not text_kz.strip():
@@ -482,7 +436,9 @@ def generate_learning_content():
         if not topic:
             return jsonify({'success': False, 'message': 'Тақырып міндетті / Topic required'}), 400
 
-        return jsonify({'success': True, 'content': _generate_learning_content_kz(topic, source_urls=source_urls)})
+        user_key = payload.get('email') or request.remote_addr
+        return jsonify({'success': True, 'content': _generate_learning_content_kz(topic, source_urls=source_urls,
+                                                                                  user_key=user_key)})
     except json.JSONDecodeError:
         return jsonify({'success': False, 'message': 'Gemini JSON decode error'}), 502
     except Exception as e:
@@ -535,7 +491,7 @@ async def _bot_missions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.args:
         topic = ' '.join(context.args).strip()
 
-    result = _generate_learning_content_kz(topic)
+    result = _generate_learning_content_kz(topic, user_key=f'tg:{uid}')
     text = result.get('text_kz', '')
     questions = result.get('questions_kz', [])
 
@@ -0,0 +1,226 @@
+"""
+Fetching of official source pages (e-history.kz, akorda.kz, ...).
+
+One pooled requests.Session is shared by all fetches. Several URLs are fetched
+in parallel under an overall deadline. Responses are cached on disk: the
+extracted text plus the ETag / Last-Modified validators. A cached page is
+reused without a request while Cache-Control max-age says it is fresh, and
+revalidated with a conditional GET afterwards. If revalidation fails, the stale
+text is served instead of nothing.
+
+Bodies are streamed: `extract_text` receives an iterator of decoded text
+chunks and may stop consuming it early; at most `max_bytes` are ever read.
+
+`requests`, the session and the thread pool are created on the first fetch,
+so constructing a SourceFetcher at import time costs nothing on cold start.
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DEFAULT_USER_AGENT = 'BATYR-BOL/1.0 (+https://batyrbol.kz)'
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class FetchResult:
+    __slots__ = ('url', 'text', 'status', 'from_cache')
+
+    def __init__(self, url, text, status, from_cache=False):
+        self.url = url
+        self.text = text
+        self.status = status
+        self.from_cache = from_cache
+
+
+class SourceFetcher:
+    """
+    Args:
+        extract_text: callable(iterable of html chunks) -> plain text, applied once per downloaded page
+        cache_dir: directory for cached entries (None disables the disk cache)
+        timeout: (connect, read) seconds for a single request
+        deadline: overall seconds for fetch_many()
+        max_workers: parallel fetches
+        default_ttl: seconds a page is considered fresh when the server sends no max-age
+        max_bytes: cap on the body bytes read from one response
+    """
+
+    def __init__(self, extract_text, cache_dir='.source_cache', user_agent=DEFAULT_USER_AGENT,
+                 timeout=(3.05, 8), deadline=10.0, max_workers=4, default_ttl=6 * 3600,
+                 max_bytes=2 * 1024 * 1024):
+        self.extract_text = extract_text
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.deadline = deadline
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.user_agent = user_agent
+        self.max_workers = max_workers
+        self._session = None
+        self._executor = None
+        self._init_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError as e:
+                # Read-only deployments (serverless) run without the disk cache
+                print(f"[SOURCES] Disk cache disabled, cannot create {cache_dir}: {e}")
+                self.cache_dir = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._init_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    session.headers['User-Agent'] = self.user_agent
+                    adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._init_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='source-fetch')
+        return self._executor
+
+    # ===== DISK CACHE =====
+
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _load_entry(self, url):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry if entry.get('url') == url else None
+        except (OSError, ValueError):
+            return None
+
+    def _store_entry(self, url, entry):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(url)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            with self._write_lock:
+                os.replace(tmp, path)
+        except OSError as e:
+            print(f"[SOURCES] Could not cache {url}: {e}")
+
+    def _ttl(self, response):
+        match = _MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        if 'no-store' in response.headers.get('Cache-Control', ''):
+            return 0
+        return int(match.group(1)) if match else self.default_ttl
+
+    # ===== FETCHING =====
+
+    def _iter_text(self, response, chunk_size=16 * 1024):
+        """Decoded body chunks, stopping after max_bytes"""
+        # requests falls back to ISO-8859-1 for text/* without a charset; the sources are UTF-8
+        charset = response.encoding if 'charset=' in response.headers.get('Content-Type', '') else 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        remaining = self.max_bytes
+        for chunk in response.iter_content(chunk_size):
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            text = decoder.decode(chunk, final=remaining <= 0)
+            if text:
+                yield text
+            if remaining <= 0:
+                return
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    def fetch(self, url):
+        """Fetch one URL, using and refreshing the disk cache"""
+        entry = self._load_entry(url)
+        now = time.time()
+        if entry and now < entry.get('expires_at', 0):
+            return FetchResult(url, entry['text'], 200, from_cache=True)
+
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        from requests import RequestException
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        except RequestException as e:
+            print(f"[SOURCES] Failed to fetch {url}: {e}")
+            if entry:
+                return FetchResult(url, entry['text'], 200, from_cache=True)
+            return FetchResult(url, '', None)
+
+        with response:
+            if response.status_code == 304 and entry:
+                entry['expires_at'] = now + self._ttl(response)
+                self._store_entry(url, entry)
+                return FetchResult(url, entry['text'], 200, from_cache=True)
+
+            if response.status_code != 200:
+                if entry and response.status_code >= 500:
+                    return FetchResult(url, entry['text'], 200, from_cache=True)
+                return FetchResult(url, '', response.status_code)
+
+            try:
+                text = self.extract_text(self._iter_text(response))
+            except RequestException as e:
+                print(f"[SOURCES] Failed to read {url}: {e}")
+                if entry:
+                    return FetchResult(url, entry['text'], 200, from_cache=True)
+                return FetchResult(url, '', None)
+        self._store_entry(url, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': now,
+            'expires_at': now + self._ttl(response),
+            'text': text,
+        })
+        return FetchResult(url, text, 200)
+
+    def fetch_many(self, urls, deadline=None):
+        """
+        Fetch URLs in parallel. Returns the FetchResults (in input order) that
+        finished successfully before the deadline; slower ones are left running
+        in the background and still populate the cache.
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return []
+        futures = [self.executor.submit(self.fetch, url) for url in urls]
+        done, _ = wait(futures, timeout=self.deadline if deadline is None else deadline)
+        results = []
+        for future in futures:
+            if future in done and future.exception() is None:
+                result = future.result()
+                if result.status == 200 and result.text:
+                    results.append(result)
+        return results
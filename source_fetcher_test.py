@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the official source fetcher (source_fetcher.py) against a local HTTP server
+"""
+
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from source_fetcher import SourceFetcher
+
+PAGE = '<html><body><p>Қазақ хандығы 1465 жылы құрылды.</p></body></html>'.encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/slow':
+            time.sleep(1.5)
+        if self.path == '/missing':
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', '"v1"')
+        if self.path == '/fresh':
+            self.send_header('Cache-Control', 'max-age=600')
+        else:
+            self.send_header('Cache-Control', 'max-age=0')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server:
+    def __enter__(self):
+        _Handler.requests_seen = []
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _strip_tags(chunks):
+    html = ''.join(chunks)
+    return html.replace('<html><body><p>', '').replace('</p></body></html>', '')
+
+
+def test_conditional_get_reuses_cached_text():
+    with _Server() as server, tempfile.TemporaryDirectory() as cache:
+        fetcher = SourceFetcher(_strip_tags, cache_dir=cache)
+        first = fetcher.fetch(server.base + '/page')
+        assert first.text.startswith('Қазақ хандығы') and not first.from_cache
+
+        # A new instance (e.g. another worker) revalidates from the disk cache
+        second = SourceFetcher(_strip_tags, cache_dir=cache).fetch(server.base + '/page')
+        assert second.from_cache and second.text == first.text
+        assert _Handler.requests_seen[-1] == ('/page', '"v1"')
+
+
+def test_fresh_entries_skip_the_network():
+    with _Server() as server, tempfile.TemporaryDirectory() as cache:
+        fetcher = SourceFetcher(_strip_tags, cache_dir=cache)
+        fetcher.fetch(server.base + '/fresh')
+        assert fetcher.fetch(server.base + '/fresh').from_cache
+        assert len(_Handler.requests_seen) == 1
+
+
+def test_fetch_many_is_parallel_and_respects_deadline():
+    with _Server() as server, tempfile.TemporaryDirectory() as cache:
+        fetcher = SourceFetcher(_strip_tags, cache_dir=cache, max_workers=4)
+        urls = [server.base + p for p in ('/a', '/b', '/slow', '/missing')]
+        started = time.monotonic()
+        results = fetcher.fetch_many(urls, deadline=0.8)
+        assert time.monotonic() - started < 1.4
+        assert [r.url for r in results] == [server.base + '/a', server.base + '/b']
+
+
+def test_stale_text_served_when_source_is_down():
+    with tempfile.TemporaryDirectory() as cache:
+        with _Server() as server:
+            url = server.base + '/page'
+            SourceFetcher(_strip_tags, cache_dir=cache).fetch(url)
+        result = SourceFetcher(_strip_tags, cache_dir=cache, timeout=(0.5, 0.5)).fetch(url)
+        assert result.from_cache and result.text
+
+
+def test_body_is_streamed_into_extractor_and_capped():
+    with _Server() as server, tempfile.TemporaryDirectory() as cache:
+        seen = []
+
+        def first_chunk(chunks):
+            seen.extend(chunks)
+            return ''.join(seen)
+
+        fetcher = SourceFetcher(first_chunk, cache_dir=cache, max_bytes=20)
+        result = fetcher.fetch(server.base + '/page')
+        assert result.text == PAGE[:20].decode('utf-8', 'replace')
+
+
+def test_session_and_pool_created_on_first_fetch():
+    fetcher = SourceFetcher(_strip_tags, cache_dir=None)
+    assert fetcher._session is None and fetcher._executor is None
+    with _Server() as server:
+        assert fetcher.fetch_many([server.base + '/page'])
+    assert fetcher._session is not None and fetcher._executor is not None
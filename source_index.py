@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local retrieval index over the official sources.
+
+Offline, the allow-listed sites are crawled, page text is split into short
+overlapping passages and the passages are stored in a BM25 index on disk
+(content_search.ContentSearchIndex). At generation time only the few passages
+relevant to a topic are put into the prompt instead of whole pages.
+
+CLI:
+    python source_index.py crawl [--seed URL ...] [--max-pages 300] [--out source_index.json.gz]
+    python source_index.py search "абылай хан"
+"""
+
+import argparse
+import codecs
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from content_search import ContentSearchIndex, normalize
+from html_extract import extract_text_and_links
+
+ALLOWED_HOSTS = frozenset({
+    'e-history.kz', 'www.e-history.kz',
+    'gov.kz', 'www.gov.kz',
+    'akorda.kz', 'www.akorda.kz',
+    'assembly.kz', 'www.assembly.kz',
+    'nationalmuseum.kz', 'www.nationalmuseum.kz',
+})
+DEFAULT_SEEDS = ('https://e-history.kz/kz', 'https://www.akorda.kz', 'https://www.gov.kz')
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'source_index.json.gz')
+USER_AGENT = 'BATYR-BOL-indexer/1.0 (+https://batyrbol.kz)'
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+')
+_SKIP_EXTENSIONS = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.zip', '.rar', '.jpg', '.jpeg', '.png',
+                    '.gif', '.webp', '.svg', '.mp3', '.mp4', '.avi', '.css', '.js', '.xml')
+
+
+def is_allowed_url(url):
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    return parsed.scheme in ('http', 'https') and (parsed.hostname or '').lower() in ALLOWED_HOSTS
+
+
+def normalize_link(base_url, href):
+    """Absolute crawlable URL for a link, or None"""
+    url, _ = urldefrag(urljoin(base_url, href.strip()))
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or parsed.path.lower().endswith(_SKIP_EXTENSIONS):
+        return None
+    return url
+
+
+def chunk_passages(text, size=500, overlap=1):
+    """
+    Split text into passages of about `size` characters on sentence
+    boundaries; consecutive passages share `overlap` sentences.
+    """
+    sentences = []
+    for sentence in _SENTENCE_RE.split(text or ''):
+        sentence = sentence.strip()
+        while len(sentence) > size * 2:
+            cut = sentence.rfind(' ', 0, size) if ' ' in sentence[:size] else size
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+
+    passages, current, length = [], [], 0
+    for sentence in sentences:
+        if current and length + len(sentence) > size:
+            passages.append(' '.join(current))
+            current = current[-overlap:] if overlap else []
+            length = sum(len(s) + 1 for s in current)
+        current.append(sentence)
+        length += len(sentence) + 1
+    if current and (not passages or len(current) > overlap):
+        passages.append(' '.join(current))
+    return passages
+
+
+# ===== CRAWLING =====
+
+class SourceCrawler:
+    """
+    Breadth-first crawler restricted to `allowed` URLs. Honours robots.txt and
+    waits `delay` seconds between requests to the same host.
+    """
+
+    def __init__(self, allowed=is_allowed_url, user_agent=USER_AGENT, timeout=(3.05, 10),
+                 max_bytes=2 * 1024 * 1024, delay=0.5, max_workers=4):
+        self.allowed = allowed
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.delay = delay
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._robots = {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def _robots_for(self, url):
+        parsed = urlparse(url)
+        origin = f'{parsed.scheme}://{parsed.netloc}'
+        with self._lock:
+            robots = self._robots.get(origin)
+        if robots is None:
+            robots = RobotFileParser()
+            try:
+                response = self.session.get(origin + '/robots.txt', timeout=self.timeout)
+                robots.parse(response.text.splitlines() if response.status_code == 200 else [])
+            except requests.RequestException:
+                robots.parse([])
+            with self._lock:
+                self._robots[origin] = robots
+        return robots
+
+    def _wait_turn(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def fetch_page(self, url):
+        """(text, links) of an HTML page, or None if it can't or mustn't be fetched"""
+        if not self._robots_for(url).can_fetch(self.user_agent, url):
+            return None
+        self._wait_turn(url)
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                content_type = response.headers.get('Content-Type', '')
+                if response.status_code != 200 or 'html' not in content_type:
+                    return None
+                charset = response.encoding if 'charset=' in content_type else 'utf-8'
+                try:
+                    decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+                except LookupError:
+                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+                def chunks():
+                    remaining = self.max_bytes
+                    for chunk in response.iter_content(16 * 1024):
+                        chunk = chunk[:remaining]
+                        remaining -= len(chunk)
+                        yield decoder.decode(chunk, final=remaining <= 0)
+                        if remaining <= 0:
+                            return
+
+                text, hrefs = extract_text_and_links(chunks())
+        except requests.RequestException as e:
+            print(f"[INDEX] Failed to fetch {url}: {e}")
+            return None
+        links = [link for link in (normalize_link(url, href) for href in hrefs) if link and self.allowed(link)]
+        return text, links
+
+    def crawl(self, seeds, max_pages=200, max_depth=2):
+        """Yield (url, text) for up to max_pages pages reachable from the seeds"""
+        seen = set()
+        frontier = deque()
+        for seed in seeds:
+            if self.allowed(seed) and seed not in seen:
+                seen.add(seed)
+                frontier.append(seed)
+        fetched = 0
+        depth = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while frontier and fetched < max_pages and depth <= max_depth:
+                level = [frontier.popleft() for _ in range(min(len(frontier), max_pages - fetched))]
+                frontier.clear()
+                for url, page in zip(level, executor.map(self.fetch_page, level)):
+                    if page is None:
+                        continue
+                    text, links = page
+                    fetched += 1
+                    yield url, text
+                    for link in links:
+                        if link not in seen:
+                            seen.add(link)
+                            frontier.append(link)
+                depth += 1
+
+
+# ===== INDEX =====
+
+def build_index(pages, passage_size=500, min_chars=80):
+    """
+    BM25 index of the passages of (url, text) pages. Passages repeated across
+    pages (menus, disclaimers rendered outside <nav>/<footer>) are kept once.
+    """
+    index = ContentSearchIndex(title_boost=1)
+    seen = set()
+    for url, text in pages:
+        for i, passage in enumerate(chunk_passages(text, passage_size)):
+            if len(passage) < min_chars:
+                continue
+            digest = hashlib.sha1(normalize(passage).encode('utf-8')).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            index.add(f'{url}#{i}', {'title': '', 'text': passage, 'url': url, 'source': 'official'})
+    return index
+
+
+class SourceIndex:
+    """Retrieval of official-source passages for a generation prompt"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        """The on-disk index, or None when it has not been built"""
+        try:
+            index = ContentSearchIndex.load(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[INDEX] Could not load {path}: {e}")
+            return None
+        print(f"[INDEX] Loaded {len(index)} source passages from {path}")
+        return cls(index)
+
+    def retrieve(self, query, limit=3, max_chars=1500, per_url=2):
+        """
+        Best passages for `query`: at most `limit` passages, `per_url` from any
+        one page and `max_chars` characters in total.
+        """
+        passages, per_page, used = [], {}, 0
+        for hit in self.index.search(query, limit=limit * 5):
+            if per_page.get(hit['url'], 0) >= per_url:
+                continue
+            if passages and used + len(hit['text']) > max_chars:
+                continue
+            passages.append({'url': hit['url'], 'text': hit['text'], 'score': hit['score']})
+            per_page[hit['url']] = per_page.get(hit['url'], 0) + 1
+            used += len(hit['text'])
+            if len(passages) >= limit:
+                break
+        return passages
+
+
+def format_materials(passages):
+    """Prompt block: each passage preceded by its source URL"""
+    return '\n\n'.join(f"[{p['url']}]\n{p['text']}" for p in passages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Crawl official sources into a local retrieval index')
+    commands = parser.add_subparsers(dest='command', required=True)
+    crawl = commands.add_parser('crawl', help='crawl the allow-listed sites and write the index')
+    crawl.add_argument('--seed', action='append', help='start URL (repeatable)')
+    crawl.add_argument('--max-pages', type=int, default=300)
+    crawl.add_argument('--max-depth', type=int, default=2)
+    crawl.add_argument('--delay', type=float, default=0.5, help='seconds between requests to one host')
+    crawl.add_argument('--out', default=DEFAULT_INDEX_PATH)
+    search = commands.add_parser('search', help='query an existing index')
+    search.add_argument('query', nargs='+')
+    search.add_argument('--index', default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == 'crawl':
+        crawler = SourceCrawler(delay=args.delay)
+        pages = []
+        for url, text in crawler.crawl(args.seed or DEFAULT_SEEDS, args.max_pages, args.max_depth):
+            print(f"[INDEX] {len(text):>7} chars  {url}")
+            pages.append((url, text))
+        index = build_index(pages)
+        index.save(args.out)
+        print(f"[INDEX] {len(pages)} pages, {len(index)} passages -> {args.out}")
+        return 0
+
+    source_index = SourceIndex.load(args.index)
+    if source_index is None:
+        print(f"No index at {args.index}; run `python source_index.py crawl` first")
+        return 1
+    for passage in source_index.retrieve(' '.join(args.query), limit=5, max_chars=5000):
+        print(f"{passage['score']:7.3f}  {passage['url']}\n         {passage['text'][:200]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
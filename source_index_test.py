@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the official-source retrieval index (source_index.py)
+"""
+
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from source_index import SourceCrawler, SourceIndex, build_index, chunk_passages, is_allowed_url
+
+KHANATE = ('Қазақ хандығы 1465 жылы құрылды. Оның негізін Керей мен Жәнібек хандар қалады. '
+           'Хандық Шу мен Талас өзендерінің бойында пайда болды. ') * 3
+ABLAI = ('Абылай хан жоңғар шапқыншылығына қарсы күресті басқарды. Ол 1771 жылы ақ киізге көтерілді. '
+         'Абылай Ресей мен Цин империясы арасында дипломатия жүргізді. ') * 3
+SITE = {
+    '/': '<nav><a href="/khanate">Хандық</a><a href="/ablai#top">Абылай</a><a href="/doc.pdf">PDF</a>'
+         '<a href="http://elsewhere.example/">x</a></nav><p>Басты бет мәтіні, жалпы ақпарат және жаңалықтар.</p>',
+    '/khanate': f'<p>{KHANATE}</p><a href="/private/x">x</a>',
+    '/ablai': f'<p>{ABLAI}</p>',
+    '/private/x': '<p>Жабық бет</p>',
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/robots.txt':
+            body, content_type = b'User-agent: *\nDisallow: /private/\n', 'text/plain'
+        elif self.path in SITE:
+            body, content_type = f'<html><body>{SITE[self.path]}</body></html>'.encode('utf-8'), \
+                'text/html; charset=utf-8'
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _crawl():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{httpd.server_address[1]}'
+    try:
+        crawler = SourceCrawler(allowed=lambda url: url.startswith(base), delay=0)
+        return base, dict(crawler.crawl([base + '/'], max_pages=10))
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_allow_list():
+    assert is_allowed_url('https://e-history.kz/kz/news')
+    assert not is_allowed_url('https://e-history.kz.evil.com/')
+    assert not is_allowed_url('ftp://e-history.kz/')
+
+
+def test_chunking_respects_size_and_overlap():
+    passages = chunk_passages(KHANATE + ABLAI, size=200)
+    assert len(passages) > 3
+    assert all(len(p) <= 300 for p in passages)
+    first_sentences = [p.split('. ')[0] for p in passages[1:]]
+    assert all(s.rstrip('.') in prev for s, prev in zip(first_sentences, passages))
+
+
+def test_crawl_follows_allowed_links_and_robots():
+    base, pages = _crawl()
+    assert set(pages) == {base + '/', base + '/khanate', base + '/ablai'}
+    assert 'Керей мен Жәнібек' in pages[base + '/khanate']
+
+
+def test_retrieval_is_small_and_grounded():
+    base, pages = _crawl()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'source_index.json.gz')
+        build_index(pages.items(), passage_size=200).save(path)
+        index = SourceIndex.load(path)
+        assert SourceIndex.load(os.path.join(tmp, 'missing.json.gz')) is None
+
+    passages = index.retrieve('Абылай хан', limit=3, max_chars=600)
+    assert passages and all(p['url'] == base + '/ablai' for p in passages[:2])
+    assert sum(len(p['text']) for p in passages) <= 600
+    assert len(passages) <= 3
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests that importing the server stays cheap (lazy heavy dependencies)
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_server_import_defers_heavy_modules():
+    code = ('import sys, server; '
+            'print(sorted(m for m in ("openai", "requests", "google.generativeai") if m in sys.modules)); '
+            'print(server._content_search_index is None and server._mission_dedup_index is None)')
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-2:] == ['[]', 'True']
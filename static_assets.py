@@ -0,0 +1,71 @@
+"""
+Serving of the front-end build produced by build_assets.py.
+
+Fingerprinted assets (game_engine.3f2a9c1b7d.js) never change, so they are
+sent with a one-year immutable Cache-Control. Pages, manifest.json and sw.js
+keep their names and are revalidated on every visit (no-cache + ETag). The
+precompressed .br/.gz sibling matching Accept-Encoding is sent as-is.
+
+Without a build (development, Vercel) send() returns None and the caller
+serves the source file instead.
+"""
+
+import json
+import mimetypes
+import os
+
+from flask import send_file
+
+from content_packs import choose_encoding
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+MANIFEST_NAME = 'asset-manifest.json'
+_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+class StaticAssets:
+    def __init__(self, dist_dir):
+        self.dist_dir = dist_dir
+        self.version = None
+        self.assets = {}     # source path -> fingerprinted path
+        self.files = {}      # built path -> {'type', 'hash', 'size', 'encodings'}
+        self.load()
+
+    def load(self):
+        """(Re)read the build manifest; returns False when there is no build"""
+        path = os.path.join(self.dist_dir, MANIFEST_NAME)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"[ASSETS] Ignoring unreadable build manifest {path}: {e}")
+            return False
+        self.version = manifest.get('version')
+        self.assets = manifest.get('assets', {})
+        self.files = manifest.get('files', {})
+        print(f"[ASSETS] Serving build {self.version} ({len(self.assets)} fingerprinted assets)")
+        return True
+
+    def url_for(self, source_path):
+        """Public URL of a source file: its fingerprinted name when built"""
+        source_path = source_path.lstrip('/')
+        return '/' + self.assets.get(source_path, source_path)
+
+    def send(self, path, request):
+        """Response for a built file, or None when `path` is not part of the build"""
+        entry = self.files.get(path)
+        if entry is None:
+            return None
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'), {None, *entry['encodings']})
+        filename = os.path.join(self.dist_dir, *path.split('/')) + _SUFFIXES.get(encoding, '')
+        etag = f"{entry['hash']}-{encoding}" if encoding else entry['hash']
+        response = send_file(filename, mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                             etag=etag, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = IMMUTABLE if entry['type'] == 'asset' else REVALIDATE
+        return response
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for serving the front-end build (static_assets.py)
+"""
+
+import gzip
+import os
+import tempfile
+
+from flask import Flask, request
+
+from build_assets import build
+from static_assets import IMMUTABLE, StaticAssets
+
+
+def _client(src, out):
+    with open(os.path.join(src, 'game.js'), 'w', encoding='utf-8') as f:
+        f.write('const hero = "Абылай";\n' * 50)
+    with open(os.path.join(src, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write('<script src="game.js"></script>' + '<p>BATYR BOL</p>' * 50)
+    build(src, out)
+    assets = StaticAssets(out)
+    app = Flask(__name__)
+
+    @app.route('/<path:path>')
+    def static_files(path):
+        return assets.send(path, request) or ('source', 200)
+    return app.test_client(), assets
+
+
+def test_fingerprinted_asset_is_immutable_and_precompressed():
+    with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as out:
+        client, assets = _client(src, out)
+        url = assets.url_for('game.js')
+        assert url != '/game.js'
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == IMMUTABLE
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.mimetype == 'text/javascript'
+        assert 'Абылай' in gzip.decompress(response.data).decode('utf-8')
+
+        identity = client.get(url)
+        assert 'Content-Encoding' not in identity.headers
+        assert identity.headers['ETag'] != response.headers['ETag']
+
+
+def test_pages_are_revalidated():
+    with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as out:
+        client, assets = _client(src, out)
+        first = client.get('/index.html')
+        assert first.headers['Cache-Control'] == 'no-cache'
+        assert assets.url_for('game.js').lstrip('/') in first.get_data(as_text=True)
+        again = client.get('/index.html', headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304
+
+
+def test_unbuilt_files_fall_through():
+    with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as out:
+        client, _ = _client(src, out)
+        assert client.get('/game.js').data == b'source'
+        assert StaticAssets(os.path.join(out, 'missing')).url_for('/game.js') == '/game.js'
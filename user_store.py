@@ -0,0 +1,72 @@
+"""
+Exclusive access to the JSON user store (unified_users.json).
+
+The store is read, changed and rewritten whole, by the web workers (several
+processes with many threads each), by the bot and by maintenance scripts
+(clan_xp.py). locked() serializes those read-modify-write cycles:
+- a threading.RLock per store path for the threads of one process;
+- an fcntl.flock on a sidecar `<store>.lock` file for other processes. The
+  lock lives on a separate file because the store itself is replaced by
+  rename on every save.
+Without fcntl (Windows) only the threads of one process are serialized.
+
+Plain reads need no lock: write_json() swaps a complete file in with
+os.replace, so a reader sees either the old or the new store.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class _StoreLock:
+    def __init__(self, path):
+        self.path = path + '.lock'
+        self.thread_lock = threading.RLock()
+        self.depth = 0          # re-entries by the owning thread
+        self.handle = None
+
+
+def _lock_for(path):
+    path = os.path.abspath(path)
+    with _locks_guard:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = _StoreLock(path)
+        return lock
+
+
+@contextmanager
+def locked(path):
+    """Hold the store at `path` against every other thread and process (re-entrant)"""
+    lock = _lock_for(path)
+    with lock.thread_lock:
+        if lock.depth == 0 and fcntl is not None:
+            lock.handle = open(lock.path, 'a')
+            fcntl.flock(lock.handle, fcntl.LOCK_EX)
+        lock.depth += 1
+        try:
+            yield
+        finally:
+            lock.depth -= 1
+            if lock.depth == 0 and lock.handle is not None:
+                fcntl.flock(lock.handle, fcntl.LOCK_UN)
+                lock.handle.close()
+                lock.handle = None
+
+
+def write_json(path, data):
+    """Write `data` to a temp file and swap it in, so readers never see a partial store"""
+    tmp_file = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
@@ -0,0 +1,50 @@
+import json
+import threading
+
+import user_store
+
+
+def test_locked_serializes_read_modify_write(tmp_path):
+    path = str(tmp_path / 'users.json')
+    user_store.write_json(path, {'count': 0})
+
+    def bump():
+        for _ in range(20):
+            with user_store.locked(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                data['count'] += 1
+                with user_store.locked(path):     # re-entrant
+                    user_store.write_json(path, data)
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['count'] == 160
+
+
+def test_concurrent_registrations_are_all_saved(tmp_path, monkeypatch):
+    import server
+    monkeypatch.setattr(server, 'data_file', str(tmp_path / 'users.json'))
+    # Cheap hashes: the race is in the store, not in hashing
+    monkeypatch.setattr(server, 'generate_password_hash', lambda password: 'hash:' + password)
+    client = server.app.test_client()
+    statuses = []
+
+    def register(i):
+        response = client.post('/api/register', json={'name': f'User {i}', 'email': f'user{i}@school.kz',
+                                                      'password': 'secret123'},
+                               headers={'X-Forwarded-For': f'10.0.0.{i}'})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=register, args=(i,)) for i in range(30)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert statuses == [200] * 30
+    assert len(server.load_users()['web_users']) == 30
@@ -0,0 +1,184 @@
+"""
+WSGI adapter for Vercel's Python request/response handler format.
+
+handle(app, request) turns a serverless request (method, path, query,
+headers, body) into a PEP 3333 environ and calls the WSGI app. It returns
+the `{'statusCode', 'headers', 'body', 'isBase64Encoded'}` dict Vercel expects:
+- the request body is wrapped in a BytesIO without copying it, and
+  CONTENT_LENGTH is set;
+- the response iterable is consumed chunk by chunk and then closed, as
+  PEP 3333 requires; send_file responses are read in one go through
+  `wsgi.file_wrapper`;
+- text responses (text/*, JSON, JS, XML, SVG) are returned as strings, and
+  everything else (images, fonts, compressed bodies) as base64.
+"""
+
+import base64
+import io
+import sys
+from urllib.parse import unquote_to_bytes, urlencode
+
+TEXT_TYPES = frozenset({
+    'application/javascript', 'application/json', 'application/manifest+json',
+    'application/xml', 'image/svg+xml',
+})
+_NO_BODY_STATUSES = (204, 304)
+
+
+class FileWrapper:
+    """wsgi.file_wrapper: lets the adapter read a whole file at once instead of 8 KB chunks"""
+
+    def __init__(self, filelike, block_size=8192):
+        self.filelike = filelike
+        self.block_size = block_size
+
+    def __iter__(self):
+        while True:
+            block = self.filelike.read(self.block_size)
+            if not block:
+                return
+            yield block
+
+    def read_all(self):
+        return self.filelike.read()
+
+    def close(self):
+        if hasattr(self.filelike, 'close'):
+            self.filelike.close()
+
+
+def _get(request, name, default=None):
+    if isinstance(request, dict):
+        return request.get(name, default)
+    return getattr(request, name, default)
+
+
+def _body_bytes(request):
+    body = _get(request, 'body')
+    if not body:
+        return b''
+    if isinstance(body, str):
+        if _get(request, 'isBase64Encoded') or _get(request, 'encoding') == 'base64':
+            return base64.b64decode(body)
+        return body.encode('utf-8')
+    return bytes(body) if not isinstance(body, bytes) else body
+
+
+def build_environ(request):
+    """PEP 3333 environ for a Vercel request"""
+    path = _get(request, 'path') or '/'
+    query = _get(request, 'query') or ''
+    if '?' in path:
+        path, _, inline_query = path.partition('?')
+        query = query or inline_query
+    if not isinstance(query, str):
+        query = urlencode(query, doseq=True)
+    body = _body_bytes(request)
+    headers = _get(request, 'headers') or {}
+
+    environ = {
+        'REQUEST_METHOD': (_get(request, 'method') or 'GET').upper(),
+        'SCRIPT_NAME': '',
+        # PEP 3333: PATH_INFO is the percent-decoded path as latin-1 "bytes in a str"
+        'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'vercel.app',
+        'SERVER_PORT': '443',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_LENGTH': str(len(body)),
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'https',
+        'wsgi.input': io.BytesIO(body),     # shares the bytes object's buffer until written to
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.file_wrapper': FileWrapper,
+    }
+    for name, value in headers.items():
+        if isinstance(value, (list, tuple)):
+            value = ', '.join(value)
+        key = name.upper().replace('-', '_')
+        if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            if key == 'CONTENT_TYPE':
+                environ[key] = value
+            continue
+        environ['HTTP_' + key] = value
+
+    host = environ.get('HTTP_X_FORWARDED_HOST') or environ.get('HTTP_HOST')
+    if host:
+        environ['SERVER_NAME'] = host.split(':')[0]
+    forwarded_for = environ.get('HTTP_X_FORWARDED_FOR') or environ.get('HTTP_X_REAL_IP')
+    if forwarded_for:
+        environ['REMOTE_ADDR'] = forwarded_for.split(',')[0].strip()
+    return environ
+
+
+def is_text(content_type, content_encoding=None):
+    """Whether a response body can be returned as a UTF-8 string"""
+    if content_encoding:
+        return False
+    media_type, _, params = content_type.partition(';')
+    media_type = media_type.strip().lower()
+    if not (media_type.startswith('text/') or media_type in TEXT_TYPES):
+        return False
+    charset = params.lower().partition('charset=')[2].strip().strip('"')
+    return charset in ('', 'utf-8', 'utf8', 'us-ascii', 'ascii')
+
+
+def handle(app, request):
+    """Run a WSGI app for one Vercel request and return the Vercel response dict"""
+    environ = build_environ(request)
+    captured = {}
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and captured:
+            raise exc_info[1].with_traceback(exc_info[2])
+        captured['status'] = status
+        captured['headers'] = headers
+        return written.append
+
+    app_iter = app(environ, start_response)
+    try:
+        if isinstance(app_iter, FileWrapper):
+            chunks = [app_iter.read_all()]
+        else:
+            chunks = written + [chunk for chunk in app_iter if chunk]
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+    status = int(captured['status'].split(' ', 1)[0])
+    body = b'' if status in _NO_BODY_STATUSES else chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+    headers = {}
+    cookies = []
+    content_type = content_encoding = ''
+    for name, value in captured['headers']:
+        lower = name.lower()
+        if lower == 'content-type':
+            content_type = value
+        elif lower == 'content-encoding':
+            content_encoding = value
+        elif lower == 'set-cookie':
+            cookies.append(value)
+            continue
+        if name in headers:
+            headers[name] = f'{headers[name]}, {value}'
+        else:
+            headers[name] = value
+    response = {'statusCode': status, 'headers': headers}
+    if cookies:
+        headers['Set-Cookie'] = cookies[-1]
+        if len(cookies) > 1:
+            response['multiValueHeaders'] = {'Set-Cookie': cookies}
+
+    if is_text(content_type, content_encoding):
+        response['body'] = body.decode('utf-8')
+        response['isBase64Encoded'] = False
+    else:
+        response['body'] = base64.b64encode(body).decode('ascii')
+        response['isBase64Encoded'] = True
+    return response
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the Vercel WSGI adapter (wsgi_adapter.py)
+"""
+
+import base64
+import io
+import json
+
+from flask import Flask, Response, jsonify, request, send_file
+
+from wsgi_adapter import build_environ, handle
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256))
+
+
+def _app():
+    app = Flask(__name__)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify({'length': request.content_length, 'name': request.get_json()['name'],
+                        'q': request.args.get('q'), 'ip': request.remote_addr})
+
+    @app.route('/logo.png')
+    def logo():
+        return send_file(io.BytesIO(PNG), mimetype='image/png')
+
+    @app.route('/stream')
+    def stream():
+        return Response((part for part in ('Қазақ ', 'хандығы')), mimetype='text/plain')
+
+    @app.route('/cookies')
+    def cookies():
+        response = Response('ok')
+        response.set_cookie('a', '1')
+        response.set_cookie('b', '2')
+        return response
+
+    return app
+
+
+def test_body_and_headers_reach_the_app():
+    body = '{"name": "Абылай"}'.encode('utf-8')
+    response = handle(_app(), {'method': 'POST', 'path': '/echo', 'query': {'q': 'хан'}, 'body': body,
+                               'headers': {'content-type': 'application/json', 'x-forwarded-for': '10.0.0.7, 1.1.1.1'}})
+    assert response['statusCode'] == 200 and response['isBase64Encoded'] is False
+    data = json.loads(response['body'])
+    assert data == {'length': len(body), 'name': 'Абылай', 'q': 'хан', 'ip': '10.0.0.7'}
+
+
+def test_base64_request_body_is_decoded():
+    body = base64.b64encode(b'{"name": "x"}').decode()
+    environ = build_environ({'method': 'post', 'path': '/echo?q=1', 'body': body, 'isBase64Encoded': True})
+    assert environ['wsgi.input'].read() == b'{"name": "x"}'
+    assert environ['CONTENT_LENGTH'] == '13' and environ['QUERY_STRING'] == 'q=1'
+
+
+def test_binary_response_is_base64_encoded():
+    response = handle(_app(), {'method': 'GET', 'path': '/logo.png'})
+    assert response['isBase64Encoded'] is True
+    assert base64.b64decode(response['body']) == PNG
+
+
+def test_streamed_text_response_is_joined():
+    response = handle(_app(), {'method': 'GET', 'path': '/stream'})
+    assert response['body'] == 'Қазақ хандығы' and not response['isBase64Encoded']
+
+
+def test_every_cookie_is_kept():
+    response = handle(_app(), {'method': 'GET', 'path': '/cookies'})
+    assert [c.split(';')[0] for c in response['multiValueHeaders']['Set-Cookie']] == ['a=1', 'b=2']